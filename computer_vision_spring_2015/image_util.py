@@ -0,0 +1,106 @@
+
+# Image processing functions shared by the programming assignments
+# Everything here operates on whole numpy arrays at once, there are no per-pixel Python loops
+
+import math
+import numpy
+import scipy.ndimage.filters
+
+inf = float('inf')
+PI = math.pi
+
+def round_vectorized(array):
+    # rounds half away from zero like Python 2's round() (numpy.round rounds half to even)
+    array = numpy.asarray(array, dtype='float')
+    return numpy.copysign(numpy.floor(numpy.abs(array)+0.5), array)
+
+def clamp(x, min_val=0, max_val=255):
+    return max( min(x, max_val), min_val)
+
+def clamp_array(array, min_val=0, max_val=255):
+    return numpy.clip(array, min_val, max_val)
+
+def save_image(image, name):
+    import Image # only needed when writing images out
+    final_output = clamp_array(image)
+    final_output = final_output.astype('uint8')
+    Image.fromarray(final_output).save(name)
+
+def G(x, sigma):
+    return numpy.exp(-(x*x)/(2.0*(sigma*sigma))) / numpy.sqrt(2*PI*(sigma*sigma))
+
+def G2(x, y, sigma):
+    return numpy.exp(-((y*y)+(x*x))/(2.0*(sigma*sigma))) / (2*PI*(sigma*sigma))
+
+def divide(top, bottom):
+    if bottom == 0.0:
+        return inf
+    return top / bottom
+
+def divide_array(top, bottom):
+    # element-wise version of divide(), anything divided by zero is inf
+    top = numpy.asarray(top, dtype='float')
+    bottom = numpy.asarray(bottom, dtype='float')
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        quotient = top / bottom
+    quotient[bottom == 0.0] = inf
+    return quotient
+
+def multiply(a, b):
+    return a*b
+
+def sum_of_squared_differences(a, b):
+    difference = numpy.asarray(a, dtype='float') - numpy.asarray(b, dtype='float')
+    return numpy.sum(numpy.square(difference), axis=None)
+
+def radians_to_degrees(radian_value):
+    return radian_value*180/PI
+
+def downsample_2d(I0, downsample_factor=2):
+    I = numpy.array(I0,dtype='float')
+    return I[::2,::2]
+
+def convert_to_grayscale(I0):
+    I = numpy.array(I0,dtype='float')
+    I[:,:,0] *= 0.299
+    I[:,:,1] *= 0.5870
+    I[:,:,2] *= 0.1140
+    I_grayscale = numpy.mean(I, axis=2)
+    return I_grayscale
+
+def convolve(I0, k, zero_borders=False): # Convolves RGB image with 2D kernel
+    assert len(k.shape) == 2, "Kernel must be 2D"
+    k_h, k_w = k.shape
+    assert k_h % 2 == 1, "Kernel must have odd height"
+    assert k_w % 2 == 1, "Kernel must have odd width"
+
+    if zero_borders:
+        mode_kwargs = {'mode':'constant', 'cval':0.0}
+    else:
+        mode_kwargs = {'mode':'nearest'}
+
+    if len(I0.shape)==2:
+        I = scipy.ndimage.filters.convolve(I0, k, **mode_kwargs)
+    else:
+        I = numpy.zeros(I0.shape)
+        I_h, I_w, I_channels = I0.shape
+        for channel in range(I_channels):
+            I[:,:,channel] = scipy.ndimage.filters.convolve(I0[:,:,channel], k, **mode_kwargs)
+
+    return I
+
+def normalize(array0):
+    # divides each channel by its sum so that each channel sums to 1.0
+    assert len(array0.shape) in [2,3], "normalize() is only supported for 2D and 3D arrays"
+    array = numpy.array(array0)
+    array /= numpy.sum(array0, axis=(0,1))
+    return array
+
+def get_gaussian_kernel(dim, sigma):
+    assert dim % 2==1, "Gaussian kernel must be of odd dimension"
+
+    offsets = numpy.arange(dim) - dim//2
+    y_offsets, x_offsets = numpy.meshgrid(offsets, offsets, indexing='ij')
+    kernel = G2(y_offsets, x_offsets, sigma)
+    kernel = normalize(kernel)
+    return kernel
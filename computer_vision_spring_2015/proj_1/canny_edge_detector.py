@@ -14,9 +14,21 @@ import scipy.ndimage.filters
 
 # Non-Standard Libraries
 from util import *
+from tiled_pipeline import tiled_convolve
 
 KERNEL_DIM = 5 # the denoising kernels are going to be 5x5, we will normalize the kernel to make sure the coefficients sum to 1.0
 
+def shifted_image(F, rel_x, rel_y):
+    # shifted[y,x] == F[y+rel_y,x+rel_x] when that neighbor is in bounds, -inf otherwise so that it never suppresses anything
+    # neighbors in row 0 or column 0 count as out of bounds, this matches how the bounds were always checked (e.g. pos_x > 0)
+    I_h, I_w = F.shape
+    shifted = numpy.empty(F.shape, dtype='float')
+    shifted.fill(-inf)
+    y_lo, y_hi = max(1-rel_y,0), min(I_h-rel_y,I_h)
+    x_lo, x_hi = max(1-rel_x,0), min(I_w-rel_x,I_w)
+    shifted[y_lo:y_hi,x_lo:x_hi] = F[y_lo+rel_y:y_hi+rel_y,x_lo+rel_x:x_hi+rel_x]
+    return shifted
+
 def usage():
     # Sample Usage: ./canny_edge_detector.py building.jpg 9 35 75
     print >> sys.stderr, 'python '+__file__+' input_image denoising_sigma low_threshold high_threshold out_dir'
@@ -44,7 +56,7 @@ def main():
     # Denoise with Gaussian Filter
     denoise_start = time.time() # I'm profiling my code to see how fast things run
     denoising_kernel = get_gaussian_kernel(KERNEL_DIM, denoising_sigma) # see util.py on how I generate the gaussian kernel
-    I_denoised = convolve(I, denoising_kernel) # see util.py on how the convolution was implemented
+    I_denoised = tiled_convolve(I, denoising_kernel) # see tiled_pipeline.py on how the convolution is split up across processes
     save_image(I,os.path.join(out_dir,'input.png'))
     save_image(I_denoised,os.path.join(out_dir,'denoised.png'))
     denoise_end = time.time()
@@ -58,8 +70,8 @@ def main():
     sobel_y = numpy.array([[-1, -2, -1],
                            [ 0,  0,  0],
                            [ 1,  2,  1]], dtype='float')
-    Fx = convolve(I_denoised_grayscale, sobel_x) # convolving with the sobel filter kernels
-    Fy = convolve(I_denoised_grayscale, sobel_y)
+    Fx = tiled_convolve(I_denoised_grayscale, sobel_x) # convolving with the sobel filter kernels
+    Fy = tiled_convolve(I_denoised_grayscale, sobel_y)
     save_image(Fx,os.path.join(out_dir,'Fx.png'))
     save_image(Fy,os.path.join(out_dir,'Fy.png'))
     find_gradient_end = time.time()
@@ -72,10 +84,7 @@ def main():
     
     # Compute edge orientation
     compute_edge_orientation_start = time.time()
-    radians_to_degrees_vectorized = numpy.vectorize(radians_to_degrees) # vectorizing my radians to degrees func (see util.py for implementation) 
-    atan_vectorized = numpy.vectorize(math.atan) 
-    divide_vectorized = numpy.vectorize(divide)
-    D = radians_to_degrees_vectorized(atan_vectorized(divide_vectorized(Fy,Fx))) # using vectorized operations to determine the angle, makes things run much faster 
+    D = radians_to_degrees(numpy.arctan(divide_array(Fy,Fx))) # using array operations to determine the angle, makes things run much faster (see image_util.py for divide_array)
     compute_edge_orientation_end = time.time()
     
     # Nonmaximum Suppression #########################################################################
@@ -90,21 +99,11 @@ def main():
                                   45 : (( 1, 1),(-1,-1)), 
                                   90 : (( 0, 1),( 0,-1)) } # stored as (x,y) pairs
     edge_map = numpy.array(F) # referred to as I in the assignment description
-    for y in xrange(I_h): 
-        for x in xrange(I_w): 
-            pos_dir, neg_dir = angle_to_rel_pixels_dict[D_star[y,x]]
-            pos_x = pos_dir[0] + x # getting the coordinates of the positive and negative directions along the orientation direction
-            pos_y = pos_dir[1] + y
-            neg_x = neg_dir[0] + x
-            neg_y = neg_dir[1] + y
-            
-            # the actual nonmaximum supression takes place here
-            if pos_x > 0 and pos_x < I_w and pos_y > 0 and pos_y < I_h:
-                if F[y,x] < F[pos_y,pos_x]: # make sure it's bigger than the pixel in the positive direction
-                    edge_map[y,x] = 0
-            if neg_x > 0 and neg_x < I_w and neg_y > 0 and neg_y < I_h:
-                if F[y,x] < F[neg_y,neg_x]: # make sure it's bigger than the pixel in the negative direction
-                    edge_map[y,x] = 0
+    for angle, rel_dirs in angle_to_rel_pixels_dict.items(): # we handle all the pixels with the same quantized angle at once
+        pixels_with_angle = (D_star == angle)
+        for rel_x, rel_y in rel_dirs: # the positive and negative directions along the orientation direction
+            # the actual nonmaximum supression takes place here, a pixel is suppressed if it's smaller than its in-bounds neighbor
+            edge_map[pixels_with_angle & (F < shifted_image(F, rel_x, rel_y))] = 0
     save_image(edge_map,os.path.join(out_dir,'suppressed_magnitude.png'))
     nonmaximal_suppression_end = time.time()
     
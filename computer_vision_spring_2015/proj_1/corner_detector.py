@@ -12,17 +12,17 @@ import scipy.ndimage.filters
 
 # Non-Standard Libraries
 from util import *
+from tiled_pipeline import tiled_convolve
 
 KERNEL_DIM = 5
 BOX_THICKNESS = 2
 BOX_COLOR = [0,0,255]
 
-def get_smaller_eigenvalue(F_x_squared_val, F_y_squared_val, F_xy_val):
-    eigen_values, eigen_vectors = numpy.linalg.eig(numpy.array(
-                                                                [[F_x_squared_val,F_xy_val],
-                                                                 [F_xy_val,F_y_squared_val]] 
-                                                              ))
-    return min(eigen_values)
+def get_smaller_eigenvalues(F_x_squared, F_y_squared, F_xy):
+    # closed form for the smaller eigenvalue of the symmetric 2x2 matrix [[F_x_squared,F_xy],[F_xy,F_y_squared]], computed for every pixel at once
+    half_trace = (F_x_squared+F_y_squared)/2.0
+    half_difference = (F_x_squared-F_y_squared)/2.0
+    return half_trace - numpy.sqrt(numpy.square(half_difference)+numpy.square(F_xy))
 
 def usage():
     # Sample Usage: python corner_detector.py checker.jpg 9 5 15000
@@ -53,7 +53,7 @@ def main():
     print "Denoising."
     denoise_start = time.time()
     denoising_kernel = get_gaussian_kernel(KERNEL_DIM, denoising_sigma) # get the gaussian kernel we're going to use for denoising
-    I_denoised = convolve(I, denoising_kernel) # convolve with our kernel
+    I_denoised = tiled_convolve(I, denoising_kernel) # convolve with our kernel
     save_image(I,os.path.join(out_dir,'input.png'))
     save_image(I_denoised,os.path.join(out_dir,'denoised.png'))
     denoise_end = time.time()
@@ -67,8 +67,8 @@ def main():
     sobel_y = numpy.array([[-1, -2, -1], # our y sobel kernel
                            [ 0,  0,  0],
                            [ 1,  2,  1]], dtype='float')
-    Fx = convolve(I_denoised_grayscale, sobel_x) # the gradient in the x direction
-    Fy = convolve(I_denoised_grayscale, sobel_y) # the gradient in the y direction
+    Fx = tiled_convolve(I_denoised_grayscale, sobel_x) # the gradient in the x direction
+    Fy = tiled_convolve(I_denoised_grayscale, sobel_y) # the gradient in the y direction
     save_image(Fx,os.path.join(out_dir,'Fx.png'))
     save_image(Fy,os.path.join(out_dir,'Fy.png'))
     find_gradient_end = time.time()
@@ -77,26 +77,23 @@ def main():
     #  Compute the covariance matrix C over a neighborhood around each point
     print "Detecting Corners."
     corner_detection_start = time.time()
-    multiply_vectorized = numpy.vectorize(multiply) # I made a vectorized mult op
     Fx_squared = numpy.square(Fx) # made a squared matrix for each gradient direction
     Fy_squared = numpy.square(Fy)
-    FxFy = multiply_vectorized(Fx,Fy)
+    FxFy = Fx*Fy
     save_image(Fx_squared,os.path.join(out_dir,'Fx_squared.png'))
     save_image(Fy_squared,os.path.join(out_dir,'Fy_squared.png'))
     save_image(FxFy,os.path.join(out_dir,'FxFy.png'))
     
     ones_kernel = numpy.ones([neighborhood_width,neighborhood_width]) # a ones kernel that I'm using to take sums
-    Sigma_Fx_squared = convolve(Fx_squared, ones_kernel, zero_borders=True) # in order to sum the square gradient values over a neighborhood, I just convolve the square matrix with a ones kernel that is the size of the desired neighborhood
-    Sigma_Fy_squared = convolve(Fy_squared, ones_kernel, zero_borders=True) # I use zero values on the boundary to avoid having complications with edge cases (it's also more true to the sum if we just use zero valeus outside of the image
-    Sigma_FxFy = convolve(FxFy, ones_kernel, zero_borders=True) # Similarly I'm taking the sum over Fx *Fy values
+    Sigma_Fx_squared = tiled_convolve(Fx_squared, ones_kernel, zero_borders=True) # in order to sum the square gradient values over a neighborhood, I just convolve the square matrix with a ones kernel that is the size of the desired neighborhood
+    Sigma_Fy_squared = tiled_convolve(Fy_squared, ones_kernel, zero_borders=True) # I use zero values on the boundary to avoid having complications with edge cases (it's also more true to the sum if we just use zero valeus outside of the image
+    Sigma_FxFy = tiled_convolve(FxFy, ones_kernel, zero_borders=True) # Similarly I'm taking the sum over Fx *Fy values
     
     save_image(Sigma_Fx_squared,os.path.join(out_dir,'Sigma_Fx_squared.png'))
     save_image(Sigma_Fy_squared,os.path.join(out_dir,'Sigma_Fy_squared.png'))
     save_image(Sigma_FxFy,os.path.join(out_dir,'Sigma_FxFy.png'))
     
-    get_smaller_eigenvalue_vectorized = numpy.vectorize(get_smaller_eigenvalue) # see the top of this code for how this func works. It essentially just takes the three distinct sums we need for our 2x2 covariance matrix and returns the smaller eigen value. I vectorize this operation so that I can use it on the matrixes of sums I just calculated above (the Sigma_* values)
-    
-    smaller_eigenvalues = get_smaller_eigenvalue_vectorized(Sigma_Fx_squared,Sigma_Fy_squared,Sigma_FxFy) # get the smaller eigen values
+    smaller_eigenvalues = get_smaller_eigenvalues(Sigma_Fx_squared,Sigma_Fy_squared,Sigma_FxFy) # see the top of this code for how this func works. It essentially just takes the three distinct sums we need for our 2x2 covariance matrix and returns the smaller eigen value for every pixel
     save_image(smaller_eigenvalues,os.path.join(out_dir,'smaller_eigenvalues.png'))
     
     thresholded_smaller_eigenvalues = numpy.array(smaller_eigenvalues) # threshold the eigen values to make sure they're all above the specified threshold.
@@ -13,6 +13,7 @@ import pdb
 
 # Non-Standard Libraries
 from util import *
+from result_cache import get_job, run_jobs
 
 def main():
     html_code = '''
@@ -31,6 +32,7 @@ Assignment 1: Edge and feature detector
 <BR> <a href="corner_detector.py"> Corner Detector (corner_detector.py) </a>
 <BR> <a href="sift.py"> SIFT (sift.py)</a>
 <BR> <a href="util.py"> Helper Functions (util.py, necessary to get any of the above code running) </a>
+<BR> <a href="../image_util.py"> Image Processing Functions (image_util.py, shared with the other assignments and used by util.py) </a>
 <BR>
 </h2>
 
@@ -71,7 +73,7 @@ I'm using one of my late days to submit this assignment to submit this late on F
 <h4> Implementation Details </h4>
 My edge detector uses integer values in the range [0,255] to represent intensity values, and the values I use to get certain results reflects that. The parameters would be different if my code represented intensities as floats in [0.0,1.0]. <BR><BR>
 The parameters of the edge detector are the sigma to be used to determine the Gaussian kernel for denoising, the low threshold for the hysteresis thresholding, and the high threshold for the hysteresis thresholding. <BR><BR>
-I first determine the Gaussian kernel using the formulae from the slides. Since Gaussians have a non-zero value for all inputs, I approximate the Gaussian kernel using a finite 5x5 kernel. I just normalize the finite kernel after I calculate the actual values in those 5x5 positions. See util.py for further details on how I implemented the blurring. I used a built in Python function to actually convolve. At the edges, I just used the values nearest to the point being inquired about since using zero values would in most cases lead to visible artifacts that we don't want to introduce into an image (especially for an edge detector). <BR><BR>
+I first determine the Gaussian kernel using the formulae from the slides. Since Gaussians have a non-zero value for all inputs, I approximate the Gaussian kernel using a finite 5x5 kernel. I just normalize the finite kernel after I calculate the actual values in those 5x5 positions. See image_util.py for further details on how I implemented the blurring. I used a built in Python function to actually convolve. At the edges, I just used the values nearest to the point being inquired about since using zero values would in most cases lead to visible artifacts that we don't want to introduce into an image (especially for an edge detector). <BR><BR>
 I used the Sobel Filter to calculate the gradients in the horizontal and vertical directions. <BR><BR>
 I computed the magnitudes and orientations of the gradients using methods described in class and using NumPy's vectorized operations. 
 I quantized the orientations to multiples of 45 degrees and performed my nonmaximum suppression using these quantized values.
@@ -127,8 +129,7 @@ We present supplemental results for various denoising Gaussian kernels, low thre
 #    high_thresholds = high_thresholds[:1]
 #    images = images[:1]
     
-    job_count = 0
-    commands = ''
+    jobs = []
     for image in images:
         for sigma in sigmas:
             canny_edge_detector_supplemental_html_code += '''<BR>
@@ -180,15 +181,7 @@ Image: '''+image+''' [&sigma;:'''+str(sigma)+'''] <BR>
 <h4> Suppressed Gradient Magnitude: </h4> <img src="suppressed_magnitude.png"> <BR> <BR> <BR>
 <h4> Final Edges: </h4> <img src="out.png"> <BR> <BR> <BR>
 ''')
-                        image_link_name = os.path.join(out_dir,'out.png')
-                        if not os.path.isfile(image_link_name):
-                            commands += ('python canny_edge_detector.py '+str(image)+' '+str(sigma)+' '+str(low_threshold)+' '+str(high_threshold)+' '+str(out_dir)+' & ')
-                            job_count+= 1
-                        if job_count == 4:
-                            job_count = 0
-                            system('('+commands+'wait'+') > /dev/null 2>&1')
-                            print 
-                            commands = ''
+                        jobs.append(get_job('canny_edge_detector.py', image, [sigma, low_threshold, high_threshold], out_dir))
                         canny_edge_detector_supplemental_html_code += '''
   <td align="left" valign="center">
     <font size="3">
@@ -206,7 +199,7 @@ Image: '''+image+''' [&sigma;:'''+str(sigma)+'''] <BR>
             canny_edge_detector_supplemental_html_code += '''
 </table>
 '''
-    system('('+commands+'wait'+') > /dev/null 2>&1')
+    run_jobs(jobs)
     with open(canny_edge_detector_supplemental_html_file_name,'wt') as f:
         f.write(canny_edge_detector_supplemental_html_code)
     # Canny Edge Detector Gen End ##################################################################################
@@ -290,8 +283,7 @@ We present supplemental results for various denoising Gaussian kernels, threshol
 #    thresholds = thresholds[:1]
 #    images = images[:1]
     
-    job_count = 0
-    commands = ''
+    jobs = []
     for image in images:
         for sigma in sigmas:
             corner_detector_supplemental_html_code += '''<BR>
@@ -348,15 +340,7 @@ Image: '''+image+''' [&sigma;:'''+str(sigma)+'''] <BR>
 <h4> Thresholded Smaller Eigevalues: </h4> <img src="thresholded_smaller_eigenvalues.png"> <BR> <BR> <BR>
 <h4> Final Corners: </h4> <img src="out.png"> <BR> <BR> <BR>
 ''')
-                    image_link_name = os.path.join(out_dir,'out.png')
-                    if not os.path.isfile(image_link_name):
-                        commands += ('python corner_detector.py '+str(image)+' '+str(sigma)+' '+str(neighborhood_width)+' '+str(threshold)+' '+str(out_dir)+' & ')
-                        job_count+= 1
-                    if job_count == 4:
-                        job_count = 0
-                        system('('+commands+'wait'+') > /dev/null 2>&1')
-                        print 
-                        commands = ''
+                    jobs.append(get_job('corner_detector.py', image, [sigma, neighborhood_width, threshold], out_dir))
                     corner_detector_supplemental_html_code += '''
   <td align="left" valign="center">
     <font size="3">
@@ -368,7 +352,7 @@ Image: '''+image+''' [&sigma;:'''+str(sigma)+'''] <BR>
             corner_detector_supplemental_html_code += '''
 </table>
 '''
-    system('('+commands+'wait'+') > /dev/null 2>&1')
+    run_jobs(jobs)
     with open(corner_detector_supplemental_html_file_name,'wt') as f:
         f.write(corner_detector_supplemental_html_code)
     # Harris Corner Detector Gen End ###############################################################################
@@ -459,8 +443,7 @@ There were several parameters, so it was difficult to organize the links in a me
 #    low_contrast_thresholds = low_contrast_thresholds[:1]
 #    images = images[:1]
     
-    job_count = 0
-    commands = ''
+    jobs = []
     
     for num_octaves in num_octaves_list:
         for base_sigma in base_sigmas:
@@ -484,16 +467,8 @@ There were several parameters, so it was difficult to organize the links in a me
 <h4> Input Image: </h4> <img src="input.png"> <BR> <BR> <BR>
 <h4> SIFT Points: </h4> <img src="out.png"> <BR> <BR> <BR>
 ''')
-                        image_link_name = os.path.join(out_dir,'out.png')
-                        if not os.path.isfile(image_link_name):
-                            commands += ('python sift.py '+str(image)+' '+str(num_octaves)+' '+str(base_sigma)+' '+str(num_intervals_per_octave)+' '+str(low_contrast_threshold)+' '+str(out_dir)+' & ')
-                            job_count+= 1
-                        if job_count == 4:
-                            job_count = 0
-                            system('('+commands+'wait'+') > /dev/null 2>&1')
-                            print 
-                            commands = '' 
-    system('('+commands+'wait'+') > /dev/null 2>&1')
+                        jobs.append(get_job('sift.py', image, [num_octaves, base_sigma, num_intervals_per_octave, low_contrast_threshold], out_dir))
+    run_jobs(jobs)
     with open(sift_supplemental_html_file_name,'wt') as f:
         f.write(sift_supplemental_html_code)
     # SIFT Gen End #################################################################################################
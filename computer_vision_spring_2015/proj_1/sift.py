@@ -12,6 +12,7 @@ import scipy.ndimage.filters
 
 # Non-Standard Libraries
 from util import *
+from tiled_pipeline import tiled_convolve
 
 KERNEL_DIM = 13 # we're using a pretty big finite kernel size just because our sigmas can get pretty large
 
@@ -54,7 +55,7 @@ def main():
         for scale_index in range(num_intervals_per_octave+3): # go through all of the sigmas we need to get s valid DoG images
             sigma = min_sigma*(2.0**octave_index)*(k**scale_index) # calculate the sigma from the index
             kernel = get_gaussian_kernel(KERNEL_DIM, sigma) # get the kernel from the sigma
-            I_blurred = convolve(I_grayscale, kernel) # convolve with the gaussian kernel
+            I_blurred = tiled_convolve(I_grayscale, kernel) # convolve with the gaussian kernel
             blurred_images.append( I_blurred ) # we stick this blurred image in our list
         DoG_images_for_this_octave = []
         for scale_index in range(num_intervals_per_octave+2): # here we calculate all of our DoG images
@@ -68,35 +69,15 @@ def main():
     extrema_start = time.time()
     candidate_points_0 = set()
     for octave_index, DoG_image_list in enumerate(DoG_images_by_octave): # for each octave
-        for DoG_image_index in xrange(1,len(DoG_image_list)-1): # for each DoG image / scale (except the top and bottome ones since they are border cases)
-            DoG_image = DoG_image_list[DoG_image_index] # we nab our DoG image
-            height, width = DoG_image.shape[0:2] # we get it's heigh and width
-            for y in xrange(1,height-1): # we iterate through all potential extrema points
-                for x in xrange(1,width-1): # (except the edge points)
-                    low_y  = y-1 # we're getting the surrounding point indices here
-                    low_x  = x-1
-                    high_y = y+1
-                    high_x = x+1
-                    low_DoG_image_index  = DoG_image_index-1
-                    high_DoG_image_index = DoG_image_index+1
-                    current_val = DoG_image_list[DoG_image_index][y,x] # get the value of the potential extrema point (the one in the middle)
-                    is_max = True # we assume it's the biggest / smalled of the surrounding points we 
-                    is_min = True # have checked so far until proven otherwise
-                    for DoG_image_index_prime in xrange(low_DoG_image_index,high_DoG_image_index+1):
-                        for y_prime in xrange(low_y,high_y+1):
-                            for x_prime in xrange(low_x,high_x+1):
-                                if current_val < DoG_image_list[DoG_image_index_prime][y_prime,x_prime]:
-                                    is_max = False
-                                if current_val > DoG_image_list[DoG_image_index_prime][y_prime,x_prime]:
-                                    is_min = False
-                                if (not is_max) and (not is_min): # if we know it's not the min or max, we quit ASAP and go to the next potential extrema point
-                                    break
-                            if (not is_max) and (not is_min):
-                                break
-                        if (not is_max) and (not is_min):
-                            break
-                    if is_max or is_min: # if it's an extrema, we add it to our list of potential candidates 
-                        candidate_points_0.add( (y,x,octave_index,DoG_image_index) )
+        DoG_stack = numpy.array(DoG_image_list) # indexed by [DoG_image_index,y,x]
+        neighborhood_max = scipy.ndimage.filters.maximum_filter(DoG_stack, size=3) # the max and min of the 3x3x3 neighborhood around each point (the point itself included)
+        neighborhood_min = scipy.ndimage.filters.minimum_filter(DoG_stack, size=3)
+        is_extremum = (DoG_stack == neighborhood_max) | (DoG_stack == neighborhood_min) # it's an extrema if it's the biggest / smallest of the surrounding points
+        is_extremum[[0,-1],:,:] = False # we skip the top and bottom DoG images since they are border cases
+        is_extremum[:,[0,-1],:] = False # we skip the edge points as well
+        is_extremum[:,:,[0,-1]] = False
+        for DoG_image_index, y, x in zip(*numpy.nonzero(is_extremum)): # we add all the extrema to our list of potential candidates
+            candidate_points_0.add( (int(y),int(x),octave_index,int(DoG_image_index)) )
     extrema_end = time.time()
     print str(len(candidate_points_0))+' candidate points found.'
     
@@ -19,6 +19,7 @@ import warnings
 
 # Non-Standard Libraries
 from util import *
+from tiled_pipeline import run_tiled, tiled_convolve
 
 PATCH_WIDTH = 12
 NUM_PATCHES_PER_SET = 100 # the sets are faces and non-faces
@@ -92,10 +93,8 @@ def convert_to_png(args):
                 commands = ''
                 count = 0
 
-squared_difference = lambda a,b: (a-b)**2
-squared_difference_vectorized = numpy.vectorize(squared_difference)
 def patch_ssd(patch_a, patch_b):
-    return numpy.sum(squared_difference_vectorized(patch_apatch_b),axis=None)
+    return sum_of_squared_differences(patch_a, patch_b)
 
 def gather_patches(args):
     patch_locations = get_patch_locations_text_file(args)
@@ -242,6 +241,25 @@ def create_logistic_regression_model(face_patches, non_face_patches):
     print str(count)+" iterations before convergence."
     print 
     return w
+
+def get_logistic_regression_face_probabilities(image, w):
+    # entry [patch_y,patch_x] is the probability of the patch with its top left corner there being a face (0 if it's probably not a face or the patch doesn't fit in the image)
+    height,width = image.shape
+    face_probability_map = numpy.zeros([height,width],dtype='float')
+    for patch_y in xrange(height-PATCH_WIDTH+1):
+        for patch_x in xrange(width-PATCH_WIDTH+1):
+            patch = image[patch_y:patch_y+PATCH_WIDTH,patch_x:patch_x+PATCH_WIDTH]
+            x_i = numpy.append(patch.flatten(),numpy.array([1.0],dtype='float'))
+            face_probability = g(x_i, w)
+            if face_probability > 0.5:
+                face_probability_map[patch_y,patch_x] = face_probability
+    return face_probability_map
+
+def get_face_probability_map(get_face_probabilities, test_image, model):
+    # each patch only looks at the PATCH_WIDTH pixels below and to the right of it, so we can split the test image into tiles with a PATCH_WIDTH halo and score the tiles in parallel (see tiled_pipeline.py)
+    height,width = test_image.shape
+    face_probability_map = run_tiled(get_face_probabilities, test_image, PATCH_WIDTH, stage_args=(model,))
+    return face_probability_map[:height-PATCH_WIDTH,:width-PATCH_WIDTH]
     
 def use_logistic_regression_model_single_scale(args):
     print 
@@ -259,14 +277,7 @@ def use_logistic_regression_model_single_scale(args):
             continue
         num_valid_images += 1
         height,width = test_image.shape
-        face_probability_map = numpy.zeros([height-PATCH_WIDTH,width-PATCH_WIDTH],dtype='float')
-        for patch_y in xrange(height-PATCH_WIDTH):
-            for patch_x in xrange(width-PATCH_WIDTH):
-                patch = test_image[patch_y:patch_y+PATCH_WIDTH,patch_x:patch_x+PATCH_WIDTH]
-                x_i = numpy.append(patch.flatten(),numpy.array([1.0],dtype='float'))
-                face_probability = g(x_i, w)
-                if face_probability > 0.5:
-                    face_probability_map[patch_y,patch_x] = face_probability
+        face_probability_map = get_face_probability_map(get_logistic_regression_face_probabilities, test_image, w)
         if numpy.sum(face_probability_map,axis=None)>0:
             num_face_images += 1
             print test_image_file_name+" contains a face"
@@ -324,14 +335,7 @@ def use_logistic_regression_model_multi_scale(args):
             height,width = test_image.shape
             if height-PATCH_WIDTH<0 or width-PATCH_WIDTH<0:
                 break
-            face_probability_map = numpy.zeros([height-PATCH_WIDTH,width-PATCH_WIDTH],dtype='float')
-            for patch_y in xrange(height-PATCH_WIDTH):
-                for patch_x in xrange(width-PATCH_WIDTH):
-                    patch = test_image[patch_y:patch_y+PATCH_WIDTH,patch_x:patch_x+PATCH_WIDTH]
-                    x_i = numpy.append(patch.flatten(),numpy.array([1.0],dtype='float'))
-                    face_probability = g(x_i, w)
-                    if face_probability > 0.5:
-                        face_probability_map[patch_y,patch_x] = face_probability
+            face_probability_map = get_face_probability_map(get_logistic_regression_face_probabilities, test_image, w)
             face_found = face_found or numpy.sum(face_probability_map,axis=None)>0
             # Non-Maximum Suppression
             for patch_y in xrange(height-PATCH_WIDTH):
@@ -345,7 +349,7 @@ def use_logistic_regression_model_multi_scale(args):
                             else:
                                 max_found = True
             test_image = downsample_2d(test_image,2)
-            test_image = convolve(test_image, gaussian_kernel)
+            test_image = tiled_convolve(test_image, gaussian_kernel)
             face_probability_map_list.append(face_probability_map)
         out_image_height, out_image_width = out_image.shape[:2]
         claimed_spots_map = numpy.ones(out_image.shape,dtype='uint8')
@@ -515,6 +519,18 @@ def get_probability_is_non_face_via_gaussian_model(input_patch, model):
     non_face_Ek_determinant = model['non_face_Ek_determinant'] 
     return get_probability_via_gaussian_model(input_vector, non_face_mean_vector, non_face_Ek, non_face_Ek_determinant, model)
 
+def get_gaussian_model_face_probabilities(image, model):
+    # entry [patch_y,patch_x] is how much more likely it is that the patch with its top left corner there is a face rather than not (0 if it's not more likely or the patch doesn't fit in the image)
+    height,width = image.shape
+    face_probability_map = numpy.zeros([height,width],dtype='float')
+    for patch_y in xrange(height-PATCH_WIDTH+1):
+        for patch_x in xrange(width-PATCH_WIDTH+1):
+            patch = image[patch_y:patch_y+PATCH_WIDTH,patch_x:patch_x+PATCH_WIDTH]
+            probability_difference = get_probability_is_face_via_gaussian_model(patch, model) - get_probability_is_non_face_via_gaussian_model(patch, model)
+            if probability_difference > 0:
+                face_probability_map[patch_y,patch_x] = probability_difference
+    return face_probability_map
+
 def use_gaussian_model_single_scale(args):
     print 
     current_output_dir = os.path.abspath('./output')
@@ -531,13 +547,7 @@ def use_gaussian_model_single_scale(args):
             continue
         num_valid_images += 1
         height,width = test_image.shape
-        face_probability_map = numpy.zeros([height-PATCH_WIDTH,width-PATCH_WIDTH],dtype='float')
-        for patch_y in xrange(height-PATCH_WIDTH):
-            for patch_x in xrange(width-PATCH_WIDTH):
-                patch = test_image[patch_y:patch_y+PATCH_WIDTH,patch_x:patch_x+PATCH_WIDTH]
-                probability_difference = get_probability_is_face_via_gaussian_model(patch, gaussian_model) - get_probability_is_non_face_via_gaussian_model(patch, gaussian_model)
-                if probability_difference > 0:
-                    face_probability_map[patch_y,patch_x] = probability_difference
+        face_probability_map = get_face_probability_map(get_gaussian_model_face_probabilities, test_image, gaussian_model)
         if numpy.sum(face_probability_map,axis=None)>0:
             num_face_images += 1
             print test_image_file_name+" contains a face"
@@ -594,13 +604,7 @@ def use_gaussian_model_multi_scale(args):
             height,width = test_image.shape
             if height-PATCH_WIDTH<0 or width-PATCH_WIDTH<0:
                 break
-            face_probability_map = numpy.zeros([height-PATCH_WIDTH,width-PATCH_WIDTH],dtype='float')
-            for patch_y in xrange(height-PATCH_WIDTH):
-                for patch_x in xrange(width-PATCH_WIDTH):
-                    patch = test_image[patch_y:patch_y+PATCH_WIDTH,patch_x:patch_x+PATCH_WIDTH]
-                    probability_difference = get_probability_is_face_via_gaussian_model(patch, gaussian_model) - get_probability_is_non_face_via_gaussian_model(patch, gaussian_model)
-                    if probability_difference > 0:
-                        face_probability_map[patch_y,patch_x] = probability_difference
+            face_probability_map = get_face_probability_map(get_gaussian_model_face_probabilities, test_image, gaussian_model)
             face_found = face_found or numpy.sum(face_probability_map,axis=None)>0
             # Non-Maximum Suppression
             for patch_y in xrange(height-PATCH_WIDTH):
@@ -614,7 +618,7 @@ def use_gaussian_model_multi_scale(args):
                             else:
                                 max_found = True
             test_image = downsample_2d(test_image,2)
-            test_image = convolve(test_image, gaussian_kernel)
+            test_image = tiled_convolve(test_image, gaussian_kernel)
             face_probability_map_list.append(face_probability_map)
         out_image_height, out_image_width = out_image.shape[:2]
         claimed_spots_map = numpy.ones(out_image.shape,dtype='uint8')
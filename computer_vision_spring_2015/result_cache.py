@@ -0,0 +1,159 @@
+
+# Content addressed cache for the results of the detector scripts
+# A stage is one run of a detector script (e.g. canny_edge_detector.py) on one input image with one set of parameters.
+# Its results are stored under a key made from the hash of the input image, the script name, the parameters and the
+# hash of the code the script depends on, so a stage is only rerun when one of those actually changed.
+# The output directory of each stage gets a stamp file holding the key of the results it currently contains, which lets
+# us skip stages that are already up to date without touching their output at all.
+# Output directories from before the cache existed have an out.png but no stamp. They're stamped with their stage's current
+# key and treated as up to date rather than all being recomputed. Stages whose input image is missing can't be keyed, so they
+# aren't run and are reported as failed.
+
+import os
+import sys
+import shutil
+import hashlib
+import subprocess
+import multiprocessing
+
+from tiled_pipeline import NUM_PROCESSES_ENVIRONMENT_VARIABLE
+
+CACHE_DIR_NAME = '.result_cache'
+STAMP_FILE_NAME = '.result_cache_key'
+COMPLETE_FILE_NAME = '.complete'
+RESULT_FILE_NAME = 'out.png' # every detector script writes this one, older output directories are recognized by it
+
+# the modules every detector script pulls in besides itself
+SHARED_CODE_FILES = ['util.py',
+                     os.path.join(os.path.dirname(os.path.abspath(__file__)), 'image_util.py'),
+                     os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tiled_pipeline.py')]
+
+_file_hashes = dict()
+
+def file_hash(file_name):
+    # hashes are remembered per modification time and size, so a file that's rewritten gets hashed again
+    file_stat = os.stat(file_name)
+    file_hash_key = (os.path.abspath(file_name), file_stat.st_mtime, file_stat.st_size)
+    if file_hash_key not in _file_hashes:
+        hasher = hashlib.sha1()
+        with open(file_name, 'rb') as f:
+            for block in iter(lambda: f.read(1<<20), b''):
+                hasher.update(block)
+        _file_hashes[file_hash_key] = hasher.hexdigest()
+    return _file_hashes[file_hash_key]
+
+def code_version(script):
+    hasher = hashlib.sha1()
+    for code_file in [script]+SHARED_CODE_FILES:
+        if os.path.isfile(code_file):
+            hasher.update(file_hash(code_file).encode('ascii'))
+    return hasher.hexdigest()
+
+def get_cache_key(script, image, params):
+    hasher = hashlib.sha1()
+    for component in [file_hash(image), os.path.basename(script), repr([str(param) for param in params]), code_version(script)]:
+        hasher.update(component.encode('ascii'))
+        hasher.update(b'\0')
+    return hasher.hexdigest()
+
+def read_stamp(out_dir):
+    stamp_file_name = os.path.join(out_dir, STAMP_FILE_NAME)
+    if not os.path.isfile(stamp_file_name):
+        return None
+    with open(stamp_file_name, 'rt') as f:
+        return f.read().strip()
+
+def write_stamp(out_dir, key):
+    with open(os.path.join(out_dir, STAMP_FILE_NAME), 'wt') as f:
+        f.write(key)
+
+def get_job(script, image, params, out_dir):
+    # the key is None when the input image is missing
+    key = get_cache_key(script, image, params) if os.path.isfile(image) else None
+    return {'script':script, 'image':image, 'params':list(params), 'out_dir':out_dir, 'key':key}
+
+def adopt_unstamped_results(job):
+    # stamps an output directory from before the cache existed with the job's key, returns whether it did
+    if job['key'] is None or read_stamp(job['out_dir']) is not None or not os.path.isfile(os.path.join(job['out_dir'], RESULT_FILE_NAME)):
+        return False
+    write_stamp(job['out_dir'], job['key'])
+    return True
+
+def is_stale(job):
+    return read_stamp(job['out_dir']) != job['key']
+
+def _cache_entry_dir(job, cache_dir):
+    return os.path.join(cache_dir, job['key'])
+
+def _run_job(args):
+    # returns the job's key if the script succeeded, None otherwise
+    job, cache_dir, num_tiling_processes = args
+    entry_dir = _cache_entry_dir(job, cache_dir)
+    if os.path.isdir(entry_dir): # left over from an interrupted run
+        shutil.rmtree(entry_dir)
+    os.makedirs(entry_dir)
+    command = [sys.executable, job['script'], job['image']]+[str(param) for param in job['params']]+[entry_dir]
+    environment = dict(os.environ)
+    environment[NUM_PROCESSES_ENVIRONMENT_VARIABLE] = str(num_tiling_processes) # see tiled_pipeline.py
+    with open(os.devnull, 'wb') as devnull:
+        return_code = subprocess.call(command, stdout=devnull, stderr=devnull, env=environment)
+    if return_code != 0:
+        return None
+    open(os.path.join(entry_dir, COMPLETE_FILE_NAME), 'wt').close()
+    return job['key']
+
+def _link_or_copy(source, destination):
+    # results are hard linked from the cache so they don't take up disk space twice, they're copied when that's impossible
+    if os.path.lexists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except (OSError, AttributeError): # e.g. a different file system, or Windows under Python 2 which has no os.link
+        shutil.copy2(source, destination)
+
+def _copy_results(job, cache_dir):
+    entry_dir = _cache_entry_dir(job, cache_dir)
+    if not os.path.isdir(job['out_dir']):
+        os.makedirs(job['out_dir'])
+    for file_name in os.listdir(entry_dir):
+        if file_name != COMPLETE_FILE_NAME:
+            _link_or_copy(os.path.join(entry_dir, file_name), os.path.join(job['out_dir'], file_name))
+    write_stamp(job['out_dir'], job['key'])
+
+def run_jobs(jobs, cache_dir=CACHE_DIR_NAME, num_processes=None):
+    # Brings the output directories of all the jobs up to date. Stages whose output directory is already stamped with the
+    # right key are skipped, stages whose results are already in the cache are just copied over, and the rest are run
+    # in a process pool. Jobs that are independent of each other (e.g. different images) all run concurrently.
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    failed_jobs = [job for job in jobs if job['key'] is None]
+    jobs = [job for job in jobs if job['key'] is not None]
+    adopted_job_count = len([job for job in jobs if adopt_unstamped_results(job)])
+    if adopted_job_count > 0:
+        print ('%d stages have results from before the cache existed, they are treated as up to date' % adopted_job_count)
+    stale_jobs = [job for job in jobs if is_stale(job)]
+    jobs_to_run = []
+    keys_to_run = set()
+    for job in stale_jobs:
+        if not os.path.isfile(os.path.join(_cache_entry_dir(job, cache_dir), COMPLETE_FILE_NAME)) and job['key'] not in keys_to_run:
+            jobs_to_run.append(job)
+            keys_to_run.add(job['key'])
+    print ('%d of %d stages are stale, %d need to be recomputed' % (len(stale_jobs), len(jobs), len(jobs_to_run)))
+    if len(jobs_to_run) > 0:
+        if num_processes is None:
+            num_processes = multiprocessing.cpu_count()
+        num_processes = min(num_processes,len(jobs_to_run))
+        # the scripts tile their convolutions across processes too, so the cores are split between the scripts running at once
+        num_tiling_processes = max(1, multiprocessing.cpu_count()//num_processes)
+        pool = multiprocessing.Pool(processes=num_processes)
+        try:
+            finished_keys = set(pool.map(_run_job, [(job, cache_dir, num_tiling_processes) for job in jobs_to_run], chunksize=1))
+        finally:
+            pool.close()
+            pool.join()
+        failed_jobs += [job for job in jobs_to_run if job['key'] not in finished_keys]
+    for job in failed_jobs:
+        print ('Failed: '+' '.join([job['script'], job['image']]+[str(param) for param in job['params']])+(' (missing input image)' if job['key'] is None else ''))
+    for job in stale_jobs:
+        if os.path.isfile(os.path.join(_cache_entry_dir(job, cache_dir), COMPLETE_FILE_NAME)):
+            _copy_results(job, cache_dir)
@@ -0,0 +1,53 @@
+
+# Tests for image_util.py, run with pytest from this directory
+
+import math
+import numpy
+from image_util import round_vectorized, clamp, clamp_array, normalize, divide, divide_array, G, G2, get_gaussian_kernel, sum_of_squared_differences
+
+def test_round_vectorized():
+    values = numpy.array([[-2.5, -1.5, -0.5, -0.4], [0.4, 0.5, 1.5, 2.5]])
+    expected = numpy.array([[-3.0, -2.0, -1.0, -0.0], [0.0, 1.0, 2.0, 3.0]])
+    assert numpy.array_equal(round_vectorized(values), expected)
+
+def test_clamp_array():
+    values = numpy.random.uniform(-100, 400, size=(20, 30, 3))
+    expected = numpy.array([clamp(e) for e in values.flatten()]).reshape(values.shape)
+    assert numpy.array_equal(clamp_array(values), expected)
+    assert clamp_array(values).dtype == values.dtype
+
+def test_normalize_2d():
+    values = numpy.random.uniform(0, 10, size=(7, 9))
+    normalized = normalize(values)
+    assert numpy.allclose(normalized, values / numpy.sum(values))
+    assert numpy.isclose(numpy.sum(normalized), 1.0)
+
+def test_normalize_3d():
+    values = numpy.random.uniform(0, 10, size=(7, 9, 3))
+    normalized = normalize(values)
+    for channel in range(3):
+        assert numpy.allclose(normalized[:,:,channel], values[:,:,channel] / numpy.sum(values[:,:,channel]))
+    assert not numpy.shares_memory(normalized, values)
+
+def test_divide_array():
+    top = numpy.array([1.0, -1.0, 0.0, 6.0])
+    bottom = numpy.array([0.0, 0.0, 0.0, 3.0])
+    assert numpy.array_equal(divide_array(top, bottom), numpy.array([divide(t, b) for t, b in zip(top, bottom)]))
+
+def test_gaussians():
+    assert numpy.isclose(G(0.0, 1.0), 1.0/math.sqrt(2*math.pi))
+    assert numpy.isclose(G2(1.0, 2.0, 3.0), G(1.0, 3.0)*G(2.0, 3.0))
+
+def test_get_gaussian_kernel():
+    dim, sigma = 5, 1.5
+    kernel = get_gaussian_kernel(dim, sigma)
+    expected = numpy.array([[math.exp(-((y-dim//2)**2+(x-dim//2)**2)/(2.0*sigma*sigma)) for x in range(dim)] for y in range(dim)])
+    expected /= numpy.sum(expected)
+    assert kernel.shape == (dim, dim)
+    assert numpy.allclose(kernel, expected)
+    assert numpy.allclose(kernel, kernel.T)
+
+def test_sum_of_squared_differences():
+    a = numpy.array([[0, 10], [255, 3]], dtype='uint8')
+    b = numpy.array([[5, 0], [0, 3]], dtype='uint8')
+    assert sum_of_squared_differences(a, b) == 25+100+255*255
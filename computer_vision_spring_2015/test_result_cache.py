@@ -0,0 +1,94 @@
+
+# Tests for result_cache.py, run with pytest from this directory
+
+import os
+import multiprocessing
+import result_cache
+from result_cache import get_cache_key, get_job, is_stale, read_stamp, write_stamp, run_jobs
+
+def _write(file_name, contents):
+    with open(file_name, 'wt') as f:
+        f.write(contents)
+
+def test_cache_key_depends_on_image_params_and_code(tmpdir):
+    image = str(tmpdir.join('image.png'))
+    script = str(tmpdir.join('detector.py'))
+    _write(image, 'pixels')
+    _write(script, 'print 1')
+    key = get_cache_key(script, image, [9, 20, 40])
+    assert key == get_cache_key(script, image, [9, 20, 40])
+    assert key != get_cache_key(script, image, [9, 20, 50])
+    other_image = str(tmpdir.join('other_image.png'))
+    _write(other_image, 'other pixels')
+    assert key != get_cache_key(script, other_image, [9, 20, 40])
+
+def test_cache_key_changes_when_code_is_edited(tmpdir, monkeypatch):
+    image = str(tmpdir.join('image.png'))
+    script = str(tmpdir.join('detector.py'))
+    shared_code_file = str(tmpdir.join('util.py'))
+    _write(image, 'pixels')
+    _write(script, 'print 1')
+    _write(shared_code_file, 'x = 1')
+    monkeypatch.setattr(result_cache, 'SHARED_CODE_FILES', [shared_code_file])
+    key = get_cache_key(script, image, [9, 20, 40])
+    _write(script, 'print 12') # edits of a different length, so the key changes even if the modification time doesn't
+    edited_script_key = get_cache_key(script, image, [9, 20, 40])
+    assert edited_script_key != key
+    _write(shared_code_file, 'x = 12')
+    edited_shared_code_key = get_cache_key(script, image, [9, 20, 40])
+    assert edited_shared_code_key not in [key, edited_script_key]
+
+def test_stamp_marks_job_up_to_date(tmpdir):
+    image = str(tmpdir.join('image.png'))
+    script = str(tmpdir.join('detector.py'))
+    _write(image, 'pixels')
+    _write(script, 'print 1')
+    out_dir = str(tmpdir.mkdir('out'))
+    job = get_job(script, image, [1, 2], out_dir)
+    assert is_stale(job)
+    write_stamp(out_dir, job['key'])
+    assert not is_stale(job)
+    assert is_stale(get_job(script, image, [1, 3], out_dir))
+
+def test_missing_image_is_reported_as_failed(tmpdir, capsys):
+    script = str(tmpdir.join('detector.py'))
+    _write(script, 'print 1')
+    job = get_job(script, str(tmpdir.join('missing.png')), [1, 2], str(tmpdir.join('out')))
+    assert job['key'] is None
+    run_jobs([job], cache_dir=str(tmpdir.join('cache')))
+    assert 'Failed: '+script+' '+str(tmpdir.join('missing.png'))+' 1 2 (missing input image)' in capsys.readouterr().out
+    assert not os.path.exists(str(tmpdir.join('out')))
+
+def test_unstamped_results_are_up_to_date(tmpdir):
+    image = str(tmpdir.join('image.png'))
+    script = str(tmpdir.join('detector.py'))
+    _write(image, 'pixels')
+    _write(script, 'import sys; sys.exit(1)')
+    out_dir = str(tmpdir.mkdir('out'))
+    _write(os.path.join(out_dir, 'out.png'), 'old result')
+    job = get_job(script, image, [1, 2], out_dir)
+    run_jobs([job], cache_dir=str(tmpdir.join('cache')))
+    assert read_stamp(out_dir) == job['key']
+    with open(os.path.join(out_dir, 'out.png'), 'rt') as f:
+        assert f.read() == 'old result'
+
+def test_scripts_split_the_cores_for_tiling(tmpdir):
+    image = str(tmpdir.join('image.png'))
+    script = str(tmpdir.join('detector.py'))
+    _write(image, 'pixels')
+    _write(script, "import os, sys\nopen(os.path.join(sys.argv[-1], 'out.png'), 'wt').write(os.environ['TILED_PIPELINE_NUM_PROCESSES'])\n")
+    jobs = [get_job(script, image, [param], str(tmpdir.join('out_%d' % param))) for param in [1, 2]]
+    run_jobs(jobs, cache_dir=str(tmpdir.join('cache')), num_processes=2)
+    for job in jobs:
+        with open(os.path.join(job['out_dir'], 'out.png'), 'rt') as f:
+            assert int(f.read()) == max(1, multiprocessing.cpu_count()//2)
+
+def test_results_are_linked_from_the_cache(tmpdir):
+    image = str(tmpdir.join('image.png'))
+    script = str(tmpdir.join('detector.py'))
+    _write(image, 'pixels')
+    _write(script, "import os, sys\nopen(os.path.join(sys.argv[-1], 'out.png'), 'wt').write('result')\n")
+    job = get_job(script, image, [1], str(tmpdir.join('out')))
+    cache_dir = str(tmpdir.join('cache'))
+    run_jobs([job], cache_dir=cache_dir)
+    assert os.path.samefile(os.path.join(job['out_dir'], 'out.png'), os.path.join(cache_dir, job['key'], 'out.png'))
@@ -0,0 +1,46 @@
+
+# Tests for tiled_pipeline.py, run with pytest from this directory
+
+import numpy
+from image_util import convolve, get_gaussian_kernel
+import tiled_pipeline
+from tiled_pipeline import run_tiled, tiled_convolve, get_tiles
+
+def test_get_tiles():
+    tiles = get_tiles(10, 7, tile_size=4)
+    covered = numpy.zeros([10,7], dtype='int')
+    for y_start, y_end, x_start, x_end in tiles:
+        covered[y_start:y_end,x_start:x_end] += 1
+    assert numpy.all(covered == 1)
+
+def test_tiled_convolve_matches_convolve():
+    I = numpy.random.uniform(0, 255, size=(67, 45, 3))
+    kernel = get_gaussian_kernel(5, 2.0)
+    assert numpy.array_equal(tiled_convolve(I, kernel, tile_size=16, num_processes=3), convolve(I, kernel))
+
+def test_tiled_convolve_matches_convolve_with_zero_borders():
+    I = numpy.random.uniform(-10, 10, size=(50, 61))
+    kernel = numpy.ones([7,7])
+    assert numpy.array_equal(tiled_convolve(I, kernel, zero_borders=True, tile_size=8, num_processes=2), convolve(I, kernel, zero_borders=True))
+
+def window_sum(I, width):
+    # the sum of the width x width window with its top left corner at each pixel (0 where the window doesn't fit)
+    h, w = I.shape
+    sums = numpy.zeros([h,w])
+    for y in range(h-width+1):
+        for x in range(w-width+1):
+            sums[y,x] = numpy.sum(I[y:y+width,x:x+width])
+    return sums
+
+def test_run_tiled_with_one_sided_window():
+    I = numpy.random.uniform(0, 1, size=(40, 33))
+    tiled_sums = run_tiled(window_sum, I, 5, stage_args=(5,), tile_size=10, num_processes=2)
+    assert numpy.array_equal(tiled_sums[:40-5,:33-5], window_sum(I, 5)[:40-5,:33-5])
+
+def test_pool_is_reused_across_calls():
+    I = numpy.random.uniform(0, 1, size=(30, 30))
+    kernel = get_gaussian_kernel(3, 1.0)
+    tiled_convolve(I, kernel, tile_size=10, num_processes=2)
+    pool = tiled_pipeline._pool
+    assert numpy.array_equal(tiled_convolve(I, kernel, tile_size=10, num_processes=2), convolve(I, kernel))
+    assert tiled_pipeline._pool is pool
@@ -0,0 +1,88 @@
+
+# Tiled multi-process execution of image processing stages
+# An image is split into tiles, each tile is padded with a halo of neighboring pixels wide enough to cover the stage's kernel,
+# the padded tiles are processed in a process pool and the centers of the processed tiles are stitched back together.
+# A stage is any function that takes an image (plus extra args) and returns an image of the same height and width where each
+# output pixel only depends on input pixels at most halo pixels away. Stages that see the real image border (i.e. where the
+# halo gets clipped) behave exactly as they would on the whole image, so the stitched result is identical to running the
+# stage on the whole image.
+# The pool is started on first use and reused by every later call, since the detectors run many small convolutions and
+# starting a pool costs more than most of them. Each task carries its padded tile, so a call only copies the image once each way.
+# The number of processes defaults to the number of cores, or to the TILED_PIPELINE_NUM_PROCESSES environment variable when
+# it's set (e.g. by result_cache.py when it's already running several detector scripts at once).
+
+import os
+import multiprocessing
+import numpy
+
+from image_util import convolve
+
+DEFAULT_TILE_SIZE = 256
+# copying the tiles to and from the pool costs about as much as convolving with a 7x7 kernel, so smaller kernels aren't tiled
+# unless the number of processes is given explicitly
+MINIMUM_TILED_KERNEL_SIZE = 9*9
+NUM_PROCESSES_ENVIRONMENT_VARIABLE = 'TILED_PIPELINE_NUM_PROCESSES'
+
+_pool = None
+_pool_num_processes = None
+
+def default_num_processes():
+    return int(os.environ.get(NUM_PROCESSES_ENVIRONMENT_VARIABLE, multiprocessing.cpu_count()))
+
+def _get_pool(num_processes):
+    global _pool, _pool_num_processes
+    if _pool is None or _pool_num_processes != num_processes:
+        if _pool is not None:
+            _pool.close()
+            _pool.join()
+        _pool = multiprocessing.Pool(processes=num_processes)
+        _pool_num_processes = num_processes
+    return _pool
+
+def _process_tile(args):
+    # returns the center of the processed padded tile, i.e. the part of the output the tile is responsible for
+    stage, stage_args, padded_tile, center = args
+    center_y_start, center_y_end, center_x_start, center_x_end = center
+    padded_tile_result = numpy.asarray(stage(padded_tile, *stage_args), dtype='float')
+    return padded_tile_result[center_y_start:center_y_end,center_x_start:center_x_end]
+
+def _get_tile_tasks(I, tiles, halo, stage, stage_args):
+    I_h, I_w = I.shape[:2]
+    tasks = []
+    for y_start, y_end, x_start, x_end in tiles:
+        padded_y_start = max(y_start-halo,0) # the halo is clipped at the image border so that the stage sees the real border there
+        padded_y_end = min(y_end+halo,I_h)
+        padded_x_start = max(x_start-halo,0)
+        padded_x_end = min(x_end+halo,I_w)
+        center = (y_start-padded_y_start, y_end-padded_y_start, x_start-padded_x_start, x_end-padded_x_start)
+        tasks.append((stage, stage_args, I[padded_y_start:padded_y_end,padded_x_start:padded_x_end], center))
+    return tasks
+
+def get_tiles(I_h, I_w, tile_size=DEFAULT_TILE_SIZE):
+    return [ (y, min(y+tile_size,I_h), x, min(x+tile_size,I_w)) for y in range(0,I_h,tile_size) for x in range(0,I_w,tile_size) ]
+
+def run_tiled(stage, I0, halo, stage_args=(), output_trailing_shape=None, tile_size=DEFAULT_TILE_SIZE, num_processes=None):
+    # output_trailing_shape is the shape of each output pixel, e.g. (3,) for RGB or () for grayscale, it defaults to that of the input
+    I = numpy.asarray(I0, dtype='float')
+    I_h, I_w = I.shape[:2]
+    if output_trailing_shape is None:
+        output_trailing_shape = I.shape[2:]
+    output_shape = (I_h,I_w)+tuple(output_trailing_shape)
+    if num_processes is None:
+        num_processes = default_num_processes()
+    tiles = get_tiles(I_h, I_w, tile_size)
+    if len(tiles) < 2 or num_processes < 2: # not worth using any processes
+        return numpy.asarray(stage(I, *stage_args), dtype='float').reshape(output_shape)
+
+    output = numpy.empty(output_shape, dtype='float')
+    tile_results = _get_pool(num_processes).map(_process_tile, _get_tile_tasks(I, tiles, halo, stage, stage_args), chunksize=1)
+    for (y_start, y_end, x_start, x_end), tile_result in zip(tiles, tile_results):
+        output[y_start:y_end,x_start:x_end] = tile_result.reshape((y_end-y_start,x_end-x_start)+tuple(output_trailing_shape))
+    return output
+
+def tiled_convolve(I0, k, zero_borders=False, tile_size=DEFAULT_TILE_SIZE, num_processes=None): # drop in replacement for convolve() from image_util.py
+    k_h, k_w = k.shape
+    if num_processes is None and k_h*k_w < MINIMUM_TILED_KERNEL_SIZE:
+        return convolve(I0, k, zero_borders)
+    halo = max(k_h,k_w)//2
+    return run_tiled(convolve, I0, halo, stage_args=(k, zero_borders), tile_size=tile_size, num_processes=num_processes)
@@ -10,10 +10,16 @@
 # Imports #
 ###########
 
+import os
+import glob
+import gzip
 import json
-import tqdm
+import itertools
+import numpy as np
 import pandas as pd
-from typing import List, Tuple
+import pyarrow as pa
+import pyarrow.parquet as pq
+from typing import List, Tuple, Optional, Iterable, Generator
 
 from misc_utilities import *
 
@@ -21,19 +27,41 @@ from misc_utilities import *
 # Globals #
 ###########
 
-with warnings_suppressed():
-    tqdm.tqdm.pandas()
-
 # https://github.com/holtzy/D3-graph-gallery/blob/master/DATA/world.geojson
 WORLD_GEOJSON_FILE_LOCATION = './data/world.geojson'
 
 # https://www.transtats.bts.gov/DL_SelectFields.asp?Table_ID=258
-US_BUREAU_OF_TRANSPORTATION_STATISTICS_CSV_FILE_LOCATION = './data/us_bts_raw_data.csv'
+# e.g. ./data/us_bts_raw_data.csv, or one CSV per year to combine several years
+US_BUREAU_OF_TRANSPORTATION_STATISTICS_CSV_FILE_GLOB = './data/us_bts_raw_data*.csv'
+
+US_BTS_CACHE_DIR = './data/us_bts_cache/'
+US_BTS_CHUNK_SIZE = 1_000_000
+
+US_BTS_COLUMN_DTYPES = {
+    'PASSENGERS': np.float64,
+    'ORIGIN_CITY_MARKET_ID': np.int32, 'ORIGIN': 'category', 'ORIGIN_CITY_NAME': 'category',
+    'DEST_CITY_MARKET_ID': np.int32,   'DEST': 'category',   'DEST_CITY_NAME': 'category',
+}
+
+US_BTS_CACHE_SCHEMA = pa.schema([
+    (column_name, pa.dictionary(pa.int32(), pa.string()) if dtype == 'category' else pa.from_numpy_dtype(dtype))
+    for column_name, dtype in US_BTS_COLUMN_DTYPES.items()
+])
 
 # https://www.partow.net/miscellaneous/airportdatabase/
 GLOBAL_AIRPORT_DB_DATA_CSV_FILE_LOCATION = './data/GlobalAirportDatabase.txt'
 
 OUTPUT_GEOJSON_FILE_LOCATION = './data/processed_data.geojson'
+OUTPUT_NEWLINE_DELIMITED_GEOJSON_FILE_LOCATION = './data/processed_data.geojsonl'
+
+# map.js reads the uncompressed FeatureCollection, the gzipped and newline-delimited (one feature per line) outputs are for other consumers
+OUTPUT_GZIPPED = False
+OUTPUT_NEWLINE_DELIMITED = False
+
+# flight path coordinates are rounded to this many decimal places (about 11 meters), or written at full precision when None
+OUTPUT_COORDINATE_DECIMAL_PLACES: Optional[int] = 4
+
+FLIGHT_PATH_FEATURE_CHUNK_SIZE = 100_000
 
 #####################################
 # Landmass Data Gathering Utilities #
@@ -54,63 +82,115 @@ def generate_landmass_features() -> List[dict]:
 # Flight Path Data Gathering Utilities #
 ########################################
 
-CITY_MARKET_DATA_RELEVANT_COLUMNS = [
-    'PASSENGERS',
-    'DISTANCE',
-    'REGION',
-    'YEAR',
-    'QUARTER',
-    'MONTH',
-    'DISTANCE_GROUP',
-    'CLASS',
-    'ORIGIN_AIRPORT_ID', 'ORIGIN_AIRPORT_SEQ_ID', 'ORIGIN_CITY_MARKET_ID', 'ORIGIN', 'ORIGIN_CITY_NAME', 'ORIGIN_STATE_ABR', 'ORIGIN_STATE_NM',
-    'DEST_AIRPORT_ID',   'DEST_AIRPORT_SEQ_ID',   'DEST_CITY_MARKET_ID',   'DEST',   'DEST_CITY_NAME',   'DEST_STATE_ABR',   'DEST_STATE_NM',
-]
+def _us_bts_cache_file(csv_file: str) -> str:
+    '''The cache is keyed on the modification time and size of the CSV, so replacing the CSV invalidates it.'''
+    csv_file_stat = os.stat(csv_file)
+    return os.path.join(US_BTS_CACHE_DIR, f'{os.path.basename(csv_file)}.{csv_file_stat.st_mtime_ns}.{csv_file_stat.st_size}.parquet')
+
+def _read_us_bts_csv_chunks(csv_file: str) -> Generator[pd.DataFrame, None, None]:
+    with pd.read_csv(csv_file, usecols=list(US_BTS_COLUMN_DTYPES.keys()), dtype=US_BTS_COLUMN_DTYPES, chunksize=US_BTS_CHUNK_SIZE) as reader:
+        for chunk_df in reader:
+            yield chunk_df[chunk_df.PASSENGERS != 0.0]
+    return
+
+def read_us_bts_chunks(csv_file: str) -> Generator[pd.DataFrame, None, None]:
+    '''
+    Yields the rows with passengers of csv_file in chunks, only with the columns in US_BTS_COLUMN_DTYPES.
+    The first read of a CSV snapshots those chunks to Parquet as they're yielded, later reads stream from the snapshot instead.
+    '''
+    cache_file = _us_bts_cache_file(csv_file)
+    if os.path.isfile(cache_file):
+        for record_batch in pq.ParquetFile(cache_file).iter_batches(batch_size=US_BTS_CHUNK_SIZE):
+            yield record_batch.to_pandas()
+        return
+    os.makedirs(US_BTS_CACHE_DIR, exist_ok=True)
+    # snapshots of older versions of csv_file and snapshots left unfinished by earlier reads
+    for stale_cache_file_glob in ('*.parquet', '*.parquet.*.tmp'):
+        for stale_cache_file in glob.glob(os.path.join(US_BTS_CACHE_DIR, f'{glob.escape(os.path.basename(csv_file))}.{stale_cache_file_glob}')):
+            os.remove(stale_cache_file)
+    temporary_cache_file = f'{cache_file}.{os.getpid()}.tmp'
+    try:
+        with pq.ParquetWriter(temporary_cache_file, US_BTS_CACHE_SCHEMA) as parquet_writer:
+            for chunk_df in _read_us_bts_csv_chunks(csv_file):
+                parquet_writer.write_table(pa.Table.from_pandas(chunk_df, schema=US_BTS_CACHE_SCHEMA, preserve_index=False))
+                yield chunk_df
+        os.replace(temporary_cache_file, cache_file)
+    finally:
+        # the read was interrupted or the generator wasn't exhausted
+        if os.path.isfile(temporary_cache_file):
+            os.remove(temporary_cache_file)
+    return
+
+def aggregate_us_bts_chunk(chunk_df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    '''Returns the passengers of each pair of city markets and the distinct airports and city names of each city market.'''
+    passenger_flow_df = chunk_df.groupby(['ORIGIN_CITY_MARKET_ID', 'DEST_CITY_MARKET_ID'], sort=False, observed=True).PASSENGERS.sum().reset_index()
+    origin_city_market_airport_df = chunk_df[['ORIGIN_CITY_MARKET_ID', 'ORIGIN', 'ORIGIN_CITY_NAME']].set_axis(['CITY_MARKET_ID', 'AIRPORT', 'CITY_NAME'], axis=1)
+    dest_city_market_airport_df = chunk_df[['DEST_CITY_MARKET_ID', 'DEST', 'DEST_CITY_NAME']].set_axis(['CITY_MARKET_ID', 'AIRPORT', 'CITY_NAME'], axis=1)
+    city_market_airport_df = pd.concat([
+        city_market_airport_df.drop_duplicates().astype({'AIRPORT': str, 'CITY_NAME': str})
+        for city_market_airport_df in (origin_city_market_airport_df, dest_city_market_airport_df)
+    ]).drop_duplicates()
+    return passenger_flow_df, city_market_airport_df
+
+def merge_us_bts_aggregates(aggregates: Iterable[Tuple[pd.DataFrame, pd.DataFrame]]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    passenger_flow_dfs, city_market_airport_dfs = zip(*aggregates)
+    passenger_flow_df = pd.concat(passenger_flow_dfs).groupby(['ORIGIN_CITY_MARKET_ID', 'DEST_CITY_MARKET_ID']).PASSENGERS.sum().reset_index()
+    city_market_airport_df = pd.concat(city_market_airport_dfs).drop_duplicates()
+    return passenger_flow_df, city_market_airport_df
 
 def generate_city_market_dfs_from_us_bts_data() -> Tuple[pd.DataFrame, pd.DataFrame]:
-    raw_data_df = pd.read_csv(US_BUREAU_OF_TRANSPORTATION_STATISTICS_CSV_FILE_LOCATION)
-    relevant_df = raw_data_df[CITY_MARKET_DATA_RELEVANT_COLUMNS]
-    relevant_df = relevant_df[relevant_df.PASSENGERS != 0.0]
-    passenger_flow_df = relevant_df[['ORIGIN_CITY_MARKET_ID', 'DEST_CITY_MARKET_ID', 'PASSENGERS']]
-    passenger_flow_df = passenger_flow_df.groupby(['ORIGIN_CITY_MARKET_ID', 'DEST_CITY_MARKET_ID']).PASSENGERS.sum().reset_index()
-    origin_city_market_id_info_df = relevant_df[['ORIGIN_CITY_MARKET_ID', 'ORIGIN', 'ORIGIN_CITY_NAME']].rename(columns={'ORIGIN_CITY_MARKET_ID': 'CITY_MARKET_ID', 'ORIGIN': 'AIRPORT', 'ORIGIN_CITY_NAME': 'CITY_NAME'})
-    dest_city_market_id_info_df = relevant_df[['DEST_CITY_MARKET_ID', 'DEST', 'DEST_CITY_NAME']].rename(columns={'DEST_CITY_MARKET_ID': 'CITY_MARKET_ID', 'DEST': 'AIRPORT', 'DEST_CITY_NAME': 'CITY_NAME'})
-    city_market_id_info_df = pd.concat([origin_city_market_id_info_df, dest_city_market_id_info_df])
-    city_market_id_info_df = city_market_id_info_df.groupby('CITY_MARKET_ID').agg({'AIRPORT': list, 'CITY_NAME': list})
-    city_market_id_info_df = pd.DataFrame(city_market_id_info_df.progress_apply(lambda row: list(zip(*set(zip(row.AIRPORT, row.CITY_NAME)))), axis=1).tolist(), columns=['AIRPORT', 'CITY_NAME']).set_index(city_market_id_info_df.index)    
+    '''Each chunk of each CSV is folded into the running aggregates as soon as it's read, so only one chunk of raw data is ever in memory.'''
+    csv_files = sorted(glob.glob(US_BUREAU_OF_TRANSPORTATION_STATISTICS_CSV_FILE_GLOB))
+    assert len(csv_files) > 0, f"No BTS data matches {US_BUREAU_OF_TRANSPORTATION_STATISTICS_CSV_FILE_GLOB}"
+    aggregates: List[Tuple[pd.DataFrame, pd.DataFrame]] = []
+    for csv_file in csv_files:
+        for chunk_df in read_us_bts_chunks(csv_file):
+            aggregates = [merge_us_bts_aggregates(aggregates + [aggregate_us_bts_chunk(chunk_df)])]
+    assert len(aggregates) == 1, "BTS data has no flights with passengers"
+    passenger_flow_df, city_market_airport_df = aggregates[0]
+    city_market_id_info_df = city_market_airport_df.groupby('CITY_MARKET_ID').agg({'AIRPORT': tuple, 'CITY_NAME': tuple})
     return passenger_flow_df, city_market_id_info_df
 
 GLOBAL_AIRPORT_DB_COLUMN_NAMES = ['ICAO_Code', 'IATA_Code', 'Airport_Name', 'City_Town', 'Country', 'Latitude_Degrees', 'Latitude_Minutes', 'Latitude_Seconds', 'Latitude_Direction', 'Longitude_Degrees', 'Longitude_Minutes', 'Longitude_Seconds', 'Longitude_Direction', 'Altitude', 'Latitude_Decimal_Degrees', 'Longitude_Decimal_Degrees']
 
+def read_airport_coordinates_df() -> pd.DataFrame:
+    airports_df = pd.read_csv(GLOBAL_AIRPORT_DB_DATA_CSV_FILE_LOCATION, sep=':', header=None, names=GLOBAL_AIRPORT_DB_COLUMN_NAMES,
+                              usecols=['IATA_Code', 'Latitude_Decimal_Degrees', 'Longitude_Decimal_Degrees'], keep_default_na=False, na_values=['', 'N/A'])
+    return airports_df.dropna(subset=['IATA_Code'])
+
+def generate_city_market_coordinate_index(city_market_id_info_df: pd.DataFrame, airports_df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Indexed by CITY_MARKET_ID with the mean coordinates of all the airport database entries of the city market's airports as LAT and LONG,
+    along with the city market's AIRPORTS and CITY_NAMES. City markets none of whose airports are in the airport database are left out.
+    '''
+    city_market_airports_df = city_market_id_info_df.AIRPORT.explode().rename('IATA_Code').reset_index()
+    city_market_coordinates_df = city_market_airports_df.merge(airports_df, on='IATA_Code') \
+                                                         .groupby('CITY_MARKET_ID')[['Latitude_Decimal_Degrees', 'Longitude_Decimal_Degrees']] \
+                                                         .mean() \
+                                                         .rename(columns={'Latitude_Decimal_Degrees': 'LAT', 'Longitude_Decimal_Degrees': 'LONG'})
+    unmatched_airports = np.setdiff1d(city_market_airports_df.IATA_Code.unique(), airports_df.IATA_Code.unique())
+    if len(unmatched_airports) > 0:
+        print(f'{len(unmatched_airports)} airports are missing from the airport database: {", ".join(unmatched_airports)}')
+    return city_market_coordinates_df.join(city_market_id_info_df[['AIRPORT', 'CITY_NAME']].rename(columns={'AIRPORT': 'AIRPORTS', 'CITY_NAME': 'CITY_NAMES'}))
+
 def integrate_city_market_df_with_geodata(passenger_flow_df: pd.DataFrame, city_market_id_info_df: pd.DataFrame) -> pd.DataFrame:
-    airports_df = pd.read_csv(GLOBAL_AIRPORT_DB_DATA_CSV_FILE_LOCATION, sep=':', header=None, names=GLOBAL_AIRPORT_DB_COLUMN_NAMES)
-    city_market_id_info_df_with_geodata = city_market_id_info_df.progress_apply(lambda x: pd.Series(list(x.AIRPORT)), axis=1) \
-                                                                .stack() \
-                                                                .reset_index(level=1, drop=True) \
-                                                                .to_frame('AIRPORT') \
-                                                                .reset_index() \
-                                                                .merge(airports_df[['IATA_Code', 'Latitude_Decimal_Degrees', 'Longitude_Decimal_Degrees']], left_on='AIRPORT', right_on='IATA_Code') \
-                                                                .drop(['IATA_Code'], axis=1) \
-                                                                .groupby('CITY_MARKET_ID') \
-                                                                .mean() \
-                                                                .reset_index() \
-                                                                .set_index('CITY_MARKET_ID') \
-                                                                .join(city_market_id_info_df[['AIRPORT', 'CITY_NAME']])
-    passenger_flow_df_with_geodata = passenger_flow_df.merge(city_market_id_info_df_with_geodata[['Latitude_Decimal_Degrees','Longitude_Decimal_Degrees']]
-                                                             .rename(columns={'Latitude_Decimal_Degrees':'ORIG_LAT', 'Longitude_Decimal_Degrees':'ORIG_LONG'}),
-                                                             right_on='CITY_MARKET_ID', left_on='ORIGIN_CITY_MARKET_ID') \
-                                                      .merge(city_market_id_info_df_with_geodata[['Latitude_Decimal_Degrees','Longitude_Decimal_Degrees']] \
-                                                             .rename(columns={'Latitude_Decimal_Degrees':'DEST_LAT', 'Longitude_Decimal_Degrees':'DEST_LONG'}),
-                                                             right_on='CITY_MARKET_ID', left_on='DEST_CITY_MARKET_ID')
-    passenger_flow_df_with_geodata = pd.concat([
-        passenger_flow_df_with_geodata,
-        pd.DataFrame(passenger_flow_df_with_geodata.progress_apply(lambda row: (city_market_id_info_df.loc[row.ORIGIN_CITY_MARKET_ID].AIRPORT,city_market_id_info_df.loc[row.ORIGIN_CITY_MARKET_ID].CITY_NAME), axis=1).tolist(),
-                     columns=['ORIGIN_CITY_AIRPORTS', 'ORIGIN_CITY_NAMES']),
-        pd.DataFrame(passenger_flow_df_with_geodata.progress_apply(lambda row: (city_market_id_info_df.loc[row.DEST_CITY_MARKET_ID].AIRPORT,city_market_id_info_df.loc[row.DEST_CITY_MARKET_ID].CITY_NAME), axis=1).tolist(),
-                     columns=['DEST_CITY_AIRPORTS', 'DEST_CITY_NAMES'])
-    ], axis=1)
-    passenger_flow_df_with_geodata = passenger_flow_df_with_geodata[passenger_flow_df_with_geodata.ORIGIN_CITY_MARKET_ID != passenger_flow_df_with_geodata.DEST_CITY_MARKET_ID]
-    passenger_flow_df_with_geodata = passenger_flow_df_with_geodata[passenger_flow_df_with_geodata.PASSENGERS > 0]
+    '''Looks up the origin and destination city markets of all the flows in one pass over the city market index. Flows of city markets without coordinates are dropped.'''
+    city_market_coordinate_index = generate_city_market_coordinate_index(city_market_id_info_df, read_airport_coordinates_df())
+    passenger_flow_df = passenger_flow_df[(passenger_flow_df.ORIGIN_CITY_MARKET_ID != passenger_flow_df.DEST_CITY_MARKET_ID) & (passenger_flow_df.PASSENGERS > 0)]
+    city_market_ids = np.concatenate([passenger_flow_df.ORIGIN_CITY_MARKET_ID.to_numpy(), passenger_flow_df.DEST_CITY_MARKET_ID.to_numpy()])
+    origin_positions, dest_positions = np.split(city_market_coordinate_index.index.get_indexer(city_market_ids), 2)
+    matched_mask = (origin_positions >= 0) & (dest_positions >= 0)
+    if not matched_mask.all():
+        unmatched_city_market_ids = np.unique(city_market_ids[np.concatenate([origin_positions, dest_positions]) < 0])
+        print(f'Dropping {np.count_nonzero(~matched_mask)} flows ({passenger_flow_df.PASSENGERS.to_numpy()[~matched_mask].sum()} passengers) '
+              f'of {len(unmatched_city_market_ids)} city markets without coordinates: {", ".join(map(str, unmatched_city_market_ids))}')
+    passenger_flow_df_with_geodata = passenger_flow_df[matched_mask].reset_index(drop=True)
+    for prefix, positions, coordinate_column_prefix in (('ORIGIN', origin_positions[matched_mask], 'ORIG'), ('DEST', dest_positions[matched_mask], 'DEST')):
+        city_market_df = city_market_coordinate_index.iloc[positions]
+        passenger_flow_df_with_geodata[f'{coordinate_column_prefix}_LAT'] = city_market_df.LAT.to_numpy()
+        passenger_flow_df_with_geodata[f'{coordinate_column_prefix}_LONG'] = city_market_df.LONG.to_numpy()
+        passenger_flow_df_with_geodata[f'{prefix}_CITY_AIRPORTS'] = city_market_df.AIRPORTS.to_numpy()
+        passenger_flow_df_with_geodata[f'{prefix}_CITY_NAMES'] = city_market_df.CITY_NAMES.to_numpy()
     return passenger_flow_df_with_geodata
 
 def generate_passenger_flow_df() -> pd.DataFrame:
@@ -118,50 +198,68 @@ def generate_passenger_flow_df() -> pd.DataFrame:
     passenger_flow_df = integrate_city_market_df_with_geodata(passenger_flow_df, city_market_id_info_df)
     return passenger_flow_df
 
-def generate_flight_path_feature_from_passenger_flow_row(passenger_flow_row: pd.Series) -> dict:
-    properties = {'information-type': 'flight_path'}
-    properties['ORIGIN_CITY_MARKET_ID'] = passenger_flow_row.ORIGIN_CITY_MARKET_ID
-    properties['DEST_CITY_MARKET_ID'] = passenger_flow_row.DEST_CITY_MARKET_ID
-    properties['PASSENGERS'] = passenger_flow_row.PASSENGERS
-    properties['ORIGIN_CITY_AIRPORTS'] = list(passenger_flow_row.ORIGIN_CITY_AIRPORTS)
-    properties['ORIGIN_CITY_NAMES'] = list(passenger_flow_row.ORIGIN_CITY_NAMES)
-    assert len(properties['ORIGIN_CITY_AIRPORTS']) == len(properties['ORIGIN_CITY_NAMES'])
-    assert isinstance(properties['ORIGIN_CITY_AIRPORTS'], list)
-    assert isinstance(properties['ORIGIN_CITY_NAMES'], list)
-    properties['DEST_CITY_AIRPORTS'] = list(passenger_flow_row.DEST_CITY_AIRPORTS)
-    properties['DEST_CITY_NAMES'] = list(passenger_flow_row.DEST_CITY_NAMES)
-    assert len(properties['DEST_CITY_AIRPORTS']) == len(properties['DEST_CITY_NAMES'])
-    assert isinstance(properties['DEST_CITY_AIRPORTS'], list)
-    assert isinstance(properties['DEST_CITY_NAMES'], list)
-    coordinates = [[passenger_flow_row.ORIG_LONG, passenger_flow_row.ORIG_LAT], [passenger_flow_row.DEST_LONG, passenger_flow_row.DEST_LAT]]
-    path_feature = {
-        'type':'Feature',
-        'properties': properties,
-        'geometry': {
-	    'type': 'LineString',
-	    'coordinates': coordinates,
-        }
+def _city_market_json_fragments(passenger_flow_df: pd.DataFrame, prefix: str) -> pd.Series:
+    '''The JSON of the airports and city names of each flow's city market, which is only serialized once per city market.'''
+    city_market_df = passenger_flow_df.drop_duplicates(f'{prefix}_CITY_MARKET_ID').set_index(f'{prefix}_CITY_MARKET_ID')
+    city_market_id_to_json_fragment_map = {
+        city_market_id: f'"{prefix}_CITY_AIRPORTS":{json.dumps(list(airports), separators=(",", ":"))},"{prefix}_CITY_NAMES":{json.dumps(list(city_names), separators=(",", ":"))}'
+        for city_market_id, airports, city_names in zip(city_market_df.index, city_market_df[f'{prefix}_CITY_AIRPORTS'], city_market_df[f'{prefix}_CITY_NAMES'])
     }
-    return path_feature
+    return passenger_flow_df[f'{prefix}_CITY_MARKET_ID'].map(city_market_id_to_json_fragment_map)
 
-def generate_all_flight_path_features() -> List[dict]:
+def _coordinate_json_strings(coordinate_series: pd.Series) -> pd.Series:
+    if OUTPUT_COORDINATE_DECIMAL_PLACES is not None:
+        coordinate_series = coordinate_series.round(OUTPUT_COORDINATE_DECIMAL_PLACES)
+    return coordinate_series.astype(float).astype(str)
+
+def generate_flight_path_feature_json_strings(passenger_flow_df: pd.DataFrame) -> pd.Series:
+    '''Compact JSON of the flight path feature of each flow, built a column at a time.'''
+    return '{"type":"Feature","properties":{"information-type":"flight_path","ORIGIN_CITY_MARKET_ID":' + passenger_flow_df.ORIGIN_CITY_MARKET_ID.astype(str) + \
+        ',"DEST_CITY_MARKET_ID":' + passenger_flow_df.DEST_CITY_MARKET_ID.astype(str) + \
+        ',"PASSENGERS":' + passenger_flow_df.PASSENGERS.astype(str) + \
+        ',' + _city_market_json_fragments(passenger_flow_df, 'ORIGIN') + \
+        ',' + _city_market_json_fragments(passenger_flow_df, 'DEST') + \
+        '},"geometry":{"type":"LineString","coordinates":[[' + _coordinate_json_strings(passenger_flow_df.ORIG_LONG) + ',' + _coordinate_json_strings(passenger_flow_df.ORIG_LAT) + \
+        '],[' + _coordinate_json_strings(passenger_flow_df.DEST_LONG) + ',' + _coordinate_json_strings(passenger_flow_df.DEST_LAT) + ']]}}'
+
+def generate_all_flight_path_feature_json_strings() -> Generator[str, None, None]:
     passenger_flow_df = generate_passenger_flow_df()
-    flight_path_features = eager_map(generate_flight_path_feature_from_passenger_flow_row, passenger_flow_df.itertuples())
-    return flight_path_features
+    for chunk_start in range(0, len(passenger_flow_df), FLIGHT_PATH_FEATURE_CHUNK_SIZE):
+        yield from generate_flight_path_feature_json_strings(passenger_flow_df.iloc[chunk_start:chunk_start+FLIGHT_PATH_FEATURE_CHUNK_SIZE])
+    return
+
+#############################
+# GeoJSON Writing Utilities #
+#############################
+
+def output_file_location() -> str:
+    file_location = OUTPUT_NEWLINE_DELIMITED_GEOJSON_FILE_LOCATION if OUTPUT_NEWLINE_DELIMITED else OUTPUT_GEOJSON_FILE_LOCATION
+    return file_location + '.gz' if OUTPUT_GZIPPED else file_location
+
+def write_features(feature_json_strings: Iterable[str], file_location: str) -> None:
+    '''Writes the features as they come, either as a FeatureCollection or one feature per line.'''
+    with (gzip.open(file_location, 'wt', encoding='utf-8') if OUTPUT_GZIPPED else open(file_location, 'w', encoding='utf-8')) as file_handle:
+        if OUTPUT_NEWLINE_DELIMITED:
+            for feature_json_string in feature_json_strings:
+                file_handle.write(feature_json_string)
+                file_handle.write('\n')
+        else:
+            file_handle.write('{"type":"FeatureCollection","features":[')
+            for feature_index, feature_json_string in enumerate(feature_json_strings):
+                if feature_index != 0:
+                    file_handle.write(',')
+                file_handle.write(feature_json_string)
+            file_handle.write(']}')
+    return
 
 ##########
 # Driver #
 ##########
 
-def create_geojson_data_from_features(features: list) -> dict:
-    return {'type': 'FeatureCollection', 'features': features}
-
 @debug_on_error
 def process_data() -> None:
-    features = generate_all_flight_path_features() + generate_landmass_features()
-    final_geojson_data = create_geojson_data_from_features(features)
-    with open(OUTPUT_GEOJSON_FILE_LOCATION, 'w') as file_handle:
-        json.dump(final_geojson_data, file_handle, indent=4)
+    landmass_feature_json_strings = (json.dumps(feature, separators=(',', ':')) for feature in generate_landmass_features())
+    write_features(itertools.chain(generate_all_flight_path_feature_json_strings(), landmass_feature_json_strings), output_file_location())
     return
 
 if __name__ == '__main__':
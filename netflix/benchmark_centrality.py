@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+
+"""
+Compares exact and pivot sampled betweenness and closeness centrality (see centrality.py) on the k-core graphs from preprocess.py.
+Reports the time taken and the error of the approximation for each k-core. NetworkX timings are included for the smaller k-cores.
+"""
+
+###########
+# Imports #
+###########
+
+import time
+import numpy as np
+import networkx as nx
+from typing import Callable, Tuple
+
+from misc_utilities import debug_on_error
+from csr_graph import CSRGraph, csr_graph_to_networkx, csr_graph_number_of_nodes, csr_graph_number_of_edges
+from centrality import betweenness_and_closeness_centrality
+from preprocess import load_raw_data, project_graphs, generate_k_core_graphs
+
+###########
+# Globals #
+###########
+
+NUMBER_OF_PIVOTS_CHOICES = [100, 400]
+
+NETWORKX_MAXIMUM_NUMBER_OF_NODES = 3000
+
+##############
+# Benchmarks #
+##############
+
+def _time_call(func: Callable, *args, **kwargs) -> Tuple[float, object]:
+    start_time = time.time()
+    result = func(*args, **kwargs)
+    end_time = time.time()
+    return end_time - start_time, result
+
+def benchmark_graph(graph_name: str, graph: CSRGraph) -> None:
+    number_of_nodes = csr_graph_number_of_nodes(graph)
+    print(f'{graph_name}: {number_of_nodes} nodes, {csr_graph_number_of_edges(graph)} edges')
+    if number_of_nodes == 0:
+        return
+    exact_time, (exact_betweenness, exact_closeness) = _time_call(betweenness_and_closeness_centrality, graph)
+    print(f'    exact: {exact_time:.3f} seconds')
+    for number_of_pivots in NUMBER_OF_PIVOTS_CHOICES:
+        if number_of_pivots >= number_of_nodes:
+            continue
+        approximate_time, (approximate_betweenness, approximate_closeness) = _time_call(betweenness_and_closeness_centrality, graph, number_of_pivots=number_of_pivots)
+        betweenness_errors = np.abs(approximate_betweenness - exact_betweenness)
+        closeness_errors = np.abs(approximate_closeness - exact_closeness)
+        print(f'    {number_of_pivots} pivots: {approximate_time:.3f} seconds, '
+              f'betweenness error max {betweenness_errors.max():.3g} mean {betweenness_errors.mean():.3g}, '
+              f'closeness error max {closeness_errors.max():.3g} mean {closeness_errors.mean():.3g}')
+    if number_of_nodes <= NETWORKX_MAXIMUM_NUMBER_OF_NODES:
+        nx_graph = csr_graph_to_networkx(graph)
+        betweenness_time, _ = _time_call(nx.betweenness_centrality, nx_graph)
+        closeness_time, _ = _time_call(nx.closeness_centrality, nx_graph)
+        print(f'    networkx: {betweenness_time:.3f} seconds for betweenness, {closeness_time:.3f} seconds for closeness')
+    return
+
+def benchmark_centrality() -> None:
+    movies_df = load_raw_data()
+    full_projected_actors_graph, full_projected_directors_graph = project_graphs(movies_df)
+    k_to_actor_k_core_graph_map, k_to_director_k_core_graph_map = generate_k_core_graphs(full_projected_actors_graph, full_projected_directors_graph)
+    for k, graph in k_to_actor_k_core_graph_map.items():
+        benchmark_graph(f'Actor {k}-core', graph)
+    for k, graph in k_to_director_k_core_graph_map.items():
+        benchmark_graph(f'Director {k}-core', graph)
+    return
+
+########
+# Main #
+########
+
+@debug_on_error
+def main() -> None:
+    benchmark_centrality()
+    return
+
+if __name__ == '__main__':
+    main()
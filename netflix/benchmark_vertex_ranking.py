@@ -0,0 +1,114 @@
+#!/usr/bin/python3
+
+"""
+Times the sparse linear algebra vertex rankings (see vertex_ranking.py) on the nested k-cores of a large random graph,
+cold started and warm started from the previous k-core, and checks them against NetworkX on a smaller graph.
+"""
+
+###########
+# Imports #
+###########
+
+import time
+import numpy as np
+import networkx as nx
+import scipy.sparse
+from typing import Callable, Tuple
+
+from misc_utilities import debug_on_error
+from csr_graph import CSRGraph, csr_graph_from_sparse_matrix, csr_graph_to_networkx, csr_graph_number_of_nodes, csr_graph_number_of_edges, core_numbers, k_core_subgraph
+from vertex_ranking import pagerank, katz_centrality, eigenvector_centrality, hits, warm_start_values
+
+###########
+# Globals #
+###########
+
+LARGE_GRAPH_NUMBER_OF_NODES = 200_000
+LARGE_GRAPH_NUMBER_OF_EDGES = 2_000_000
+LARGE_GRAPH_K_CORE_CHOICES_FOR_K = [0, 10, 20, 40, 60, 80]
+
+NETWORKX_COMPARISON_NUMBER_OF_NODES = 2_000
+NETWORKX_COMPARISON_NUMBER_OF_EDGES = 20_000
+
+# small enough to be below 1 / the largest eigenvalue of the large graph so that Katz centrality converges
+KATZ_ALPHA = 0.001
+
+RANKING_NAME_TO_FUNCTIONS_MAP = {
+    'pagerank': (lambda graph, initial_values=None: pagerank(graph, initial_values=initial_values),
+                 lambda nx_graph: nx.pagerank(nx_graph)),
+    'katz': (lambda graph, initial_values=None: katz_centrality(graph, KATZ_ALPHA, initial_values=initial_values),
+             lambda nx_graph: nx.katz_centrality(nx_graph, KATZ_ALPHA)),
+    'eigenvector': (lambda graph, initial_values=None: eigenvector_centrality(graph, max_iter=1000, initial_values=initial_values),
+                    lambda nx_graph: nx.eigenvector_centrality(nx_graph, max_iter=1000)),
+    'hits': (lambda graph, initial_values=None: hits(graph, max_iter=1000, initial_values=initial_values)[1],
+             lambda nx_graph: nx.hits(nx_graph, max_iter=1000)[1]),
+}
+
+##############
+# Benchmarks #
+##############
+
+def _time_call(func: Callable, *args, **kwargs) -> Tuple[float, object]:
+    start_time = time.time()
+    result = func(*args, **kwargs)
+    end_time = time.time()
+    return end_time - start_time, result
+
+def random_graph(number_of_nodes: int, number_of_edges: int, seed: int) -> CSRGraph:
+    '''Random graph with a heavy tailed degree distribution so that its k-cores are nontrivial.'''
+    generator = np.random.default_rng(seed)
+    node_weights = 1.0 / np.arange(1, number_of_nodes+1) ** 0.8
+    node_weights /= node_weights.sum()
+    sources = generator.choice(number_of_nodes, size=number_of_edges, p=node_weights)
+    targets = generator.choice(number_of_nodes, size=number_of_edges, p=node_weights)
+    adjacency_matrix = scipy.sparse.coo_matrix((np.ones(number_of_edges), (sources, targets)), shape=(number_of_nodes, number_of_nodes)).tocsr()
+    adjacency_matrix = adjacency_matrix + adjacency_matrix.T
+    adjacency_matrix.setdiag(0)
+    adjacency_matrix.eliminate_zeros()
+    adjacency_matrix.data[:] = 1
+    return csr_graph_from_sparse_matrix(adjacency_matrix, np.array([f'node_{node_id}' for node_id in range(number_of_nodes)], dtype=object))
+
+def benchmark_against_networkx() -> None:
+    graph = random_graph(NETWORKX_COMPARISON_NUMBER_OF_NODES, NETWORKX_COMPARISON_NUMBER_OF_EDGES, seed=0)
+    nx_graph = csr_graph_to_networkx(graph)
+    print(f'NetworkX comparison graph: {csr_graph_number_of_nodes(graph)} nodes, {csr_graph_number_of_edges(graph)} edges')
+    for ranking_name, (ranking_function, nx_ranking_function) in RANKING_NAME_TO_FUNCTIONS_MAP.items():
+        sparse_time, values = _time_call(ranking_function, graph)
+        nx_time, node_to_value_map = _time_call(nx_ranking_function, nx_graph)
+        nx_values = np.array([node_to_value_map[node_name] for node_name in graph.node_names])
+        print(f'    {ranking_name}: {sparse_time:.3f} seconds vs {nx_time:.3f} seconds for NetworkX, max absolute difference {np.abs(values - nx_values).max():.3g}')
+    return
+
+def benchmark_warm_starts() -> None:
+    graph = random_graph(LARGE_GRAPH_NUMBER_OF_NODES, LARGE_GRAPH_NUMBER_OF_EDGES, seed=1)
+    graph_core_numbers = core_numbers(graph)
+    k_core_graphs = [k_core_subgraph(graph, graph_core_numbers, k) for k in LARGE_GRAPH_K_CORE_CHOICES_FOR_K]
+    for k, k_core_graph in zip(LARGE_GRAPH_K_CORE_CHOICES_FOR_K, k_core_graphs):
+        print(f'{k}-core: {csr_graph_number_of_nodes(k_core_graph)} nodes, {csr_graph_number_of_edges(k_core_graph)} edges')
+    for ranking_name, (ranking_function, _) in RANKING_NAME_TO_FUNCTIONS_MAP.items():
+        cold_total_time = 0.0
+        warm_total_time = 0.0
+        previous_graph, previous_values = None, None
+        for k_core_graph in k_core_graphs:
+            cold_time, _ = _time_call(ranking_function, k_core_graph)
+            initial_values = None if previous_graph is None else warm_start_values(previous_values, previous_graph, k_core_graph)
+            warm_time, values = _time_call(ranking_function, k_core_graph, initial_values=initial_values)
+            cold_total_time += cold_time
+            warm_total_time += warm_time
+            previous_graph, previous_values = k_core_graph, values
+        print(f'    {ranking_name}: {cold_total_time:.3f} seconds cold started vs {warm_total_time:.3f} seconds warm started over all k-cores')
+    return
+
+########
+# Main #
+########
+
+@debug_on_error
+def main() -> None:
+    benchmark_against_networkx()
+    print()
+    benchmark_warm_starts()
+    return
+
+if __name__ == '__main__':
+    main()
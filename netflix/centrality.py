@@ -0,0 +1,153 @@
+#!/usr/bin/python3
+
+"""
+Betweenness and closeness centrality over CSR graphs.
+
+Both come out of the same breadth first searches (Brandes' algorithm), one per source node. Each search expands a whole BFS level
+at a time with numpy and accumulates dependencies back up the BFS DAG a level at a time.
+
+In exact mode every node is a source and the sources are split across worker processes that attach to the graph via its graph store handle.
+The sums over the searches are additive, so the sources can also be split across separate jobs whose sums get added up before finalizing
+(see accumulate_betweenness_and_closeness and finalize_betweenness_and_closeness).
+In approximate mode only a sample of pivot sources is searched and each node's totals are scaled up by the size of its connected component
+over the number of pivots in it (Brandes & Pich). Connected components without any sampled pivots are searched exhaustively.
+"""
+
+###########
+# Imports #
+###########
+
+import math
+import numpy as np
+import scipy.sparse.csgraph
+from typing import List, Tuple
+
+from csr_graph import CSRGraph, csr_graph_adjacency_matrix, imap_over_source_chunks, SOURCES_PER_CHUNK
+
+########################
+# Breadth First Search #
+########################
+
+def _gather_neighbors(indptr: np.ndarray, indices: np.ndarray, nodes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    '''Returns (parents, neighbors) for every edge leaving nodes.'''
+    starts = indptr[nodes]
+    counts = indptr[nodes+1] - starts
+    total_count = int(counts.sum())
+    edge_positions = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(total_count)
+    return np.repeat(nodes, counts), indices[edge_positions]
+
+def _accumulate_sources(indptr: np.ndarray, indices: np.ndarray, sources: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Returns (dependencies, distance_sums, reached_counts) where dependencies[v] is the sum of the Brandes dependencies of each source on v,
+    distance_sums[v] is the sum of the distances from each source that reaches v to v and reached_counts[v] is the number of sources that reach v.
+    '''
+    number_of_nodes = len(indptr)-1
+    dependencies = np.zeros(number_of_nodes)
+    distance_sums = np.zeros(number_of_nodes)
+    reached_counts = np.zeros(number_of_nodes, dtype=np.int64)
+    distances = np.full(number_of_nodes, -1, dtype=np.int64)
+    path_counts = np.zeros(number_of_nodes)
+    source_dependencies = np.zeros(number_of_nodes)
+    for source in sources:
+        distances[source] = 0
+        path_counts[source] = 1.0
+        frontier = np.array([source])
+        visited_nodes = [frontier]
+        dag_levels: List[Tuple[np.ndarray, np.ndarray]] = []
+        distance = 0
+        while len(frontier) > 0:
+            parents, neighbors = _gather_neighbors(indptr, indices, frontier)
+            undiscovered_mask = distances[neighbors] < 0
+            parents, neighbors = parents[undiscovered_mask], neighbors[undiscovered_mask]
+            if len(neighbors) == 0:
+                break
+            distance += 1
+            np.add.at(path_counts, neighbors, path_counts[parents])
+            frontier = np.unique(neighbors)
+            distances[frontier] = distance
+            visited_nodes.append(frontier)
+            dag_levels.append((parents, neighbors))
+        for parents, children in reversed(dag_levels):
+            np.add.at(source_dependencies, parents, path_counts[parents] / path_counts[children] * (1.0 + source_dependencies[children]))
+        source_dependencies[source] = 0.0
+        visited_nodes = np.concatenate(visited_nodes)
+        dependencies[visited_nodes] += source_dependencies[visited_nodes]
+        distance_sums[visited_nodes] += distances[visited_nodes]
+        reached_counts[visited_nodes] += 1
+        distances[visited_nodes] = -1
+        path_counts[visited_nodes] = 0.0
+        source_dependencies[visited_nodes] = 0.0
+    return dependencies, distance_sums, reached_counts
+
+def _accumulate_all_sources(graph: CSRGraph, graph_handle: str, sources: np.ndarray, number_of_processes: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    number_of_nodes = len(graph.indptr)-1
+    totals = [np.zeros(number_of_nodes), np.zeros(number_of_nodes), np.zeros(number_of_nodes, dtype=np.int64)]
+    for chunk_results in imap_over_source_chunks(_accumulate_sources, graph, graph_handle, sources, SOURCES_PER_CHUNK, number_of_processes):
+        for total, chunk_result in zip(totals, chunk_results):
+            total += chunk_result
+    return tuple(totals)
+
+##############
+# Centrality #
+##############
+
+def number_of_pivots_for_error_bound(number_of_nodes: int, error_bound: float, failure_probability: float = 0.1) -> int:
+    '''
+    Hoeffding's inequality with a union bound over all nodes gives the number of pivots after which, with probability
+    at least 1-failure_probability, no node's normalized betweenness is off by more than error_bound.
+    '''
+    return min(number_of_nodes, math.ceil(math.log(2 * number_of_nodes / failure_probability) / (2 * error_bound * error_bound)))
+
+def _choose_sources(graph: CSRGraph, number_of_pivots: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    '''Returns (sources, component_sizes) where component_sizes[v] is the size of the connected component containing v.'''
+    number_of_nodes = len(graph.indptr)-1
+    _, component_labels = scipy.sparse.csgraph.connected_components(csr_graph_adjacency_matrix(graph), directed=False)
+    component_sizes = np.bincount(component_labels)[component_labels]
+    if number_of_pivots is None or number_of_pivots >= number_of_nodes:
+        return np.arange(number_of_nodes), component_sizes
+    pivots = np.random.default_rng(seed).choice(number_of_nodes, size=number_of_pivots, replace=False)
+    components_without_pivots_mask = np.ones(component_labels.max()+1, dtype=bool)
+    components_without_pivots_mask[component_labels[pivots]] = False
+    sources = np.concatenate([pivots, np.flatnonzero(components_without_pivots_mask[component_labels])])
+    return sources, component_sizes
+
+def betweenness_and_closeness_sources(graph: CSRGraph, number_of_pivots: int = None, error_bound: float = None, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Returns (sources, component_sizes) where component_sizes[v] is the size of the connected component containing v.
+    Every node is a source unless number_of_pivots or error_bound is given. The same arguments always give the same sources.
+    '''
+    if error_bound is not None:
+        number_of_pivots = number_of_pivots_for_error_bound(len(graph.indptr)-1, error_bound)
+    return _choose_sources(graph, number_of_pivots, seed)
+
+def accumulate_betweenness_and_closeness(graph: CSRGraph, sources: np.ndarray, graph_handle: str = None, number_of_processes: int = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Returns (dependencies, distance_sums, reached_counts) summed over the searches from sources.
+    The sums over disjoint sets of sources add up to the sums over their union, so the sources can be split up between separate jobs.
+    '''
+    return _accumulate_all_sources(graph, graph_handle, sources, number_of_processes)
+
+def finalize_betweenness_and_closeness(component_sizes: np.ndarray, dependencies: np.ndarray, distance_sums: np.ndarray, reached_counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    number_of_nodes = len(component_sizes)
+    # each node's totals only come from sources in its own component, so scale them up by how many of that component's nodes were sources
+    component_scale_factors = component_sizes / np.maximum(reached_counts, 1)
+    betweenness = dependencies * component_scale_factors
+    if number_of_nodes > 2:
+        betweenness /= (number_of_nodes-1) * (number_of_nodes-2)
+    estimated_distance_sums = distance_sums * component_scale_factors
+    with np.errstate(divide='ignore', invalid='ignore'):
+        closeness = np.where(estimated_distance_sums > 0, (component_sizes-1) / estimated_distance_sums, 0.0)
+    if number_of_nodes > 1:
+        closeness *= (component_sizes-1) / (number_of_nodes-1)
+    return betweenness, closeness
+
+def betweenness_and_closeness_centrality(graph: CSRGraph, graph_handle: str = None, number_of_pivots: int = None, error_bound: float = None, seed: int = 0, number_of_processes: int = None) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Matches nx.betweenness_centrality(graph) and nx.closeness_centrality(graph) (i.e. normalized betweenness and Wasserman & Faust closeness).
+    Exact unless number_of_pivots or error_bound is given. graph_handle is needed to spread the searches over multiple processes.
+    '''
+    if len(graph.indptr)-1 == 0:
+        return np.zeros(0), np.zeros(0)
+    sources, component_sizes = betweenness_and_closeness_sources(graph, number_of_pivots, error_bound, seed)
+    dependencies, distance_sums, reached_counts = accumulate_betweenness_and_closeness(graph, sources, graph_handle, number_of_processes)
+    return finalize_betweenness_and_closeness(component_sizes, dependencies, distance_sums, reached_counts)
@@ -0,0 +1,229 @@
+#!/usr/bin/python3
+
+"""
+Community detection over CSR graphs.
+
+Label propagation is the semi-synchronous algorithm NetworkX's label_propagation_communities uses (Cordasco & Gargano). Nodes are greedily
+colored and the nodes of each color, which are never adjacent, all take their most frequent neighbor label at once. Updating a color class
+at once rather than a node at a time gives exactly the same labels, so the communities are identical to NetworkX's.
+
+Louvain follows python-louvain's best_partition: repeatedly move single nodes to the neighboring community that most increases modularity
+and then aggregate each community into a single node. It can start from an existing partition, e.g. that of a k-core graph containing
+this one (see warm_start_labels), in which case the first round of moves only has to repair that partition.
+
+Edge weights are ignored throughout, as the pipeline always has.
+"""
+
+###########
+# Imports #
+###########
+
+import numpy as np
+import pandas as pd
+import scipy.sparse
+import scipy.sparse.csgraph
+from typing import List, Tuple
+
+from csr_graph import CSRGraph, csr_graph_adjacency_matrix, csr_graph_degrees, csr_graph_number_of_nodes
+
+###########
+# Globals #
+###########
+
+LOUVAIN_MINIMUM_MODULARITY_INCREASE = 1e-07
+
+###########
+# Helpers #
+###########
+
+def relabel_by_first_appearance(labels: np.ndarray) -> np.ndarray:
+    '''Renumbers labels as 0, 1, 2, ... in the order they first appear.'''
+    _, first_positions, inverse = np.unique(labels, return_index=True, return_inverse=True)
+    return np.argsort(np.argsort(first_positions))[inverse]
+
+def warm_start_labels(previous_labels: np.ndarray, previous_graph: CSRGraph, graph: CSRGraph) -> np.ndarray:
+    '''
+    Carries community labels over to graph by node name. Nodes missing from previous_graph start out in communities of their own.
+    Communities that fall apart in graph are split up since Louvain can only merge communities, never split them.
+    '''
+    previous_positions = pd.Index(previous_graph.node_names).get_indexer(graph.node_names)
+    found_mask = previous_positions >= 0
+    initial_labels = np.empty(len(graph.node_names), dtype=np.int64)
+    initial_labels[found_mask] = np.asarray(previous_labels)[previous_positions[found_mask]]
+    initial_labels[~found_mask] = np.arange((~found_mask).sum()) + (initial_labels[found_mask].max()+1 if found_mask.any() else 0)
+    return split_disconnected_communities(graph, initial_labels)
+
+def split_disconnected_communities(graph: CSRGraph, labels: np.ndarray) -> np.ndarray:
+    '''Gives each connected piece of each community its own label, e.g. after a community lost the nodes joining it together.'''
+    adjacency_matrix = csr_graph_adjacency_matrix(graph, include_weights=False).tocoo()
+    same_community_mask = labels[adjacency_matrix.row] == labels[adjacency_matrix.col]
+    same_community_adjacency_matrix = scipy.sparse.csr_matrix((adjacency_matrix.data[same_community_mask], (adjacency_matrix.row[same_community_mask], adjacency_matrix.col[same_community_mask])), shape=adjacency_matrix.shape)
+    _, component_labels = scipy.sparse.csgraph.connected_components(same_community_adjacency_matrix, directed=False)
+    return relabel_by_first_appearance(component_labels)
+
+def modularity(graph: CSRGraph, labels: np.ndarray, resolution: float = 1.0) -> float:
+    return _modularity(csr_graph_adjacency_matrix(graph, include_weights=False), labels, resolution)
+
+def _modularity(adjacency_matrix: scipy.sparse.csr_matrix, labels: np.ndarray, resolution: float) -> float:
+    total_weight = adjacency_matrix.sum()
+    if total_weight == 0:
+        return 0.0
+    community_adjacency_matrix = _community_adjacency_matrix(adjacency_matrix, labels)
+    community_degrees = np.asarray(community_adjacency_matrix.sum(axis=1)).ravel()
+    return float(community_adjacency_matrix.diagonal().sum() / total_weight - resolution * np.square(community_degrees / total_weight).sum())
+
+def _community_adjacency_matrix(adjacency_matrix: scipy.sparse.csr_matrix, labels: np.ndarray) -> scipy.sparse.csr_matrix:
+    '''S^T A S where S is the node to community membership matrix, i.e. the graph with each community aggregated into one node.'''
+    number_of_nodes = adjacency_matrix.shape[0]
+    membership_matrix = scipy.sparse.csr_matrix((np.ones(number_of_nodes), (np.arange(number_of_nodes), labels)), shape=(number_of_nodes, labels.max()+1))
+    return (membership_matrix.T @ adjacency_matrix @ membership_matrix).tocsr()
+
+#####################
+# Label Propagation #
+#####################
+
+def _greedy_coloring(graph: CSRGraph) -> np.ndarray:
+    '''Matches nx.coloring.greedy_color(graph), i.e. the largest_first strategy.'''
+    degrees = csr_graph_degrees(graph)
+    indptr, indices = graph.indptr.tolist(), graph.indices.tolist()
+    # plain lists are much faster than numpy arrays for element-at-a-time access
+    colors = [-1] * len(degrees)
+    for node in np.argsort(-degrees, kind='stable').tolist():
+        neighbor_colors = {colors[neighbor] for neighbor in indices[indptr[node]:indptr[node+1]]}
+        color = 0
+        while color in neighbor_colors:
+            color += 1
+        colors[node] = color
+    return np.array(colors, dtype=np.int64)
+
+def _most_frequent_neighbor_labels(edge_sources: np.ndarray, edge_targets: np.ndarray, labels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    edge_sources and edge_targets are all the edges leaving some set of nodes. Returns (highest_labels, current_label_is_most_frequent_mask) for each
+    of those nodes in increasing order, where highest_labels is the highest of the most frequent labels among the node's neighbors.
+    '''
+    number_of_labels = len(labels)
+    source_label_keys, source_label_counts = np.unique(edge_sources * number_of_labels + labels[edge_targets], return_counts=True)
+    key_sources = source_label_keys // number_of_labels
+    key_labels = source_label_keys % number_of_labels
+    segment_starts = np.flatnonzero(np.concatenate([[True], key_sources[1:] != key_sources[:-1]]))
+    maximum_counts = np.maximum.reduceat(source_label_counts, segment_starts)
+    segment_ids = np.repeat(np.arange(len(segment_starts)), np.diff(np.append(segment_starts, len(key_sources))))
+    most_frequent_mask = source_label_counts == maximum_counts[segment_ids]
+    # keys are sorted by label within each node, so the last most frequent label of a node is the highest
+    highest_labels = np.zeros(len(segment_starts), dtype=np.int64)
+    highest_labels[segment_ids[most_frequent_mask]] = key_labels[most_frequent_mask]
+    current_label_is_most_frequent_mask = np.zeros(len(segment_starts), dtype=bool)
+    current_label_is_most_frequent_mask[segment_ids[most_frequent_mask & (key_labels == labels[key_sources])]] = True
+    return highest_labels, current_label_is_most_frequent_mask
+
+def label_propagation_communities(graph: CSRGraph) -> np.ndarray:
+    '''Returns the community label of each node, numbered in order of first appearance. Matches nx.algorithms.community.label_propagation_communities(graph).'''
+    number_of_nodes = csr_graph_number_of_nodes(graph)
+    if len(graph.indices) == 0:
+        return np.arange(number_of_nodes)
+    degrees = csr_graph_degrees(graph)
+    edge_sources = np.repeat(np.arange(number_of_nodes), degrees)
+    edge_targets = np.asarray(graph.indices, dtype=np.int64)
+    colors = _greedy_coloring(graph)
+    color_classes: List[Tuple[np.ndarray, np.ndarray]] = []
+    for color in range(colors.max()+1):
+        color_nodes = np.flatnonzero((colors == color) & (degrees > 0))
+        color_edge_mask = colors[edge_sources] == color
+        color_classes.append((color_nodes, color_edge_mask))
+    labels = np.arange(number_of_nodes)
+    while True:
+        _, current_label_is_most_frequent_mask = _most_frequent_neighbor_labels(edge_sources, edge_targets, labels)
+        if current_label_is_most_frequent_mask.all():
+            break
+        for color_nodes, color_edge_mask in color_classes:
+            if len(color_nodes) == 0:
+                continue
+            highest_labels, current_label_is_most_frequent_mask = _most_frequent_neighbor_labels(edge_sources[color_edge_mask], edge_targets[color_edge_mask], labels)
+            # Prec-Max tie breaking, i.e. keep the current label if it's one of the most frequent, otherwise take the highest of those
+            labels[color_nodes] = np.where(current_label_is_most_frequent_mask, labels[color_nodes], highest_labels)
+    return relabel_by_first_appearance(labels)
+
+###########
+# Louvain #
+###########
+
+def _louvain_local_moving(adjacency_matrix: scipy.sparse.csr_matrix, labels: np.ndarray, resolution: float, random_generator: np.random.Generator, constraint_labels: np.ndarray = None) -> np.ndarray:
+    '''
+    Moves nodes one at a time (in random order) to the neighboring community with the largest modularity increase until no move helps enough.
+    If constraint_labels is given, nodes only move to communities of neighbors with the same constraint label.
+    '''
+    number_of_nodes = adjacency_matrix.shape[0]
+    total_weight = adjacency_matrix.sum()
+    node_degrees = np.asarray(adjacency_matrix.sum(axis=1)).ravel()
+    community_degrees = np.bincount(labels, weights=node_degrees, minlength=number_of_nodes)
+    # plain lists are much faster than numpy arrays for element-at-a-time access
+    indptr, indices, weights = adjacency_matrix.indptr.tolist(), adjacency_matrix.indices.tolist(), adjacency_matrix.data.tolist()
+    node_degrees, community_degrees, labels = node_degrees.tolist(), community_degrees.tolist(), labels.tolist()
+    constraint_labels = [0] * number_of_nodes if constraint_labels is None else constraint_labels.tolist()
+    current_modularity = _modularity(adjacency_matrix, np.array(labels), resolution)
+    while True:
+        number_of_moves = 0
+        for node in random_generator.permutation(number_of_nodes).tolist():
+            node_label = labels[node]
+            node_degree = node_degrees[node]
+            degree_factor = resolution * node_degree / total_weight
+            node_constraint_label = constraint_labels[node]
+            label_to_weight_map = {node_label: 0.0}
+            for neighbor, weight in zip(indices[indptr[node]:indptr[node+1]], weights[indptr[node]:indptr[node+1]]):
+                if neighbor != node and constraint_labels[neighbor] == node_constraint_label:
+                    neighbor_label = labels[neighbor]
+                    label_to_weight_map[neighbor_label] = label_to_weight_map.get(neighbor_label, 0.0) + weight
+            community_degrees[node_label] -= node_degree
+            best_label = node_label
+            best_increase = label_to_weight_map[node_label] - community_degrees[node_label] * degree_factor
+            for label, weight in label_to_weight_map.items():
+                increase = weight - community_degrees[label] * degree_factor
+                if increase > best_increase:
+                    best_label, best_increase = label, increase
+            community_degrees[best_label] += node_degree
+            if best_label != node_label:
+                labels[node] = best_label
+                number_of_moves += 1
+        new_modularity = _modularity(adjacency_matrix, np.array(labels), resolution)
+        if number_of_moves == 0 or new_modularity - current_modularity < LOUVAIN_MINIMUM_MODULARITY_INCREASE:
+            break
+        current_modularity = new_modularity
+    return relabel_by_first_appearance(np.array(labels))
+
+def louvain_communities(graph: CSRGraph, initial_labels: np.ndarray = None, resolution: float = 1.0, seed: int = 0) -> np.ndarray:
+    '''
+    Returns the community label of each node, numbered in order of first appearance.
+    If initial_labels are given, each of those communities is first broken into the subcommunities local moving finds within it. The search
+    then starts from the graph with each subcommunity aggregated into one node and each of those nodes in its initial community, so that
+    initial communities can still be split up (as in the refinement phase of Leiden).
+    '''
+    number_of_nodes = csr_graph_number_of_nodes(graph)
+    if number_of_nodes == 0 or len(graph.indices) == 0:
+        return np.arange(number_of_nodes)
+    random_generator = np.random.default_rng(seed)
+    adjacency_matrix = csr_graph_adjacency_matrix(graph, include_weights=False)
+    # each level's graph has a node per community of the level before, the first level's nodes are the graph's nodes
+    if initial_labels is None:
+        node_labels = np.arange(number_of_nodes)
+        level_adjacency_matrix = adjacency_matrix
+        level_labels = node_labels
+        node_to_level_node = np.arange(number_of_nodes)
+    else:
+        initial_labels = relabel_by_first_appearance(initial_labels)
+        node_labels = initial_labels
+        node_to_level_node = _louvain_local_moving(adjacency_matrix, np.arange(number_of_nodes), resolution, random_generator, constraint_labels=initial_labels)
+        level_adjacency_matrix = _community_adjacency_matrix(adjacency_matrix, node_to_level_node)
+        level_labels = np.zeros(level_adjacency_matrix.shape[0], dtype=np.int64)
+        level_labels[node_to_level_node] = initial_labels
+    current_modularity = _modularity(adjacency_matrix, node_labels, resolution)
+    while True:
+        level_labels = _louvain_local_moving(level_adjacency_matrix, level_labels, resolution, random_generator)
+        node_labels = level_labels[node_to_level_node]
+        new_modularity = _modularity(adjacency_matrix, node_labels, resolution)
+        if new_modularity - current_modularity < LOUVAIN_MINIMUM_MODULARITY_INCREASE:
+            break
+        current_modularity = new_modularity
+        level_adjacency_matrix = _community_adjacency_matrix(level_adjacency_matrix, level_labels)
+        node_to_level_node = node_labels
+        level_labels = np.arange(level_adjacency_matrix.shape[0])
+    return relabel_by_first_appearance(node_labels)
@@ -0,0 +1,271 @@
+#!/usr/bin/python3
+
+"""
+Undirected graphs stored as CSR (compressed sparse row) arrays along with the graph algorithms the netflix pipeline runs on them.
+
+The neighbors of node i are indices[indptr[i]:indptr[i+1]] and the weights of the corresponding edges are weights[indptr[i]:indptr[i+1]].
+Every edge is stored in both directions. Nodes are referred to by integer ids internally and node_names maps ids back to names.
+"""
+
+###########
+# Imports #
+###########
+
+import os
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+import scipy.sparse
+import multiprocessing as mp
+from contextlib import contextmanager
+from typing import NamedTuple, Tuple, Callable, Generator
+
+###########
+# Globals #
+###########
+
+# searches from every node (see centrality.py and shortest_paths.py) take their sources this many at a time, which is also
+# the most sources the bit-parallel searches in shortest_paths.py can advance at once
+SOURCES_PER_CHUNK = 64
+
+##############
+# CSR Graphs #
+##############
+
+class CSRGraph(NamedTuple):
+    indptr: np.ndarray
+    indices: np.ndarray
+    weights: np.ndarray
+    node_names: np.ndarray
+
+def csr_graph_from_sparse_matrix(adjacency_matrix: scipy.sparse.spmatrix, node_names: np.ndarray) -> CSRGraph:
+    adjacency_matrix = scipy.sparse.csr_matrix(adjacency_matrix)
+    adjacency_matrix.sum_duplicates()
+    adjacency_matrix.sort_indices()
+    assert adjacency_matrix.shape == (len(node_names), len(node_names))
+    return CSRGraph(indptr=adjacency_matrix.indptr.astype(np.int64),
+                    indices=adjacency_matrix.indices.astype(np.int32),
+                    weights=adjacency_matrix.data,
+                    node_names=np.asarray(node_names, dtype=object))
+
+def csr_graph_adjacency_matrix(graph: CSRGraph, include_weights: bool = True) -> scipy.sparse.csr_matrix:
+    number_of_nodes = len(graph.node_names)
+    weights = graph.weights if include_weights else np.ones(len(graph.indices))
+    return scipy.sparse.csr_matrix((weights, graph.indices, graph.indptr), shape=(number_of_nodes, number_of_nodes))
+
+def csr_graph_number_of_nodes(graph: CSRGraph) -> int:
+    return len(graph.node_names)
+
+def csr_graph_number_of_edges(graph: CSRGraph) -> int:
+    return len(graph.indices) // 2
+
+def csr_graph_degrees(graph: CSRGraph) -> np.ndarray:
+    return np.diff(graph.indptr)
+
+def csr_graph_hash(graph: CSRGraph) -> str:
+    hasher = hashlib.sha1()
+    for array in (graph.indptr, graph.indices, graph.weights):
+        hasher.update(np.ascontiguousarray(array).tobytes())
+    hasher.update('\0'.join(map(str, graph.node_names)).encode('utf-8'))
+    return hasher.hexdigest()
+
+def csr_graph_edge_arrays(graph: CSRGraph) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''Returns (sources, targets, weights) with each undirected edge appearing once, i.e. with source < target.'''
+    sources = np.repeat(np.arange(len(graph.node_names), dtype=np.int32), csr_graph_degrees(graph))
+    one_direction_mask = sources < graph.indices
+    return sources[one_direction_mask], graph.indices[one_direction_mask], graph.weights[one_direction_mask]
+
+def csr_graph_to_edgelist_df(graph: CSRGraph) -> pd.DataFrame:
+    sources, targets, weights = csr_graph_edge_arrays(graph)
+    return pd.DataFrame({'source': graph.node_names[sources], 'target': graph.node_names[targets], 'weight': weights})
+
+def csr_graph_from_edgelist_df(edgelist_df: pd.DataFrame) -> CSRGraph:
+    '''Inverse of csr_graph_to_edgelist_df. Nodes are numbered in order of first appearance and edges default to a weight of 1 if there's no weight column.'''
+    node_ids, node_names = pd.factorize(pd.concat([edgelist_df['source'], edgelist_df['target']], ignore_index=True))
+    sources, targets = np.split(node_ids, 2)
+    weights = edgelist_df['weight'].to_numpy() if 'weight' in edgelist_df.columns else np.ones(len(edgelist_df))
+    number_of_nodes = len(node_names)
+    adjacency_matrix = scipy.sparse.coo_matrix((np.concatenate([weights, weights]), (np.concatenate([sources, targets]), np.concatenate([targets, sources]))),
+                                               shape=(number_of_nodes, number_of_nodes))
+    return csr_graph_from_sparse_matrix(adjacency_matrix, node_names.to_numpy())
+
+def csr_graph_to_networkx(graph: CSRGraph, include_weights: bool = False) -> 'nx.Graph':
+    import networkx as nx
+    nx_graph = nx.Graph()
+    nx_graph.add_nodes_from(graph.node_names)
+    sources, targets, weights = csr_graph_edge_arrays(graph)
+    if include_weights:
+        nx_graph.add_weighted_edges_from(zip(graph.node_names[sources], graph.node_names[targets], weights.tolist()))
+    else:
+        nx_graph.add_edges_from(zip(graph.node_names[sources], graph.node_names[targets]))
+    return nx_graph
+
+########################
+# Bipartite Projection #
+########################
+
+def project_bipartite_graph(node_ids: np.ndarray, other_side_node_ids: np.ndarray, node_names: np.ndarray) -> CSRGraph:
+    '''
+    The bipartite graph is given as parallel arrays of edges where node_ids[i] is adjacent to other_side_node_ids[i].
+    Two nodes are adjacent in the projection if they share a neighbor on the other side. The edge weight is the number of shared neighbors.
+    This is B*B^T where B is the incidence matrix of the bipartite graph with the diagonal (i.e. self loops) removed.
+    '''
+    number_of_nodes = len(node_names)
+    number_of_other_side_nodes = int(other_side_node_ids.max())+1 if len(other_side_node_ids) > 0 else 0
+    incidence_matrix = scipy.sparse.csr_matrix((np.ones(len(node_ids), dtype=np.int32), (node_ids, other_side_node_ids)),
+                                               shape=(number_of_nodes, number_of_other_side_nodes))
+    incidence_matrix.sum_duplicates()
+    incidence_matrix.data[:] = 1 # repeated edges in the bipartite graph shouldn't count as more shared neighbors
+    projection_matrix = (incidence_matrix @ incidence_matrix.T).tocsr()
+    projection_matrix.setdiag(0)
+    projection_matrix.eliminate_zeros()
+    return csr_graph_from_sparse_matrix(projection_matrix, node_names)
+
+########################
+# K-Core Decomposition #
+########################
+
+def core_numbers(graph: CSRGraph) -> np.ndarray:
+    '''
+    Batagelj-Zaversnik bucket peeling, i.e. O(V+E) for all nodes at once. The k-core of the graph is the subgraph induced by the nodes with core number >= k.
+    Nodes are kept sorted by their current degree in vertices with bucket_starts[d] being where the nodes of degree d start.
+    Removing the node of lowest degree moves each of its higher degree neighbors to the front of its bucket and then into the bucket below.
+    '''
+    degrees = csr_graph_degrees(graph)
+    number_of_nodes = len(degrees)
+    if number_of_nodes == 0:
+        return np.zeros(0, dtype=np.int64)
+    vertices = np.argsort(degrees, kind='stable')
+    positions = np.empty(number_of_nodes, dtype=np.int64)
+    positions[vertices] = np.arange(number_of_nodes)
+    bucket_starts = np.concatenate([[0], np.cumsum(np.bincount(degrees))[:-1]])
+    # plain lists are much faster than numpy arrays for element-at-a-time access
+    degrees, vertices, positions, bucket_starts = degrees.tolist(), vertices.tolist(), positions.tolist(), bucket_starts.tolist()
+    indptr, indices = graph.indptr.tolist(), graph.indices.tolist()
+    for vertex in vertices:
+        vertex_degree = degrees[vertex]
+        for neighbor in indices[indptr[vertex]:indptr[vertex+1]]:
+            neighbor_degree = degrees[neighbor]
+            if neighbor_degree > vertex_degree:
+                neighbor_position = positions[neighbor]
+                bucket_start = bucket_starts[neighbor_degree]
+                bucket_start_vertex = vertices[bucket_start]
+                if neighbor != bucket_start_vertex:
+                    positions[neighbor], positions[bucket_start_vertex] = bucket_start, neighbor_position
+                    vertices[neighbor_position], vertices[bucket_start] = bucket_start_vertex, neighbor
+                bucket_starts[neighbor_degree] += 1
+                degrees[neighbor] = neighbor_degree - 1
+    return np.array(degrees, dtype=np.int64)
+
+def csr_graph_subgraph(graph: CSRGraph, node_mask: np.ndarray) -> CSRGraph:
+    '''Induced subgraph on the nodes where node_mask is True. Nodes are renumbered but keep their relative order.'''
+    adjacency_matrix = csr_graph_adjacency_matrix(graph)
+    kept_node_ids = np.flatnonzero(node_mask)
+    return csr_graph_from_sparse_matrix(adjacency_matrix[kept_node_ids][:, kept_node_ids], graph.node_names[kept_node_ids])
+
+def k_core_subgraph(graph: CSRGraph, graph_core_numbers: np.ndarray, k: int) -> CSRGraph:
+    return csr_graph_subgraph(graph, graph_core_numbers >= k)
+
+##################
+# Parquet Graphs #
+##################
+
+# A graph is stored as a Parquet table with a row per node holding its name and lists of its neighbors and edge weights.
+# Arrow list columns are laid out as offsets and values, which are exactly indptr and indices (or weights), so no conversion is needed either way.
+
+def write_csr_graph_parquet(graph: CSRGraph, parquet_file: str) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    indptr = pa.array(np.asarray(graph.indptr, dtype=np.int64))
+    table = pa.table({'node': pa.array(graph.node_names.tolist()),
+                      'neighbors': pa.LargeListArray.from_arrays(indptr, pa.array(np.asarray(graph.indices))),
+                      'weights': pa.LargeListArray.from_arrays(indptr, pa.array(np.asarray(graph.weights)))})
+    pq.write_table(table, parquet_file)
+    return
+
+def read_csr_graph_parquet(parquet_file: str) -> CSRGraph:
+    import pyarrow.parquet as pq
+    table = pq.read_table(parquet_file)
+    neighbors = table.column('neighbors').combine_chunks()
+    weights = table.column('weights').combine_chunks()
+    indptr = neighbors.offsets.to_numpy()
+    return CSRGraph(indptr=indptr - indptr[0],
+                    indices=neighbors.flatten().to_numpy(),
+                    weights=weights.flatten().to_numpy(),
+                    node_names=np.asarray(table.column('node').to_pylist(), dtype=object))
+
+######################
+# Shared Graph Store #
+######################
+
+# Graphs are handed to worker processes by name rather than pickled. Each array of a stored graph is an .npy file that workers
+# memory-map, so every process shares the same physical pages. The store lives in /dev/shm when possible so nothing hits the disk.
+
+CSR_GRAPH_STORE_NUMERIC_ARRAY_NAMES = ['indptr', 'indices', 'weights']
+
+@contextmanager
+def csr_graph_store() -> Generator:
+    store_parent_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+    store_dir = tempfile.mkdtemp(prefix='csr_graph_store_', dir=store_parent_dir)
+    try:
+        yield store_dir
+    finally:
+        shutil.rmtree(store_dir, ignore_errors=True)
+    return
+
+def store_csr_graph(graph: CSRGraph, store_dir: str, graph_name: str) -> str:
+    '''Returns the handle workers pass to attach_csr_graph.'''
+    graph_handle = os.path.join(store_dir, graph_name)
+    os.makedirs(graph_handle)
+    for array_name in CSR_GRAPH_STORE_NUMERIC_ARRAY_NAMES:
+        np.save(os.path.join(graph_handle, array_name+'.npy'), getattr(graph, array_name))
+    np.save(os.path.join(graph_handle, 'node_names.npy'), graph.node_names, allow_pickle=True)
+    with open(os.path.join(graph_handle, 'hash.txt'), 'w') as f:
+        f.write(csr_graph_hash(graph))
+    return graph_handle
+
+def stored_csr_graph_hash(graph_handle: str) -> str:
+    with open(os.path.join(graph_handle, 'hash.txt'), 'r') as f:
+        return f.read()
+
+def attach_csr_graph(graph_handle: str, load_node_names: bool = True) -> CSRGraph:
+    '''The numeric arrays are read-only memory maps. Node names can't be memory-mapped, so they're only loaded when asked for, otherwise they're node ids.'''
+    arrays = {array_name: np.load(os.path.join(graph_handle, array_name+'.npy'), mmap_mode='r') for array_name in CSR_GRAPH_STORE_NUMERIC_ARRAY_NAMES}
+    node_names = np.load(os.path.join(graph_handle, 'node_names.npy'), allow_pickle=True) if load_node_names else np.arange(len(arrays['indptr'])-1)
+    return CSRGraph(node_names=node_names, **arrays)
+
+_attached_graph_worker_state = dict()
+
+def _init_attached_graph_worker(graph_handle: str, function: Callable) -> None:
+    graph = attach_csr_graph(graph_handle, load_node_names=False)
+    _attached_graph_worker_state['indptr'] = np.asarray(graph.indptr)
+    _attached_graph_worker_state['indices'] = np.asarray(graph.indices)
+    _attached_graph_worker_state['function'] = function
+    return
+
+def _call_in_attached_graph_worker(source_chunk: np.ndarray) -> object:
+    return _attached_graph_worker_state['function'](_attached_graph_worker_state['indptr'], _attached_graph_worker_state['indices'], source_chunk)
+
+def imap_over_source_chunks(function: Callable, graph: CSRGraph, graph_handle: str, sources: np.ndarray, chunk_size: int, number_of_processes: int = None) -> Generator:
+    '''
+    Yields function(indptr, indices, source_chunk) for each consecutive chunk of sources, in order. function must be picklable.
+    The chunks are spread over a process pool whose workers attach to the graph via graph_handle, so it's only used when graph_handle is given.
+    '''
+    # pool workers (e.g. those of the job scheduler) are daemonic and can't have children of their own
+    if number_of_processes is None:
+        number_of_processes = 1 if mp.current_process().daemon else mp.cpu_count()
+    source_chunks = [sources[start:start+chunk_size] for start in range(0, len(sources), chunk_size)]
+    if number_of_processes < 2 or graph_handle is None or len(source_chunks) < 2:
+        indptr, indices = np.asarray(graph.indptr), np.asarray(graph.indices)
+        for source_chunk in source_chunks:
+            yield function(indptr, indices, source_chunk)
+        return
+    pool = mp.Pool(processes=min(number_of_processes, len(source_chunks)), initializer=_init_attached_graph_worker, initargs=(graph_handle, function))
+    try:
+        yield from pool.imap(_call_in_attached_graph_worker, source_chunks)
+    finally:
+        pool.close()
+        pool.join()
+    return
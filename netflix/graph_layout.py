@@ -0,0 +1,139 @@
+#!/usr/bin/python3
+
+"""
+Force-directed (Fruchterman-Reingold) layouts of CSR graphs, vectorized with numpy and cached on disk.
+
+Each iteration matches the update NetworkX's spring_layout makes: every pair of nodes repels with force k^2/d, every edge attracts
+with force d^2/k, and each node moves along its net force by at most the current temperature, which cools linearly to zero.
+
+Repulsion between all pairs is quadratic in the number of nodes, so larger graphs use a single level Barnes-Hut approximation.
+The nodes are bucketed into a grid whose lines are at quantiles of the node positions. Nodes in the same grid cell repel each other
+exactly and every other cell repels as a single point mass at its center of mass.
+
+Layouts are expensive and the same graph gets drawn once per metric, so cached_force_directed_layout keeps them in .npy files
+named by the graph's hash and the layout parameters.
+"""
+
+###########
+# Imports #
+###########
+
+import os
+import numpy as np
+
+from csr_graph import CSRGraph, csr_graph_number_of_nodes, csr_graph_degrees, csr_graph_hash
+
+###########
+# Globals #
+###########
+
+EXACT_REPULSION_MAXIMUM_NUMBER_OF_NODES = 1_000
+BARNES_HUT_GRID_CELLS_PER_SIDE = 32
+
+# upper bound on the number of pairwise interactions held in memory at once
+INTERACTIONS_PER_CHUNK = 4_000_000
+
+MINIMUM_DISTANCE = 0.01
+
+##########
+# Forces #
+##########
+
+def _repulsion_from_point_masses(positions: np.ndarray, point_mass_positions: np.ndarray, point_masses: np.ndarray, k: float, excluded_point_masses: np.ndarray = None) -> np.ndarray:
+    '''
+    Returns the sum over the point masses of mass * k^2/d in the direction away from each point mass.
+    excluded_point_masses[i] is a point mass that positions[i] ignores.
+    '''
+    displacements = np.zeros_like(positions)
+    rows_per_chunk = max(1, INTERACTIONS_PER_CHUNK // max(1, len(point_mass_positions)))
+    for chunk_start in range(0, len(positions), rows_per_chunk):
+        chunk_end = chunk_start+rows_per_chunk
+        deltas = positions[chunk_start:chunk_end, np.newaxis, :] - point_mass_positions[np.newaxis, :, :]
+        distances = np.maximum(np.sqrt(np.einsum('ijk,ijk->ij', deltas, deltas)), MINIMUM_DISTANCE)
+        magnitudes = point_masses * k * k / (distances * distances)
+        if excluded_point_masses is not None:
+            magnitudes[np.arange(len(magnitudes)), excluded_point_masses[chunk_start:chunk_end]] = 0.0
+        displacements[chunk_start:chunk_end] = np.einsum('ijk,ij->ik', deltas, magnitudes)
+    return displacements
+
+def _exact_repulsion(positions: np.ndarray, k: float) -> np.ndarray:
+    # a node's delta to itself is zero, so it doesn't push itself around
+    return _repulsion_from_point_masses(positions, positions, np.ones(len(positions)), k)
+
+def _barnes_hut_repulsion(positions: np.ndarray, k: float) -> np.ndarray:
+    number_of_nodes = len(positions)
+    # the grid lines are quantiles so that each row and column of cells holds the same number of nodes however clustered they are
+    quantiles = np.linspace(0, 1, BARNES_HUT_GRID_CELLS_PER_SIDE+1)[1:-1]
+    cell_coordinates = [np.searchsorted(np.quantile(positions[:, dimension], quantiles), positions[:, dimension], side='right') for dimension in range(2)]
+    cells = cell_coordinates[0] * BARNES_HUT_GRID_CELLS_PER_SIDE + cell_coordinates[1]
+    _, cell_ids = np.unique(cells, return_inverse=True)
+    cell_masses = np.bincount(cell_ids)
+    cell_centers_of_mass = np.stack([np.bincount(cell_ids, weights=positions[:, dimension]) for dimension in range(2)], axis=1) / cell_masses[:, np.newaxis]
+    displacements = _repulsion_from_point_masses(positions, cell_centers_of_mass, cell_masses.astype(float), k, excluded_point_masses=cell_ids)
+    # pair each node with every node sharing its cell (itself included, which contributes nothing) a chunk of nodes at a time
+    nodes_by_cell = np.argsort(cell_ids, kind='stable')
+    cell_starts = np.cumsum(cell_masses) - cell_masses
+    pair_counts = cell_masses[cell_ids[nodes_by_cell]]
+    pair_count_cumulative_sums = np.cumsum(pair_counts)
+    chunk_start = 0
+    while chunk_start < number_of_nodes:
+        chunk_end = max(chunk_start+1, int(np.searchsorted(pair_count_cumulative_sums, pair_count_cumulative_sums[chunk_start] - pair_counts[chunk_start] + INTERACTIONS_PER_CHUNK, side='right')))
+        chunk_nodes = nodes_by_cell[chunk_start:chunk_end]
+        chunk_pair_counts = pair_counts[chunk_start:chunk_end]
+        first_nodes = np.repeat(chunk_nodes, chunk_pair_counts)
+        offsets_within_cell = np.arange(len(first_nodes)) - np.repeat(np.cumsum(chunk_pair_counts) - chunk_pair_counts, chunk_pair_counts)
+        second_nodes = nodes_by_cell[np.repeat(cell_starts[cell_ids[chunk_nodes]], chunk_pair_counts) + offsets_within_cell]
+        deltas = positions[first_nodes] - positions[second_nodes]
+        distances = np.maximum(np.sqrt(np.einsum('ij,ij->i', deltas, deltas)), MINIMUM_DISTANCE)
+        pair_displacements = deltas * (k * k / (distances * distances))[:, np.newaxis]
+        for dimension in range(2):
+            displacements[:, dimension] += np.bincount(first_nodes, weights=pair_displacements[:, dimension], minlength=number_of_nodes)
+        chunk_start = chunk_end
+    return displacements
+
+def _attraction(positions: np.ndarray, sources: np.ndarray, targets: np.ndarray, k: float) -> np.ndarray:
+    '''Every edge is stored in both directions, so each endpoint gets pulled toward the other.'''
+    deltas = positions[sources] - positions[targets]
+    distances = np.maximum(np.sqrt(np.einsum('ij,ij->i', deltas, deltas)), MINIMUM_DISTANCE)
+    edge_displacements = -deltas * (distances / k)[:, np.newaxis]
+    return np.stack([np.bincount(sources, weights=edge_displacements[:, dimension], minlength=len(positions)) for dimension in range(2)], axis=1)
+
+##########
+# Layout #
+##########
+
+def force_directed_layout(graph: CSRGraph, iterations: int = 50, seed: int = 0) -> np.ndarray:
+    '''Returns an array of shape (number_of_nodes, 2) of positions scaled to fit in [-1, 1] and centered at the origin like nx.spring_layout.'''
+    number_of_nodes = csr_graph_number_of_nodes(graph)
+    if number_of_nodes == 0:
+        return np.zeros((0, 2))
+    if number_of_nodes == 1:
+        return np.zeros((1, 2))
+    positions = np.random.default_rng(seed).random((number_of_nodes, 2))
+    sources = np.repeat(np.arange(number_of_nodes), csr_graph_degrees(graph))
+    targets = np.asarray(graph.indices)
+    k = np.sqrt(1.0 / number_of_nodes)
+    repulsion = _exact_repulsion if number_of_nodes <= EXACT_REPULSION_MAXIMUM_NUMBER_OF_NODES else _barnes_hut_repulsion
+    temperature = 0.1 * float((positions.max(axis=0) - positions.min(axis=0)).max())
+    cooling_step = temperature / (iterations+1)
+    for _ in range(iterations):
+        displacements = repulsion(positions, k) + _attraction(positions, sources, targets, k)
+        lengths = np.sqrt(np.einsum('ij,ij->i', displacements, displacements))
+        lengths = np.where(lengths < MINIMUM_DISTANCE, 0.1, lengths)
+        positions += displacements * (temperature / lengths)[:, np.newaxis]
+        temperature -= cooling_step
+    positions -= positions.mean(axis=0)
+    max_extent = np.abs(positions).max()
+    return positions / max_extent if max_extent > 0 else positions
+
+def cached_force_directed_layout(graph: CSRGraph, cache_dir: str, iterations: int = 50, seed: int = 0) -> np.ndarray:
+    cache_file = os.path.join(cache_dir, f'{csr_graph_hash(graph)}_{iterations}_{seed}.npy')
+    if os.path.isfile(cache_file):
+        return np.load(cache_file)
+    positions = force_directed_layout(graph, iterations, seed)
+    os.makedirs(cache_dir, exist_ok=True)
+    # written under a temporary name first so that a concurrent reader never sees a partial file
+    temporary_cache_file = f'{cache_file}.{os.getpid()}.tmp.npy'
+    np.save(temporary_cache_file, positions)
+    os.replace(temporary_cache_file, cache_file)
+    return positions
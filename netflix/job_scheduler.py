@@ -0,0 +1,236 @@
+#!/usr/bin/python3
+
+"""
+Bounded job scheduler for the per-graph stages of the netflix pipeline.
+
+Jobs run in a bounded number of worker processes, most expensive first, so that the long poles start right away and the cheap jobs fill in the gaps.
+Each job gets a fresh process of its own, so the memory it used goes back to the OS as soon as it finishes, and a job whose process dies
+(e.g. killed for running out of memory) is recorded as failed instead of the scheduler waiting forever for its result.
+Each finished job leaves a checkpoint behind so that an interrupted run can be resumed without redoing finished jobs.
+Checkpoints are keyed by the job's inputs and by the code it runs (see function_code_hash), so editing one metric only reruns that metric.
+"""
+
+###########
+# Imports #
+###########
+
+import os
+import json
+import time
+import types
+import hashlib
+import inspect
+import traceback
+import collections
+import multiprocessing as mp
+import multiprocessing.connection
+import numpy as np
+from typing import NamedTuple, Callable, List, Tuple, Set, Generator
+
+from misc_utilities import tqdm_with_message
+
+###########
+# Globals #
+###########
+
+CHECKPOINT_DIR = './output/checkpoints/'
+
+########
+# Jobs #
+########
+
+class Job(NamedTuple):
+    name: str
+    function: Callable
+    args: tuple
+    output_files: Tuple[str, ...]
+    estimated_cost: float
+    checkpoint_key: str
+
+def _names_used_by_code(code: types.CodeType) -> Set[str]:
+    names = set(code.co_names)
+    for constant in code.co_consts:
+        if isinstance(constant, types.CodeType): # e.g. lambdas and nested functions
+            names |= _names_used_by_code(constant)
+    return names
+
+def _constant_representation(value: object) -> str:
+    '''Returns a representation of value that changes whenever it does, or None if value isn't a constant.'''
+    if isinstance(value, (bool, int, float, complex, str, bytes, type(None))):
+        return repr(value)
+    if isinstance(value, (tuple, list)):
+        item_representations = [_constant_representation(item) for item in value]
+        return None if None in item_representations else f'{type(value).__name__}({", ".join(item_representations)})'
+    if isinstance(value, (set, frozenset)):
+        # sorted since the iteration order of strings changes between runs
+        item_representations = [_constant_representation(item) for item in value]
+        return None if None in item_representations else f'{type(value).__name__}({", ".join(sorted(item_representations))})'
+    if isinstance(value, dict):
+        item_representations = [(_constant_representation(key), _constant_representation(item)) for key, item in value.items()]
+        return None if any(None in pair for pair in item_representations) else f'dict({", ".join(f"{key}: {item}" for key, item in item_representations)})'
+    if isinstance(value, np.ndarray) and value.dtype != object:
+        return f'ndarray({value.dtype.str}, {value.shape}, {hashlib.sha1(np.ascontiguousarray(value).tobytes()).hexdigest()})'
+    return None
+
+def function_code_hash(function: Callable) -> str:
+    '''
+    Hash of the source of function and of the globals it uses. Functions and classes from modules in the same directory (i.e. the pipeline's own modules)
+    are followed recursively, other objects from those modules contribute their module's whole source file and constants (including containers and arrays)
+    contribute their values. Installed libraries are ignored.
+    '''
+    hasher = hashlib.sha1()
+    local_directory = os.path.dirname(os.path.abspath(inspect.getsourcefile(function)))
+    visited_objects: Set[int] = set()
+    hashed_module_files: Set[str] = set()
+    def is_local(value: object) -> bool:
+        module_file = getattr(inspect.getmodule(value), '__file__', None)
+        return module_file is not None and os.path.dirname(os.path.abspath(module_file)) == local_directory
+    def visit(function: Callable) -> None:
+        visited_objects.add(id(function))
+        hasher.update(inspect.getsource(function).encode('utf-8'))
+        for name in sorted(_names_used_by_code(function.__code__)):
+            if name not in function.__globals__:
+                continue
+            value = function.__globals__[name]
+            constant_representation = _constant_representation(value)
+            if constant_representation is not None:
+                hasher.update(f'{name}={constant_representation}'.encode('utf-8'))
+                continue
+            # e.g. functions decorated with @contextmanager
+            value = inspect.unwrap(value) if callable(value) else value
+            if id(value) in visited_objects:
+                continue
+            if isinstance(value, types.FunctionType) and is_local(value):
+                visit(value)
+                continue
+            if isinstance(value, type) and is_local(value):
+                visited_objects.add(id(value))
+                hasher.update(inspect.getsource(value).encode('utf-8'))
+                for method in vars(value).values():
+                    method = getattr(method, '__func__', method)
+                    if isinstance(method, types.FunctionType) and id(method) not in visited_objects and is_local(method):
+                        visit(method)
+                continue
+            module = value if isinstance(value, types.ModuleType) else inspect.getmodule(value)
+            module_file = getattr(module, '__file__', None)
+            if module_file is not None and os.path.dirname(os.path.abspath(module_file)) == local_directory and module_file not in hashed_module_files:
+                hashed_module_files.add(module_file)
+                with open(module_file, 'rb') as f:
+                    hasher.update(f.read())
+        return
+    visit(function)
+    return hasher.hexdigest()
+
+def job_checkpoint_key(function: Callable, args: tuple, input_hashes: Tuple[str, ...]) -> str:
+    '''input_hashes should identify the content of any inputs the args only refer to, e.g. graph handles.'''
+    hasher = hashlib.sha1()
+    hasher.update(f'{function.__module__}.{function.__qualname__}'.encode('utf-8'))
+    hasher.update(function_code_hash(function).encode('utf-8'))
+    hasher.update(repr(args).encode('utf-8'))
+    for input_hash in input_hashes:
+        hasher.update(input_hash.encode('utf-8'))
+    return hasher.hexdigest()
+
+def _checkpoint_file(checkpoint_dir: str, job: Job) -> str:
+    return os.path.join(checkpoint_dir, job.checkpoint_key+'.json')
+
+def job_is_checkpointed(job: Job, checkpoint_dir: str = CHECKPOINT_DIR) -> bool:
+    return os.path.isfile(_checkpoint_file(checkpoint_dir, job)) and all(map(os.path.isfile, job.output_files))
+
+def _write_checkpoint(job: Job, elapsed_time: float, checkpoint_dir: str) -> None:
+    with open(_checkpoint_file(checkpoint_dir, job), 'w') as f:
+        json.dump({'name': job.name, 'output_files': job.output_files, 'elapsed_time': elapsed_time}, f)
+    return
+
+def _run_job(job: Job) -> Tuple[float, str]:
+    start_time = time.time()
+    error_string = None
+    try:
+        job.function(*job.args)
+    except Exception:
+        error_string = traceback.format_exc()
+    end_time = time.time()
+    return end_time - start_time, error_string
+
+def _run_job_and_send_result(job: Job, connection: mp.connection.Connection) -> None:
+    connection.send(_run_job(job))
+    connection.close()
+    return
+
+#############
+# Scheduler #
+#############
+
+def _run_jobs_in_processes(jobs: List[Job], number_of_workers: int) -> Generator[Tuple[Job, float, str], None, None]:
+    '''
+    Yields (job, elapsed_time, error_string) as jobs finish, starting them in order and running at most number_of_workers at once.
+    Like pool workers, the worker processes are daemonic, so they die with the scheduler.
+    '''
+    job_queue = collections.deque(jobs)
+    connection_to_running_job_map = dict()
+    try:
+        while len(job_queue) > 0 or len(connection_to_running_job_map) > 0:
+            while len(job_queue) > 0 and len(connection_to_running_job_map) < number_of_workers:
+                job = job_queue.popleft()
+                receiving_connection, sending_connection = mp.Pipe(duplex=False)
+                process = mp.Process(target=_run_job_and_send_result, args=(job, sending_connection), name=job.name, daemon=True)
+                process.start()
+                # only the worker may hold the sending end, so that the receiving end sees EOF if the worker dies
+                sending_connection.close()
+                connection_to_running_job_map[receiving_connection] = (job, process, time.time())
+            for connection in mp.connection.wait(list(connection_to_running_job_map.keys())):
+                job, process, start_time = connection_to_running_job_map.pop(connection)
+                try:
+                    elapsed_time, error_string = connection.recv()
+                    process.join()
+                except EOFError:
+                    process.join()
+                    elapsed_time = time.time() - start_time
+                    error_string = f'The process running {job.name} died with exit code {process.exitcode} before finishing it, e.g. it was killed for running out of memory.'
+                connection.close()
+                yield job, elapsed_time, error_string
+    finally:
+        for _, process, _ in connection_to_running_job_map.values():
+            process.terminate()
+            process.join()
+    return
+
+def run_jobs(jobs: List[Job], number_of_workers: int = None, checkpoint_dir: str = CHECKPOINT_DIR) -> None:
+    number_of_workers = mp.cpu_count() if number_of_workers is None else number_of_workers
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    checkpoint_key_to_job_map = dict()
+    for job in jobs:
+        checkpoint_key_to_job_map.setdefault(job.checkpoint_key, job)
+    number_of_duplicate_jobs = len(jobs) - len(checkpoint_key_to_job_map)
+    unique_jobs = list(checkpoint_key_to_job_map.values())
+    pending_jobs = [job for job in unique_jobs if not job_is_checkpointed(job, checkpoint_dir)]
+    pending_jobs = sorted(pending_jobs, key=lambda job: job.estimated_cost, reverse=True)
+    print(f'{len(jobs)} jobs requested, {number_of_duplicate_jobs} duplicates dropped, {len(unique_jobs)-len(pending_jobs)} already checkpointed, {len(pending_jobs)} to run on {number_of_workers} workers.')
+    if len(pending_jobs) == 0:
+        return
+    job_timings: List[Tuple[Job, float]] = []
+    failed_jobs: List[Tuple[Job, str]] = []
+    start_time = time.time()
+    results = _run_jobs_in_processes(pending_jobs, number_of_workers)
+    for job, elapsed_time, error_string in tqdm_with_message(results, total=len(pending_jobs), post_yield_message_func = lambda index: f'Finished Job {index}', bar_format='{l_bar}{bar:50}{r_bar}'):
+        if error_string is None:
+            _write_checkpoint(job, elapsed_time, checkpoint_dir)
+            job_timings.append((job, elapsed_time))
+        else:
+            failed_jobs.append((job, error_string))
+    end_time = time.time()
+    print_job_report(job_timings, failed_jobs, end_time - start_time, number_of_workers)
+    return
+
+def print_job_report(job_timings: List[Tuple[Job, float]], failed_jobs: List[Tuple[Job, str]], wall_time: float, number_of_workers: int) -> None:
+    print()
+    print(f'{"Job":<60} {"Estimated Cost":>16} {"Seconds":>10}')
+    for job, elapsed_time in sorted(job_timings, key=lambda job_timing: job_timing[1], reverse=True):
+        print(f'{job.name:<60} {job.estimated_cost:>16.3g} {elapsed_time:>10.3f}')
+    total_job_time = sum(elapsed_time for _, elapsed_time in job_timings)
+    print(f'{len(job_timings)} jobs took {total_job_time:.3f} seconds of work in {wall_time:.3f} seconds of wall time on {number_of_workers} workers.')
+    for job, error_string in failed_jobs:
+        print()
+        print(f'{job.name} failed:')
+        print(error_string)
+    return
@@ -0,0 +1,104 @@
+#!/usr/bin/python3
+
+"""
+Columnar store for the per-node metrics of the netflix pipeline's graphs.
+
+Each graph gets a directory holding an Arrow table one column per file: node.arrow has the node names in the graph's node order and every
+metric is another single column Arrow IPC file with a row per node in the same order. Adding a metric to a graph is just writing one more
+file, so jobs computing different metrics of the same graph in different processes never touch each other's files.
+
+Columns are written as a stream of record batches straight from numpy arrays, to a temporary file that's renamed into place once
+complete, so a reader never sees a partial column. Reads memory-map the files, so numeric columns come back as zero-copy numpy views.
+"""
+
+###########
+# Imports #
+###########
+
+import os
+import numpy as np
+import pyarrow as pa
+import pyarrow.ipc
+from typing import List, Iterable
+
+###########
+# Globals #
+###########
+
+NODE_COLUMN_NAME = 'node'
+
+COLUMN_FILE_EXTENSION = '.arrow'
+
+RECORD_BATCH_SIZE = 1 << 20
+
+###########
+# Writing #
+###########
+
+def metric_column_file(graph_dir: str, column_name: str) -> str:
+    return os.path.join(graph_dir, column_name+COLUMN_FILE_EXTENSION)
+
+def write_column_batches(column_file: str, column_name: str, batches: Iterable[np.ndarray], data_type: pa.DataType = None) -> None:
+    '''Writes each batch as it arrives, so the whole column never has to be in memory at once. data_type is inferred from the first batch if not given.'''
+    os.makedirs(os.path.dirname(column_file), exist_ok=True)
+    temporary_column_file = f'{column_file}.{os.getpid()}.tmp'
+    writer = None
+    try:
+        for batch in batches:
+            array = pa.array(batch, type=data_type)
+            if writer is None:
+                data_type = array.type
+                writer = pa.ipc.new_file(temporary_column_file, pa.schema([(column_name, data_type)]))
+            writer.write_batch(pa.record_batch([array], names=[column_name]))
+        if writer is None:
+            writer = pa.ipc.new_file(temporary_column_file, pa.schema([(column_name, pa.float64() if data_type is None else data_type)]))
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(temporary_column_file, column_file)
+    return
+
+def write_column(column_file: str, column_name: str, values: np.ndarray, data_type: pa.DataType = None) -> None:
+    batches = (values[batch_start:batch_start+RECORD_BATCH_SIZE] for batch_start in range(0, len(values), RECORD_BATCH_SIZE))
+    write_column_batches(column_file, column_name, batches, data_type)
+    return
+
+def write_node_names(graph_dir: str, node_names: np.ndarray) -> None:
+    write_column(metric_column_file(graph_dir, NODE_COLUMN_NAME), NODE_COLUMN_NAME, np.asarray([str(node_name) for node_name in node_names], dtype=object), pa.string())
+    return
+
+def write_metric_column(column_file: str, values: np.ndarray) -> None:
+    '''column_file should come from metric_column_file and values has to be in the same node order as node.arrow next to it.'''
+    column_name = os.path.basename(column_file)[:-len(COLUMN_FILE_EXTENSION)]
+    values = np.asarray(values)
+    # the type has to come from the dtype rather than the batches since an empty column has no batches to infer it from
+    write_column(column_file, column_name, values, pa.from_numpy_dtype(values.dtype))
+    return
+
+###########
+# Reading #
+###########
+
+def read_column_file(column_file: str) -> pa.ChunkedArray:
+    '''The result is backed by a memory map of column_file.'''
+    return pa.ipc.open_file(pa.memory_map(column_file, 'r')).read_all().column(0)
+
+def read_metric_column(column_file: str) -> np.ndarray:
+    '''A zero-copy view of the memory-mapped column when it's numeric and a single record batch.'''
+    column = read_column_file(column_file)
+    if column.num_chunks == 1 and column.null_count == 0 and pa.types.is_primitive(column.type) and not pa.types.is_boolean(column.type):
+        return column.chunk(0).to_numpy(zero_copy_only=True)
+    return column.to_numpy()
+
+def read_node_names(graph_dir: str) -> np.ndarray:
+    return np.asarray(read_column_file(metric_column_file(graph_dir, NODE_COLUMN_NAME)).to_pylist(), dtype=object)
+
+def metric_names(graph_dir: str) -> List[str]:
+    return sorted(file_name[:-len(COLUMN_FILE_EXTENSION)] for file_name in os.listdir(graph_dir)
+                  if file_name.endswith(COLUMN_FILE_EXTENSION) and file_name != NODE_COLUMN_NAME+COLUMN_FILE_EXTENSION)
+
+def read_metrics_table(graph_dir: str, column_names: List[str] = None) -> pa.Table:
+    '''The node column followed by column_names (all the metrics by default) with each column memory-mapped from its own file.'''
+    column_names = metric_names(graph_dir) if column_names is None else column_names
+    column_names = [NODE_COLUMN_NAME] + [column_name for column_name in column_names if column_name != NODE_COLUMN_NAME]
+    return pa.table({column_name: read_column_file(metric_column_file(graph_dir, column_name)) for column_name in column_names})
@@ -32,14 +32,99 @@ def trace(func: Callable) -> Callable:
         return result
     return decorating_function
 
-from typing import List
-def parallel_map(*args, **kwargs) -> List:
+# Worker pools are created on first use and reused by every later call since forking a fresh pool per call costs more than the work for short maps.
+
+_PROCESS_POOL = None
+_PROCESS_POOL_OWNER_PID = None
+_PROCESS_POOL_MAIN_NAMESPACE = None
+_THREAD_POOL = None
+
+def _shutdown_worker_pools() -> None:
+    global _PROCESS_POOL, _THREAD_POOL
+    for pool in (_PROCESS_POOL, _THREAD_POOL):
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    _PROCESS_POOL = None
+    _THREAD_POOL = None
+    return
+
+import atexit
+atexit.register(_shutdown_worker_pools)
+
+from typing import Callable
+def _process_pool_is_stale(func: Callable) -> bool:
+    # Workers get a snapshot of __main__ when they're forked, so they can't see functions (re)defined in __main__ afterward.
+    import os
+    import functools
+    if _PROCESS_POOL is None or _PROCESS_POOL_OWNER_PID != os.getpid():
+        return True
+    # partials and methods get pickled by reference to the functions underneath them
+    while isinstance(func, functools.partial):
+        func = func.func
+    func = getattr(func, '__func__', func)
+    if not hasattr(func, '__qualname__'):
+        # callable instances get pickled along with a reference to their class
+        func = type(func)
+    if getattr(func, '__module__', None) == '__main__':
+        value = _PROCESS_POOL_MAIN_NAMESPACE
+        for name in getattr(func, '__qualname__', '').split('.'):
+            value = value.get(name) if isinstance(value, dict) else getattr(value, name, None)
+        return getattr(value, '__func__', value) is not func
+    return False
+
+from typing import Callable
+def _get_worker_pool(func: Callable, use_threads: bool):
+    global _PROCESS_POOL, _PROCESS_POOL_OWNER_PID, _PROCESS_POOL_MAIN_NAMESPACE, _THREAD_POOL
+    import os
+    import sys
     import multiprocessing
-    p = multiprocessing.Pool()
-    result = p.map(*args, **kwargs)
-    p.close()
-    p.join()
-    return result
+    import multiprocessing.pool
+    if use_threads:
+        if _THREAD_POOL is None:
+            _THREAD_POOL = multiprocessing.pool.ThreadPool(processes=4*multiprocessing.cpu_count())
+        return _THREAD_POOL
+    if _process_pool_is_stale(func):
+        if _PROCESS_POOL is not None and _PROCESS_POOL_OWNER_PID == os.getpid():
+            _PROCESS_POOL.terminate()
+            _PROCESS_POOL.join()
+        _PROCESS_POOL = multiprocessing.Pool()
+        _PROCESS_POOL_OWNER_PID = os.getpid()
+        _PROCESS_POOL_MAIN_NAMESPACE = dict(vars(sys.modules['__main__']))
+    return _PROCESS_POOL
+
+def _automatic_chunksize(number_of_items: int, number_of_workers: int) -> int:
+    # Same heuristic multiprocessing.Pool.map uses, i.e. about 4 chunks per worker.
+    chunksize, remainder = divmod(number_of_items, 4*number_of_workers)
+    return max(chunksize + bool(remainder), 1)
+
+from typing import Callable, Iterable, Generator
+def parallel_imap(func: Callable, iterable: Iterable, chunksize: int = None, ordered: bool = True, use_threads: bool = False) -> Generator:
+    '''Streams results as they're computed. Unsized iterables aren't materialized, so they fall back to a chunksize of 1 unless one is given.'''
+    pool = _get_worker_pool(func, use_threads)
+    if chunksize is None:
+        chunksize = _automatic_chunksize(len(iterable), pool._processes) if hasattr(iterable, '__len__') else 1
+    imap_method = pool.imap if ordered else pool.imap_unordered
+    yield from imap_method(func, iterable, chunksize=chunksize)
+    return
+
+from typing import Callable, Iterable, List
+def parallel_map(func: Callable, iterable: Iterable, chunksize: int = None, use_threads: bool = False) -> List:
+    items = iterable if hasattr(iterable, '__len__') else list(iterable)
+    pool = _get_worker_pool(func, use_threads)
+    chunksize = _automatic_chunksize(len(items), pool._processes) if chunksize is None else chunksize
+    return pool.map(func, items, chunksize=chunksize)
+
+from typing import Callable, Iterable, List
+def parallel_map_unordered(func: Callable, iterable: Iterable, chunksize: int = None, use_threads: bool = False) -> List:
+    items = iterable if hasattr(iterable, '__len__') else list(iterable)
+    return list(parallel_imap(func, items, chunksize=chunksize, ordered=False, use_threads=use_threads))
+
+from typing import Callable, List
+def parallel_mapcar(func: Callable, *args, use_threads: bool = False) -> List:
+    items = list(zip(*args))
+    pool = _get_worker_pool(func, use_threads)
+    return pool.starmap(func, items, chunksize=_automatic_chunksize(len(items), pool._processes))
 
 from typing import Callable, Union
 from contextlib import contextmanager
@@ -136,11 +221,11 @@ def debug_on_error(func: Callable) -> Callable:
     return decorating_function
 
 from typing import Callable, Union
-from tqdm import tqdm
 def tqdm_with_message(iterable,
                       pre_yield_message_func: Union[None, Callable[[int], str]] = None,
                       post_yield_message_func: Union[None, Callable[[int], str]] = None,
                       *args, **kwargs):
+    from tqdm import tqdm
     progress_bar_iterator = tqdm(iterable, *args, **kwargs)
     for index, element in enumerate(progress_bar_iterator):
         if pre_yield_message_func is not None:
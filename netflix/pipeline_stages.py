@@ -0,0 +1,129 @@
+#!/usr/bin/python3
+
+"""
+Content-addressed stages for the netflix pipeline.
+
+A stage is a function of the results of other stages that writes its own output files, including a columnar (e.g. Parquet) copy of its
+result that a loader can read back. Each stage gets a key hashing its code (see function_code_hash), its parameters, the contents of any
+raw input files and the output hashes of the stages it depends on. A stage's output hash is the hash of the files it wrote.
+
+When a stage's key matches the key recorded in its manifest from the last run and its output files are still there, it's skipped.
+Stage results are only loaded when a stage downstream actually needs to run, so an unchanged prefix of the pipeline costs almost nothing.
+Since keys use output hashes rather than upstream keys, a stage that reruns but produces identical output doesn't invalidate anything downstream.
+"""
+
+###########
+# Imports #
+###########
+
+import os
+import json
+import time
+import hashlib
+from typing import NamedTuple, Callable, List, Tuple, Dict
+
+from job_scheduler import function_code_hash
+
+###########
+# Globals #
+###########
+
+STAGE_MANIFEST_DIR = './output/stages/'
+
+FILE_HASH_BLOCK_SIZE = 1 << 20
+
+##########
+# Stages #
+##########
+
+class Stage(NamedTuple):
+    name: str
+    # called with the results of the input stages followed by the parameters, writes the output files and returns the result
+    function: Callable
+    input_stage_names: Tuple[str, ...]
+    parameters: tuple
+    output_files: Tuple[str, ...]
+    # called with the parameters, reads the result back from the output files
+    load_function: Callable
+    input_files: Tuple[str, ...] = ()
+
+def file_content_hash(file_name: str) -> str:
+    hasher = hashlib.sha1()
+    with open(file_name, 'rb') as f:
+        for block in iter(lambda: f.read(FILE_HASH_BLOCK_SIZE), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+def stage_key(stage: Stage, input_stage_output_hashes: Tuple[str, ...]) -> str:
+    hasher = hashlib.sha1()
+    hasher.update(function_code_hash(stage.function).encode('utf-8'))
+    hasher.update(function_code_hash(stage.load_function).encode('utf-8'))
+    hasher.update(repr(stage.parameters).encode('utf-8'))
+    hasher.update(repr(stage.output_files).encode('utf-8'))
+    for input_file in stage.input_files:
+        hasher.update(file_content_hash(input_file).encode('utf-8'))
+    for input_stage_output_hash in input_stage_output_hashes:
+        hasher.update(input_stage_output_hash.encode('utf-8'))
+    return hasher.hexdigest()
+
+def _manifest_file(manifest_dir: str, stage: Stage) -> str:
+    return os.path.join(manifest_dir, stage.name+'.json')
+
+def _read_manifest(manifest_dir: str, stage: Stage) -> dict:
+    manifest_file = _manifest_file(manifest_dir, stage)
+    if not os.path.isfile(manifest_file):
+        return None
+    with open(manifest_file, 'r') as f:
+        return json.load(f)
+
+def _write_manifest(manifest_dir: str, stage: Stage, key: str, output_hash: str, elapsed_time: float) -> None:
+    with open(_manifest_file(manifest_dir, stage), 'w') as f:
+        json.dump({'key': key, 'output_hash': output_hash, 'output_files': stage.output_files, 'elapsed_time': elapsed_time}, f)
+    return
+
+def _output_hash(stage: Stage) -> str:
+    hasher = hashlib.sha1()
+    for output_file in stage.output_files:
+        hasher.update(file_content_hash(output_file).encode('utf-8'))
+    return hasher.hexdigest()
+
+#######
+# DAG #
+#######
+
+def run_stages(stages: List[Stage], requested_stage_names: List[str], manifest_dir: str = STAGE_MANIFEST_DIR) -> Dict[str, object]:
+    '''Brings the requested stages and everything they depend on up to date and returns the results of the requested stages by name.'''
+    name_to_stage_map = {stage.name: stage for stage in stages}
+    assert len(name_to_stage_map) == len(stages), 'Stage names must be unique.'
+    os.makedirs(manifest_dir, exist_ok=True)
+    name_to_output_hash_map: Dict[str, str] = dict()
+    name_to_result_map: Dict[str, object] = dict()
+    def load_result(stage_name: str) -> object:
+        if stage_name not in name_to_result_map:
+            stage = name_to_stage_map[stage_name]
+            name_to_result_map[stage_name] = stage.load_function(*stage.parameters)
+        return name_to_result_map[stage_name]
+    def bring_up_to_date(stage_name: str, dependent_stage_names: Tuple[str, ...] = ()) -> str:
+        assert stage_name not in dependent_stage_names, f'Stage {stage_name} depends on itself.'
+        if stage_name in name_to_output_hash_map:
+            return name_to_output_hash_map[stage_name]
+        stage = name_to_stage_map[stage_name]
+        input_stage_output_hashes = tuple(bring_up_to_date(input_stage_name, dependent_stage_names+(stage_name,)) for input_stage_name in stage.input_stage_names)
+        key = stage_key(stage, input_stage_output_hashes)
+        manifest = _read_manifest(manifest_dir, stage)
+        if manifest is not None and manifest['key'] == key and all(map(os.path.isfile, stage.output_files)):
+            print(f'Stage {stage_name} is unchanged since its last run.')
+            output_hash = manifest['output_hash']
+        else:
+            inputs = [load_result(input_stage_name) for input_stage_name in stage.input_stage_names]
+            start_time = time.time()
+            name_to_result_map[stage_name] = stage.function(*inputs, *stage.parameters)
+            end_time = time.time()
+            print(f'Stage {stage_name} took {end_time - start_time} seconds.')
+            output_hash = _output_hash(stage)
+            _write_manifest(manifest_dir, stage, key, output_hash, end_time - start_time)
+        name_to_output_hash_map[stage_name] = output_hash
+        return output_hash
+    for stage_name in requested_stage_names:
+        bring_up_to_date(stage_name)
+    return {stage_name: load_result(stage_name) for stage_name in requested_stage_names}
@@ -6,13 +6,23 @@
 
 import os
 import math
+import time
+import numpy as np
 import pandas as pd
 import networkx as nx
 import multiprocessing as mp
-import community as community_louvain
-from typing import List, Tuple, Union
-
-from misc_utilities import timer, debug_on_error, redirected_output, tqdm_with_message, trace
+from typing import List, Tuple, Union, Callable
+
+from misc_utilities import timer, debug_on_error, tqdm_with_message, trace
+from csr_graph import CSRGraph, project_bipartite_graph, csr_graph_to_edgelist_df, csr_graph_to_networkx, csr_graph_number_of_nodes, csr_graph_number_of_edges
+from csr_graph import SOURCES_PER_CHUNK, core_numbers, k_core_subgraph, csr_graph_store, store_csr_graph, attach_csr_graph, stored_csr_graph_hash, write_csr_graph_parquet, read_csr_graph_parquet
+from job_scheduler import Job, job_checkpoint_key, run_jobs
+from pipeline_stages import Stage, run_stages
+from metrics_store import NODE_COLUMN_NAME, metric_column_file, write_node_names, write_metric_column, read_node_names, read_metric_column
+from centrality import betweenness_and_closeness_sources, accumulate_betweenness_and_closeness, finalize_betweenness_and_closeness
+from vertex_ranking import pagerank, katz_centrality, eigenvector_centrality, hits, warm_start_values
+from communities import label_propagation_communities, louvain_communities, warm_start_labels, modularity
+from shortest_paths import eccentricities_and_average_distances, write_distance_table, connected_component_sizes
 
 ###########
 # Globals #
@@ -32,6 +42,19 @@ PROJECTED_DIRECTORS_CSV = './output/projected_directors.csv'
 
 K_CORE_PROJECTED_ACTORS_CSV_TEMPLATE = './output/projected_actors_k_core_%d.csv'
 K_CORE_PROJECTED_DIRECTORS_CSV_TEMPLATE = './output/projected_directors_k_core_%d.csv'
+
+# columnar copies of the above that later stages and later runs read back instead of recomputing (see pipeline_stages.py)
+DIRECTOR_ACTOR_EDGE_LIST_PARQUET = './output/director_actor_edge_list.parquet'
+PROJECTED_ACTORS_PARQUET = './output/projected_actors.parquet'
+PROJECTED_DIRECTORS_PARQUET = './output/projected_directors.parquet'
+
+K_CORE_PROJECTED_ACTORS_PARQUET_TEMPLATE = './output/projected_actors_k_core_%d.parquet'
+K_CORE_PROJECTED_DIRECTORS_PARQUET_TEMPLATE = './output/projected_directors_k_core_%d.parquet'
+
+# per k-core metrics stores with a column per metric (see metrics_store.py)
+ACTORS_METRICS_DIR_TEMPLATE = './output/metrics/projected_actors_k_core_%d'
+DIRECTORS_METRICS_DIR_TEMPLATE = './output/metrics/projected_directors_k_core_%d'
+
 K_CORE_CHOICES_FOR_K = [0, 10, 20, 30, 45, 60, 75, 100]
 
 #################
@@ -39,152 +62,214 @@ K_CORE_CHOICES_FOR_K = [0, 10, 20, 30, 45, 60, 75, 100]
 #################
 
 def expand_dataframe_list_values_for_column(df: pd.DataFrame, column_name: Union[str, int]) -> pd.DataFrame:
-    return df.apply(lambda x: pd.Series(x[column_name].split(', ')), axis=1) \
-                  .stack() \
-                  .reset_index(level=1, drop=True) \
-                  .to_frame(column_name) \
-                  .join(df.drop(columns=[column_name]))
-
-def load_raw_data() -> Tuple[nx.Graph, pd.DataFrame]:
+    return df.assign(**{column_name: df[column_name].str.split(', ')}).explode(column_name)
+
+def intern_names(names: pd.Series) -> pd.Series:
+    '''Returns names as a categorical whose codes are integer ids numbered in order of first appearance.'''
+    codes, unique_names = pd.factorize(names)
+    return pd.Series(pd.Categorical.from_codes(codes, unique_names), index=names.index, name=names.name)
+
+def load_raw_data() -> pd.DataFrame:
+    '''
+    Returns a row per (movie, actor, director) with the actor and director columns interned as categoricals, so that
+    movies_df.actor.cat.codes and movies_df.director.cat.codes are the two sides of the bipartite actor-director graph.
+    '''
     with timer(section_name='Initial raw data loading'):
         all_df = pd.read_csv(RAW_DATA_CSV, usecols=RELEVANT_COLUMNS)
         movies_df = all_df[all_df['type']=='Movie'].drop(columns=['type']).dropna()
         for column in COLUMNS_WITH_LIST_VALUES_WORTH_EXPANDING:
             movies_df = expand_dataframe_list_values_for_column(movies_df, column)
-        movies_df = movies_df.rename(columns={'cast': 'actor'})
-        movies_df = movies_df[~movies_df.actor.isin(movies_df.director)]
-        print(f'Original Number of Directors: {len(movies_df.director.unique())}')
-        print(f'Original Number of Actors: {len(movies_df.actor.unique())}')
+        movies_df = movies_df.rename(columns={'cast': 'actor'}).reset_index(drop=True)
+        actors = intern_names(movies_df.actor)
+        directors = intern_names(movies_df.director)
+        # checking each distinct name once is much cheaper than checking each row
+        actor_is_director_mask = actors.cat.categories.isin(directors.cat.categories)[actors.cat.codes]
+        movies_df = movies_df.assign(actor=actors, director=directors)[~actor_is_director_mask]
+        movies_df = movies_df.assign(actor=movies_df.actor.cat.remove_unused_categories(), director=movies_df.director.cat.remove_unused_categories())
+        print(f'Original Number of Directors: {len(movies_df.director.cat.categories)}')
+        print(f'Original Number of Actors: {len(movies_df.actor.cat.categories)}')
         movies_df.to_csv(DIRECTOR_ACTOR_EDGE_LIST_CSV, index=False)
-        movies_graph = nx.from_pandas_edgelist(movies_df, 'actor', 'director')
-        assert nx.is_bipartite(movies_graph)
-        assert len(set(movies_df.actor) & set (movies_df.director)) == 0
-    return movies_graph, movies_df
+        movies_df.to_parquet(DIRECTOR_ACTOR_EDGE_LIST_PARQUET, index=False)
+        # no name is on both sides, so the actor-director graph is bipartite
+        assert not movies_df.actor.cat.categories.isin(movies_df.director.cat.categories).any()
+    return movies_df
+
+def load_movies_df() -> pd.DataFrame:
+    '''Reads back what load_raw_data returned last. The categoricals survive the round trip.'''
+    return pd.read_parquet(DIRECTOR_ACTOR_EDGE_LIST_PARQUET)
 
 ##################
 # Project Graphs #
 ##################
 
-def project_actor_graph_serial(movies_graph: nx.Graph, movies_df: pd.DataFrame) -> nx.Graph:
-    full_projected_actors_graph = nx.projected_graph(movies_graph, movies_df['actor'])
-    projected_actors_edgelist = nx.convert_matrix.to_pandas_edgelist(full_projected_actors_graph)
-    projected_actors_edgelist.to_csv(PROJECTED_ACTORS_CSV, index=False)
-    print(f'Number of Actors: {len(full_projected_actors_graph.nodes)}')
-    assert set(projected_actors_edgelist.stack().unique()).issubset(set(full_projected_actors_graph.nodes))
-    assert set(projected_actors_edgelist.stack().unique()).issubset(set(movies_df.actor.unique()))
-    return full_projected_actors_graph
-
-def project_director_graph_serial(movies_graph: nx.Graph, movies_df: pd.DataFrame) -> nx.Graph:
-    full_projected_directors_graph = nx.projected_graph(movies_graph, movies_df['director'])
-    projected_directors_edgelist = nx.convert_matrix.to_pandas_edgelist(full_projected_directors_graph)
-    projected_directors_edgelist.to_csv(PROJECTED_DIRECTORS_CSV, index=False)
-    print(f'Number of Directors: {len(full_projected_directors_graph.nodes)}')
-    assert set(projected_directors_edgelist.stack().unique()).issubset(set(full_projected_directors_graph.nodes))
-    assert set(projected_directors_edgelist.stack().unique()).issubset(set(movies_df.director.unique()))
-    return full_projected_directors_graph
-
-def project_actor_graph(movies_graph: nx.Graph, movies_df: pd.DataFrame, output_queue: mp.SimpleQueue) -> None:
-    output_dict = dict()
-    def note_output_string(new_output_string_value: str) -> None:
-        output_dict['output_string'] = new_output_string_value
-        return
-    with redirected_output(note_output_string):
-        with timer(section_name='Actor graph projection'):
-            full_projected_actors_graph = project_actor_graph_serial(movies_graph, movies_df)
-    output_queue.put((full_projected_actors_graph, output_dict['output_string']))
-    assert len(output_dict)==1
-    return
-
-def project_director_graph(movies_graph: nx.Graph, movies_df: pd.DataFrame, output_queue: mp.SimpleQueue) -> None:
-    output_dict = dict()
-    def note_output_string(new_output_string_value: str) -> None:
-        output_dict['output_string'] = new_output_string_value
-        return
-    with redirected_output(note_output_string):
-        with timer(section_name='Director graph projection'):
-            full_projected_directors_graph = project_director_graph_serial(movies_graph, movies_df)
-    output_queue.put((full_projected_directors_graph, output_dict['output_string']))
-    assert len(output_dict)==1
-    return
-
-def project_graphs(movies_graph: nx.Graph, movies_df: pd.DataFrame) -> Tuple[nx.Graph, nx.Graph]:
+def project_graph(movies_df: pd.DataFrame, graph_node_type: str) -> CSRGraph:
+    other_graph_node_type = 'director' if graph_node_type == 'actor' else 'actor'
+    node_ids = movies_df[graph_node_type].cat.codes.to_numpy()
+    other_side_node_ids = movies_df[other_graph_node_type].cat.codes.to_numpy()
+    node_names = movies_df[graph_node_type].cat.categories.to_numpy()
+    full_projected_graph = project_bipartite_graph(node_ids, other_side_node_ids, node_names)
+    projected_edgelist = csr_graph_to_edgelist_df(full_projected_graph)
+    projected_edgelist.to_csv(PROJECTED_ACTORS_CSV if graph_node_type == 'actor' else PROJECTED_DIRECTORS_CSV, index=False)
+    write_csr_graph_parquet(full_projected_graph, PROJECTED_ACTORS_PARQUET if graph_node_type == 'actor' else PROJECTED_DIRECTORS_PARQUET)
+    print(f'Number of {graph_node_type.capitalize()}s: {csr_graph_number_of_nodes(full_projected_graph)}')
+    print(f'Number of {graph_node_type.capitalize()} Edges: {csr_graph_number_of_edges(full_projected_graph)}')
+    return full_projected_graph
+
+def load_projected_graph(graph_node_type: str) -> CSRGraph:
+    return read_csr_graph_parquet(PROJECTED_ACTORS_PARQUET if graph_node_type == 'actor' else PROJECTED_DIRECTORS_PARQUET)
+
+def project_graphs(movies_df: pd.DataFrame) -> Tuple[CSRGraph, CSRGraph]:
     print()
-
-    actor_output_queue = mp.SimpleQueue()
-    actor_process = mp.Process(target=project_actor_graph, args=(movies_graph, movies_df, actor_output_queue))
-    actor_process.start()
-    print('Started projection of actors.')
-    
-    director_output_queue = mp.SimpleQueue()
-    director_process = mp.Process(target=project_director_graph, args=(movies_graph, movies_df, director_output_queue))
-    director_process.start()
-    print('Started projection of directors.')
-    
-    full_projected_actors_graph, actor_printouts = actor_output_queue.get()
-    full_projected_directors_graph, director_printouts = director_output_queue.get()
-    actor_process.join()
-    actor_process.close()
-    director_process.join()
-    director_process.close()
-
+    with timer(section_name='Actor graph projection'):
+        full_projected_actors_graph = project_graph(movies_df, 'actor')
+    with timer(section_name='Director graph projection'):
+        full_projected_directors_graph = project_graph(movies_df, 'director')
     print()
-    print(actor_printouts)
-    print(director_printouts)
-    assert actor_output_queue.empty()
-    assert director_output_queue.empty()
-    
     return full_projected_actors_graph, full_projected_directors_graph
 
 ##########################
 # Generate K-Core Graphs #
 ##########################
 
-def generate_k_core_graph(full_projected_graph: nx.Graph, k: int, graph_node_type: str, output_queue: mp.SimpleQueue) -> None:
-    k_core_graph = nx.k_core(full_projected_graph, k)
-    k_core_edgelist = nx.convert_matrix.to_pandas_edgelist(k_core_graph)
+def generate_k_core_graphs_for_graph(full_projected_graph: CSRGraph, graph_node_type: str, ks: Tuple[int, ...] = None) -> dict:
+    ks = K_CORE_CHOICES_FOR_K if ks is None else ks
+    graph_core_numbers = core_numbers(full_projected_graph)
     template = K_CORE_PROJECTED_ACTORS_CSV_TEMPLATE if graph_node_type == 'actor' else K_CORE_PROJECTED_DIRECTORS_CSV_TEMPLATE
-    k_core_edgelist.to_csv(template%k, index=False)
-    output_queue.put((k_core_graph, graph_node_type, k))
-    return
-
-def generate_k_core_graphs(full_projected_actors_graph: nx.Graph, full_projected_directors_graph: nx.Graph) -> Tuple[dict,dict]:
-    k_to_actor_k_core_graph_map = dict()
-    k_to_director_k_core_graph_map = dict()
+    parquet_template = K_CORE_PROJECTED_ACTORS_PARQUET_TEMPLATE if graph_node_type == 'actor' else K_CORE_PROJECTED_DIRECTORS_PARQUET_TEMPLATE
+    metrics_dir_template = ACTORS_METRICS_DIR_TEMPLATE if graph_node_type == 'actor' else DIRECTORS_METRICS_DIR_TEMPLATE
+    k_to_k_core_graph_map = dict()
+    for k in sorted(ks):
+        k_core_graph = k_core_subgraph(full_projected_graph, graph_core_numbers, k)
+        k_core_edgelist = csr_graph_to_edgelist_df(k_core_graph)
+        k_core_edgelist.to_csv(template%k, index=False)
+        write_csr_graph_parquet(k_core_graph, parquet_template%k)
+        write_node_names(metrics_dir_template%k, k_core_graph.node_names)
+        k_to_k_core_graph_map[k] = k_core_graph
+    return k_to_k_core_graph_map
+
+def load_k_core_graphs_for_graph(graph_node_type: str, ks: Tuple[int, ...]) -> dict:
+    parquet_template = K_CORE_PROJECTED_ACTORS_PARQUET_TEMPLATE if graph_node_type == 'actor' else K_CORE_PROJECTED_DIRECTORS_PARQUET_TEMPLATE
+    return {k: read_csr_graph_parquet(parquet_template%k) for k in sorted(ks)}
+
+def generate_k_core_graphs(full_projected_actors_graph: CSRGraph, full_projected_directors_graph: CSRGraph) -> Tuple[dict,dict]:
     with timer(section_name='K-core computation'):
-        processes: List[mp.Process] = []
-        output_queue = mp.SimpleQueue()
-        sorted_k_core_choices_for_k = sorted(K_CORE_CHOICES_FOR_K)
-        for k in sorted_k_core_choices_for_k:
-            actor_process = mp.Process(target=generate_k_core_graph, args=(full_projected_actors_graph, k, 'actor', output_queue))
-            actor_process.start()
-            processes.append(actor_process)
-            
-            director_process = mp.Process(target=generate_k_core_graph, args=(full_projected_directors_graph, k, 'director', output_queue))
-            director_process.start()
-            processes.append(director_process)
-        
-        for _ in tqdm_with_message(range(len(processes)), post_yield_message_func = lambda index: f'Gathering Results from K-Core Process {index}', bar_format='{l_bar}{bar:50}{r_bar}'):
-            k_core_graph, graph_node_type, k = output_queue.get()
-            if graph_node_type == 'actor':
-                k_to_actor_k_core_graph_map[k] = k_core_graph
-            else:
-                assert graph_node_type == 'director'
-                k_to_director_k_core_graph_map[k] = k_core_graph
-        for process in tqdm_with_message(processes, post_yield_message_func = lambda index: f'Join K-Core Process {index}', bar_format='{l_bar}{bar:50}{r_bar}'):
-            process.join()
+        k_to_actor_k_core_graph_map = generate_k_core_graphs_for_graph(full_projected_actors_graph, 'actor')
+        k_to_director_k_core_graph_map = generate_k_core_graphs_for_graph(full_projected_directors_graph, 'director')
     return k_to_actor_k_core_graph_map, k_to_director_k_core_graph_map
 
+##############
+# Graph Jobs #
+##############
+
+NUMBER_OF_WORKERS = mp.cpu_count()
+
+# Rough relative cost of each metric in terms of the number of nodes and edges. Only used to start the expensive jobs first.
+METRIC_TO_COST_MODEL = {
+    'label_propagation': lambda number_of_nodes, number_of_edges: 10 * number_of_edges,
+    'louvain': lambda number_of_nodes, number_of_edges: 10 * number_of_edges * math.log2(number_of_nodes+2),
+    'hits': lambda number_of_nodes, number_of_edges: 100 * number_of_edges,
+    'square_clustering_coefficient': lambda number_of_nodes, number_of_edges: 10 * number_of_edges * number_of_edges / max(number_of_nodes, 1),
+    'clustering_coefficient': lambda number_of_nodes, number_of_edges: number_of_edges * number_of_edges / max(number_of_nodes, 1),
+    'pagerank': lambda number_of_nodes, number_of_edges: 100 * number_of_edges,
+    'betweenness_and_closeness': lambda number_of_nodes, number_of_edges: 2 * number_of_nodes * number_of_edges,
+    'eigenvector': lambda number_of_nodes, number_of_edges: 100 * number_of_edges,
+    'degree': lambda number_of_nodes, number_of_edges: number_of_nodes,
+    'katz': lambda number_of_nodes, number_of_edges: 1000 * number_of_edges,
+    'kevin_bacon': lambda number_of_nodes, number_of_edges: number_of_nodes * number_of_edges / SOURCES_PER_CHUNK,
+}
+
+def graph_job(metric_name: str, function: Callable, graph_handle: str, *output_files: str, parameters: tuple = ()) -> Job:
+    graph = attach_csr_graph(graph_handle, load_node_names=False)
+    estimated_cost = METRIC_TO_COST_MODEL[metric_name](csr_graph_number_of_nodes(graph), csr_graph_number_of_edges(graph))
+    # the checkpoint key uses the graph's content rather than its handle since handles are only valid for one run
+    checkpoint_key = job_checkpoint_key(function, output_files+parameters, (stored_csr_graph_hash(graph_handle),))
+    return Job(name=f'{metric_name} {os.path.basename(graph_handle)}',
+               function=function,
+               args=(graph_handle,)+output_files+parameters,
+               output_files=output_files,
+               estimated_cost=estimated_cost,
+               checkpoint_key=checkpoint_key)
+
+def k_core_chain_job(metric_name: str, function: Callable, k_to_graph_handle_map: dict, *k_to_output_file_maps: dict, summary_output_files: Tuple[str, ...] = ()) -> Job:
+    '''
+    One job over all the k-core graphs of one type, largest graph first, so that each can warm start from the results on the one before.
+    summary_output_files are written once for the whole chain rather than once per k-core graph.
+    '''
+    ks = sorted(k_to_graph_handle_map.keys())
+    graph_handles = tuple(k_to_graph_handle_map[k] for k in ks)
+    output_file_groups = tuple(tuple(k_to_output_file_map[k] for k in ks) for k_to_output_file_map in k_to_output_file_maps)
+    graphs = [attach_csr_graph(graph_handle, load_node_names=False) for graph_handle in graph_handles]
+    estimated_cost = sum(METRIC_TO_COST_MODEL[metric_name](csr_graph_number_of_nodes(graph), csr_graph_number_of_edges(graph)) for graph in graphs)
+    checkpoint_key = job_checkpoint_key(function, output_file_groups+summary_output_files, tuple(map(stored_csr_graph_hash, graph_handles)))
+    graph_name = os.path.basename(graph_handles[0]).rsplit('_k_core_', 1)[0]
+    return Job(name=f'{metric_name} {graph_name}_k_cores',
+               function=function,
+               args=(graph_handles,)+output_file_groups+summary_output_files,
+               output_files=sum(output_file_groups, ())+summary_output_files,
+               estimated_cost=estimated_cost,
+               checkpoint_key=checkpoint_key)
+
+# Searches from every node of a big graph are split into partial jobs over ranges of the sources so that they're spread over the workers.
+# Once all the partial jobs are done, a reduce job per graph combines their partial results.
+SOURCES_PER_PARTIAL_JOB = 16 * SOURCES_PER_CHUNK
+PARTIAL_RESULTS_DIR_NAME = 'partial_results'
+
+def write_partial_results(partial_results_file: str, **arrays: np.ndarray) -> None:
+    os.makedirs(os.path.dirname(partial_results_file), exist_ok=True)
+    np.savez(partial_results_file, **arrays)
+    return
+
+def read_partial_results(partial_results_files: Tuple[str, ...]) -> List[dict]:
+    partial_results = []
+    for partial_results_file in partial_results_files:
+        with np.load(partial_results_file) as arrays:
+            partial_results.append({array_name: arrays[array_name] for array_name in arrays.files})
+    return partial_results
+
+def source_partitioned_graph_jobs(metric_name: str, partial_function: Callable, reduce_function: Callable, graph_handle: str, number_of_sources: int, metrics_dir: str, *output_files: str, parameters: tuple = ()) -> Tuple[List[Job], Job]:
+    '''
+    Returns (partial_jobs, reduce_job). Each partial job calls partial_function(graph_handle, partial_results_file, *parameters, source_start, source_end)
+    and the reduce job calls reduce_function(graph_handle, *output_files, partial_results_files, *parameters), so it has to run after the partial jobs.
+    '''
+    number_of_partial_jobs = max(1, math.ceil(number_of_sources / SOURCES_PER_PARTIAL_JOB))
+    source_boundaries = [number_of_sources * index // number_of_partial_jobs for index in range(number_of_partial_jobs+1)]
+    partial_jobs: List[Job] = []
+    for source_start, source_end in zip(source_boundaries[:-1], source_boundaries[1:]):
+        partial_results_file = os.path.join(metrics_dir, PARTIAL_RESULTS_DIR_NAME, f'{metric_name}_{source_start}_{source_end}.npz')
+        partial_job = graph_job(metric_name, partial_function, graph_handle, partial_results_file, parameters=parameters+(source_start, source_end))
+        partial_jobs.append(partial_job._replace(name=f'{partial_job.name} sources {source_start}-{source_end}',
+                                                 estimated_cost=partial_job.estimated_cost * (source_end - source_start) / max(number_of_sources, 1)))
+    partial_results_files = tuple(partial_job.output_files[0] for partial_job in partial_jobs)
+    reduce_job = graph_job(metric_name, reduce_function, graph_handle, *output_files, parameters=(partial_results_files,)+parameters)
+    # the reduce job's results depend on the code of the partial jobs too
+    reduce_checkpoint_key = job_checkpoint_key(reduce_function, output_files+(partial_results_files,)+parameters, (stored_csr_graph_hash(graph_handle),)+tuple(partial_job.checkpoint_key for partial_job in partial_jobs))
+    reduce_job = reduce_job._replace(name=f'{reduce_job.name} reduce', estimated_cost=0.0, checkpoint_key=reduce_checkpoint_key)
+    return partial_jobs, reduce_job
+
 ########################
 # Generate Communities #
 ########################
 
-def write_node_to_label_map_to_csv(node_to_label_map: dict, csv_file: str) -> None:
-    if len(node_to_label_map) == 0:
-        with open(csv_file, 'w') as f:
-            f.write('node,label')
-    else:
-        label_df = pd.DataFrame.from_dict(node_to_label_map, orient='index')
-        label_df.to_csv(csv_file, index_label='node', header=['label'])
+def generate_community_columns(community_function: Callable, graph_handles: Tuple[str, ...], column_files: Tuple[str, ...], report_csv_file: str) -> None:
+    '''community_function may start from the labels found on the graph before. The report has the modularity and time taken for each graph.'''
+    report_rows: List[dict] = []
+    previous_graph, previous_labels = None, None
+    for graph_handle, column_file in zip(graph_handles, column_files):
+        graph = attach_csr_graph(graph_handle)
+        initial_labels = None if previous_graph is None else warm_start_labels(previous_labels, previous_graph, graph)
+        start_time = time.time()
+        labels = community_function(graph, initial_labels=initial_labels)
+        end_time = time.time()
+        write_metric_column(column_file, labels)
+        report_rows.append({'graph': os.path.basename(graph_handle),
+                            'number_of_nodes': csr_graph_number_of_nodes(graph),
+                            'number_of_edges': csr_graph_number_of_edges(graph),
+                            'number_of_communities': len(np.unique(labels)),
+                            'modularity': modularity(graph, labels),
+                            'seconds': end_time - start_time})
+        if csr_graph_number_of_nodes(graph) > 0:
+            previous_graph, previous_labels = graph, labels
+    pd.DataFrame(report_rows).to_csv(report_csv_file, index=False)
     return
 
 # Label Propagation
@@ -192,76 +277,73 @@ def write_node_to_label_map_to_csv(node_to_label_map: dict, csv_file: str) -> No
 ACTORS_LABEL_PROP_CSV_TEMPLATE = './output/projected_actors_k_core_%d_label_propagation.csv'
 DIRECTORS_LABEL_PROP_CSV_TEMPLATE = './output/projected_directors_k_core_%d_label_propagation.csv'
 
-def generate_label_propagation_csv(graph: nx.Graph, csv_file: str) -> None:
-    communities = nx.algorithms.community.label_propagation.label_propagation_communities(graph)
-    node_to_label_map = dict()
-    for label, nodes in enumerate(communities):
-        for node in nodes:
-            assert node not in node_to_label_map
-            node_to_label_map[node] = label
-    write_node_to_label_map_to_csv(node_to_label_map, csv_file)
+ACTORS_LABEL_PROP_REPORT_CSV = './output/projected_actors_label_propagation_report.csv'
+DIRECTORS_LABEL_PROP_REPORT_CSV = './output/projected_directors_label_propagation_report.csv'
+
+def generate_label_propagation_columns(graph_handles: Tuple[str, ...], column_files: Tuple[str, ...], report_csv_file: str) -> None:
+    # label propagation always starts from scratch so that it matches nx.algorithms.community.label_propagation_communities
+    generate_community_columns(lambda graph, initial_labels: label_propagation_communities(graph), graph_handles, column_files, report_csv_file)
     return
 
-def generate_label_propagation_processes(k_to_actor_k_core_graph_map: dict, k_to_director_k_core_graph_map: dict) -> List[mp.Process]:
-    processes: List[mp.Process] = []
-    for k, graph in k_to_actor_k_core_graph_map.items():
-        csv_file = ACTORS_LABEL_PROP_CSV_TEMPLATE%k
-        process = mp.Process(target=generate_label_propagation_csv, args=(graph,csv_file))
-        process.start()
-        processes.append(process)
-    for k, graph in k_to_director_k_core_graph_map.items():
-        csv_file = DIRECTORS_LABEL_PROP_CSV_TEMPLATE%k
-        process = mp.Process(target=generate_label_propagation_csv, args=(graph,csv_file))
-        process.start()
-        processes.append(process)
-    return processes
+def generate_label_propagation_jobs(k_to_actor_k_core_graph_handle_map: dict, k_to_director_k_core_graph_handle_map: dict) -> List[Job]:
+    jobs: List[Job] = []
+    if len(k_to_actor_k_core_graph_handle_map) > 0:
+        k_to_column_file_map = {k: metric_column_file(ACTORS_METRICS_DIR_TEMPLATE%k, 'label_propagation') for k in k_to_actor_k_core_graph_handle_map}
+        jobs.append(k_core_chain_job('label_propagation', generate_label_propagation_columns, k_to_actor_k_core_graph_handle_map, k_to_column_file_map, summary_output_files=(ACTORS_LABEL_PROP_REPORT_CSV,)))
+    if len(k_to_director_k_core_graph_handle_map) > 0:
+        k_to_column_file_map = {k: metric_column_file(DIRECTORS_METRICS_DIR_TEMPLATE%k, 'label_propagation') for k in k_to_director_k_core_graph_handle_map}
+        jobs.append(k_core_chain_job('label_propagation', generate_label_propagation_columns, k_to_director_k_core_graph_handle_map, k_to_column_file_map, summary_output_files=(DIRECTORS_LABEL_PROP_REPORT_CSV,)))
+    return jobs
 
 # Louvain
 
 ACTORS_LOUVAIN_CSV_TEMPLATE = './output/projected_actors_k_core_%d_louvain.csv'
 DIRECTORS_LOUVAIN_CSV_TEMPLATE = './output/projected_directors_k_core_%d_louvain.csv'
 
-def generate_louvain_csv(graph: nx.Graph, csv_file: str) -> None:
-    node_to_label_map = community_louvain.best_partition(graph)
-    write_node_to_label_map_to_csv(node_to_label_map, csv_file)
+ACTORS_LOUVAIN_REPORT_CSV = './output/projected_actors_louvain_report.csv'
+DIRECTORS_LOUVAIN_REPORT_CSV = './output/projected_directors_louvain_report.csv'
+
+def generate_louvain_columns(graph_handles: Tuple[str, ...], column_files: Tuple[str, ...], report_csv_file: str) -> None:
+    generate_community_columns(louvain_communities, graph_handles, column_files, report_csv_file)
     return
 
-def generate_louvain_processes(k_to_actor_k_core_graph_map: dict, k_to_director_k_core_graph_map: dict) -> List[mp.Process]:
-    processes: List[mp.Process] = []
-    for k, graph in k_to_actor_k_core_graph_map.items():
-        csv_file = ACTORS_LOUVAIN_CSV_TEMPLATE%k
-        process = mp.Process(target=generate_louvain_csv, args=(graph,csv_file))
-        process.start()
-        processes.append(process)
-    for k, graph in k_to_director_k_core_graph_map.items():
-        csv_file = DIRECTORS_LOUVAIN_CSV_TEMPLATE%k
-        process = mp.Process(target=generate_louvain_csv, args=(graph,csv_file))
-        process.start()
-        processes.append(process)
-    return processes
+def generate_louvain_jobs(k_to_actor_k_core_graph_handle_map: dict, k_to_director_k_core_graph_handle_map: dict) -> List[Job]:
+    jobs: List[Job] = []
+    if len(k_to_actor_k_core_graph_handle_map) > 0:
+        k_to_column_file_map = {k: metric_column_file(ACTORS_METRICS_DIR_TEMPLATE%k, 'louvain') for k in k_to_actor_k_core_graph_handle_map}
+        jobs.append(k_core_chain_job('louvain', generate_louvain_columns, k_to_actor_k_core_graph_handle_map, k_to_column_file_map, summary_output_files=(ACTORS_LOUVAIN_REPORT_CSV,)))
+    if len(k_to_director_k_core_graph_handle_map) > 0:
+        k_to_column_file_map = {k: metric_column_file(DIRECTORS_METRICS_DIR_TEMPLATE%k, 'louvain') for k in k_to_director_k_core_graph_handle_map}
+        jobs.append(k_core_chain_job('louvain', generate_louvain_columns, k_to_director_k_core_graph_handle_map, k_to_column_file_map, summary_output_files=(DIRECTORS_LOUVAIN_REPORT_CSV,)))
+    return jobs
 
 # Top-Level
 
-def generate_communities_for_k_core_graphs(k_to_actor_k_core_graph_map: dict, k_to_director_k_core_graph_map: dict) -> None:
-    processes: List[mp.Process] = []
-    processes = processes + generate_label_propagation_processes(k_to_actor_k_core_graph_map, k_to_director_k_core_graph_map)
-    processes = processes + generate_louvain_processes(k_to_actor_k_core_graph_map, k_to_director_k_core_graph_map)
-    for process in tqdm_with_message(processes, post_yield_message_func = lambda index: f'Join Community Process {index}', bar_format='{l_bar}{bar:50}{r_bar}'):
-        process.join()
-    return
+def generate_community_jobs(k_to_actor_k_core_graph_handle_map: dict, k_to_director_k_core_graph_handle_map: dict) -> List[Job]:
+    jobs: List[Job] = []
+    jobs = jobs + generate_label_propagation_jobs(k_to_actor_k_core_graph_handle_map, k_to_director_k_core_graph_handle_map)
+    jobs = jobs + generate_louvain_jobs(k_to_actor_k_core_graph_handle_map, k_to_director_k_core_graph_handle_map)
+    return jobs
 
 ############################
 # Generate Vertex Rankings #
 ############################
 
-def write_node_to_value_map_to_csv(node_to_value_map: dict, csv_file: str) -> None:
-    if len(node_to_value_map) == 0:
-        with open(csv_file, 'w') as f:
-            f.write('node,value')
-    else:
-        value_df = pd.DataFrame.from_dict(node_to_value_map, orient='index')
-        assert len(value_df.columns) == 1
-        value_df.to_csv(csv_file, index_label='node', header=['value'])
+def node_to_value_map_to_values(node_to_value_map: dict, graph: CSRGraph) -> np.ndarray:
+    return np.array([node_to_value_map[node_name] for node_name in graph.node_names], dtype=float)
+
+def generate_warm_started_vertex_ranking_columns(ranking_function: Callable, graph_handles: Tuple[str, ...], *column_file_groups: Tuple[str, ...]) -> None:
+    '''ranking_function returns one array of values per column group and warm starts from the last one, e.g. HITS returns (hubs, authorities).'''
+    previous_graph, previous_values = None, None
+    for graph_handle, column_files in zip(graph_handles, zip(*column_file_groups)):
+        graph = attach_csr_graph(graph_handle)
+        initial_values = None if previous_graph is None else warm_start_values(previous_values, previous_graph, graph)
+        rankings = ranking_function(graph, initial_values=initial_values)
+        rankings = rankings if isinstance(rankings, tuple) else (rankings,)
+        for values, column_file in zip(rankings, column_files):
+            write_metric_column(column_file, values)
+        if csr_graph_number_of_nodes(graph) > 0:
+            previous_graph, previous_values = graph, rankings[-1]
     return
 
 # HITS
@@ -272,195 +354,167 @@ DIRECTORS_HITS_AUTHORITY_CSV_TEMPLATE  = './output/projected_directors_k_core_%d
 ACTORS_HITS_HUB_CSV_TEMPLATE  = './output/projected_actors_k_core_%d_hits_hub.csv'
 DIRECTORS_HITS_HUB_CSV_TEMPLATE  = './output/projected_directors_k_core_%d_hits_hub.csv'
 
-def generate_hits_csv(graph: nx.Graph, hub_csv_file: str, authority_csv_file: str) -> None:
-    node_to_hub_value_map, node_to_authority_value_map = nx.hits(graph, max_iter=1000, normalized=True)
-    write_node_to_value_map_to_csv(node_to_hub_value_map, hub_csv_file)
-    write_node_to_value_map_to_csv(node_to_authority_value_map, authority_csv_file)
+def generate_hits_columns(graph_handles: Tuple[str, ...], hub_column_files: Tuple[str, ...], authority_column_files: Tuple[str, ...]) -> None:
+    generate_warm_started_vertex_ranking_columns(lambda graph, initial_values: hits(graph, max_iter=1000, initial_values=initial_values), graph_handles, hub_column_files, authority_column_files)
     return
 
-def generate_hits_processes(k_to_actor_k_core_graph_map: dict, k_to_director_k_core_graph_map: dict) -> List[mp.Process]:
-    processes: List[mp.Process] = []
-    for k, graph in k_to_actor_k_core_graph_map.items():
-        hub_csv_file = ACTORS_HITS_HUB_CSV_TEMPLATE%k
-        authority_csv_file = ACTORS_HITS_AUTHORITY_CSV_TEMPLATE%k
-        process = mp.Process(target=generate_hits_csv, args=(graph,hub_csv_file,authority_csv_file))
-        process.start()
-        processes.append(process)
-    for k, graph in k_to_director_k_core_graph_map.items():
-        hub_csv_file = DIRECTORS_HITS_HUB_CSV_TEMPLATE%k
-        authority_csv_file = DIRECTORS_HITS_AUTHORITY_CSV_TEMPLATE%k
-        process = mp.Process(target=generate_hits_csv, args=(graph,hub_csv_file,authority_csv_file))
-        process.start()
-        processes.append(process)
-    return processes
+def generate_hits_jobs(k_to_actor_k_core_graph_handle_map: dict, k_to_director_k_core_graph_handle_map: dict) -> List[Job]:
+    jobs: List[Job] = []
+    if len(k_to_actor_k_core_graph_handle_map) > 0:
+        k_to_hub_column_file_map = {k: metric_column_file(ACTORS_METRICS_DIR_TEMPLATE%k, 'hits_hub') for k in k_to_actor_k_core_graph_handle_map}
+        k_to_authority_column_file_map = {k: metric_column_file(ACTORS_METRICS_DIR_TEMPLATE%k, 'hits_authority') for k in k_to_actor_k_core_graph_handle_map}
+        jobs.append(k_core_chain_job('hits', generate_hits_columns, k_to_actor_k_core_graph_handle_map, k_to_hub_column_file_map, k_to_authority_column_file_map))
+    if len(k_to_director_k_core_graph_handle_map) > 0:
+        k_to_hub_column_file_map = {k: metric_column_file(DIRECTORS_METRICS_DIR_TEMPLATE%k, 'hits_hub') for k in k_to_director_k_core_graph_handle_map}
+        k_to_authority_column_file_map = {k: metric_column_file(DIRECTORS_METRICS_DIR_TEMPLATE%k, 'hits_authority') for k in k_to_director_k_core_graph_handle_map}
+        jobs.append(k_core_chain_job('hits', generate_hits_columns, k_to_director_k_core_graph_handle_map, k_to_hub_column_file_map, k_to_authority_column_file_map))
+    return jobs
 
 # Square Clustering Coefficient
 
 ACTORS_SQUARE_CLUSTERING_COEFFICIENT_CSV_TEMPLATE  = './output/projected_actors_k_core_%d_square_clustering_coefficient.csv'
 DIRECTORS_SQUARE_CLUSTERING_COEFFICIENT_CSV_TEMPLATE  = './output/projected_directors_k_core_%d_square_clustering_coefficient.csv'
 
-def generate_square_clustering_coefficient_csv(graph: nx.Graph, csv_file: str) -> None:
-    node_to_value_map = nx.square_clustering(graph)
-    write_node_to_value_map_to_csv(node_to_value_map, csv_file)
+def generate_square_clustering_coefficient_column(graph_handle: str, column_file: str) -> None:
+    graph = attach_csr_graph(graph_handle)
+    node_to_value_map = nx.square_clustering(csr_graph_to_networkx(graph))
+    write_metric_column(column_file, node_to_value_map_to_values(node_to_value_map, graph))
     return
 
-def generate_square_clustering_coefficient_processes(k_to_actor_k_core_graph_map: dict, k_to_director_k_core_graph_map: dict) -> List[mp.Process]:
-    processes: List[mp.Process] = []
-    for k, graph in k_to_actor_k_core_graph_map.items():
-        csv_file = ACTORS_SQUARE_CLUSTERING_COEFFICIENT_CSV_TEMPLATE%k
-        process = mp.Process(target=generate_square_clustering_coefficient_csv, args=(graph,csv_file))
-        process.start()
-        processes.append(process)
-    for k, graph in k_to_director_k_core_graph_map.items():
-        csv_file = DIRECTORS_SQUARE_CLUSTERING_COEFFICIENT_CSV_TEMPLATE%k
-        process = mp.Process(target=generate_square_clustering_coefficient_csv, args=(graph,csv_file))
-        process.start()
-        processes.append(process)
-    return processes
+def generate_square_clustering_coefficient_jobs(k_to_actor_k_core_graph_handle_map: dict, k_to_director_k_core_graph_handle_map: dict) -> List[Job]:
+    jobs: List[Job] = []
+    for k, graph_handle in k_to_actor_k_core_graph_handle_map.items():
+        column_file = metric_column_file(ACTORS_METRICS_DIR_TEMPLATE%k, 'square_clustering_coefficient')
+        jobs.append(graph_job('square_clustering_coefficient', generate_square_clustering_coefficient_column, graph_handle, column_file))
+    for k, graph_handle in k_to_director_k_core_graph_handle_map.items():
+        column_file = metric_column_file(DIRECTORS_METRICS_DIR_TEMPLATE%k, 'square_clustering_coefficient')
+        jobs.append(graph_job('square_clustering_coefficient', generate_square_clustering_coefficient_column, graph_handle, column_file))
+    return jobs
 
 # Clustering Coefficient
 
 ACTORS_CLUSTERING_COEFFICIENT_CSV_TEMPLATE  = './output/projected_actors_k_core_%d_clustering_coefficient.csv'
 DIRECTORS_CLUSTERING_COEFFICIENT_CSV_TEMPLATE  = './output/projected_directors_k_core_%d_clustering_coefficient.csv'
 
-def generate_clustering_coefficient_csv(graph: nx.Graph, csv_file: str) -> None:
-    node_to_value_map = nx.clustering(graph)
-    write_node_to_value_map_to_csv(node_to_value_map, csv_file)
+def generate_clustering_coefficient_column(graph_handle: str, column_file: str) -> None:
+    graph = attach_csr_graph(graph_handle)
+    node_to_value_map = nx.clustering(csr_graph_to_networkx(graph))
+    write_metric_column(column_file, node_to_value_map_to_values(node_to_value_map, graph))
     return
 
-def generate_clustering_coefficient_processes(k_to_actor_k_core_graph_map: dict, k_to_director_k_core_graph_map: dict) -> List[mp.Process]:
-    processes: List[mp.Process] = []
-    for k, graph in k_to_actor_k_core_graph_map.items():
-        csv_file = ACTORS_CLUSTERING_COEFFICIENT_CSV_TEMPLATE%k
-        process = mp.Process(target=generate_clustering_coefficient_csv, args=(graph,csv_file))
-        process.start()
-        processes.append(process)
-    for k, graph in k_to_director_k_core_graph_map.items():
-        csv_file = DIRECTORS_CLUSTERING_COEFFICIENT_CSV_TEMPLATE%k
-        process = mp.Process(target=generate_clustering_coefficient_csv, args=(graph,csv_file))
-        process.start()
-        processes.append(process)
-    return processes
+def generate_clustering_coefficient_jobs(k_to_actor_k_core_graph_handle_map: dict, k_to_director_k_core_graph_handle_map: dict) -> List[Job]:
+    jobs: List[Job] = []
+    for k, graph_handle in k_to_actor_k_core_graph_handle_map.items():
+        column_file = metric_column_file(ACTORS_METRICS_DIR_TEMPLATE%k, 'clustering_coefficient')
+        jobs.append(graph_job('clustering_coefficient', generate_clustering_coefficient_column, graph_handle, column_file))
+    for k, graph_handle in k_to_director_k_core_graph_handle_map.items():
+        column_file = metric_column_file(DIRECTORS_METRICS_DIR_TEMPLATE%k, 'clustering_coefficient')
+        jobs.append(graph_job('clustering_coefficient', generate_clustering_coefficient_column, graph_handle, column_file))
+    return jobs
 
 # PageRank
 
 ACTORS_PAGERANK_CSV_TEMPLATE  = './output/projected_actors_k_core_%d_pagerank.csv'
 DIRECTORS_PAGERANK_CSV_TEMPLATE  = './output/projected_directors_k_core_%d_pagerank.csv'
 
-def generate_pagerank_csv(graph: nx.Graph, csv_file: str) -> None:
-    node_to_value_map = nx.pagerank(graph)
-    write_node_to_value_map_to_csv(node_to_value_map, csv_file)
+def generate_pagerank_columns(graph_handles: Tuple[str, ...], column_files: Tuple[str, ...]) -> None:
+    generate_warm_started_vertex_ranking_columns(lambda graph, initial_values: pagerank(graph, initial_values=initial_values), graph_handles, column_files)
     return
 
-def generate_pagerank_processes(k_to_actor_k_core_graph_map: dict, k_to_director_k_core_graph_map: dict) -> List[mp.Process]:
-    processes: List[mp.Process] = []
-    for k, graph in k_to_actor_k_core_graph_map.items():
-        csv_file = ACTORS_PAGERANK_CSV_TEMPLATE%k
-        process = mp.Process(target=generate_pagerank_csv, args=(graph,csv_file))
-        process.start()
-        processes.append(process)
-    for k, graph in k_to_director_k_core_graph_map.items():
-        csv_file = DIRECTORS_PAGERANK_CSV_TEMPLATE%k
-        process = mp.Process(target=generate_pagerank_csv, args=(graph,csv_file))
-        process.start()
-        processes.append(process)
-    return processes
-
-# Closeness
+def generate_pagerank_jobs(k_to_actor_k_core_graph_handle_map: dict, k_to_director_k_core_graph_handle_map: dict) -> List[Job]:
+    jobs: List[Job] = []
+    if len(k_to_actor_k_core_graph_handle_map) > 0:
+        k_to_column_file_map = {k: metric_column_file(ACTORS_METRICS_DIR_TEMPLATE%k, 'pagerank') for k in k_to_actor_k_core_graph_handle_map}
+        jobs.append(k_core_chain_job('pagerank', generate_pagerank_columns, k_to_actor_k_core_graph_handle_map, k_to_column_file_map))
+    if len(k_to_director_k_core_graph_handle_map) > 0:
+        k_to_column_file_map = {k: metric_column_file(DIRECTORS_METRICS_DIR_TEMPLATE%k, 'pagerank') for k in k_to_director_k_core_graph_handle_map}
+        jobs.append(k_core_chain_job('pagerank', generate_pagerank_columns, k_to_director_k_core_graph_handle_map, k_to_column_file_map))
+    return jobs
+
+# Betweenness & Closeness
 
 ACTORS_CLOSENESS_CSV_TEMPLATE  = './output/projected_actors_k_core_%d_closeness.csv'
 DIRECTORS_CLOSENESS_CSV_TEMPLATE  = './output/projected_directors_k_core_%d_closeness.csv'
 
-def generate_closeness_csv(graph: nx.Graph, csv_file: str) -> None:
-    node_to_value_map = nx.closeness_centrality(graph) if len(graph.nodes) > 0 else dict()
-    write_node_to_value_map_to_csv(node_to_value_map, csv_file)
-    return
-
-def generate_closeness_centrality_processes(k_to_actor_k_core_graph_map: dict, k_to_director_k_core_graph_map: dict) -> List[mp.Process]:
-    processes: List[mp.Process] = []
-    for k, graph in k_to_actor_k_core_graph_map.items():
-        csv_file = ACTORS_CLOSENESS_CSV_TEMPLATE%k
-        process = mp.Process(target=generate_closeness_csv, args=(graph,csv_file))
-        process.start()
-        processes.append(process)
-    for k, graph in k_to_director_k_core_graph_map.items():
-        csv_file = DIRECTORS_CLOSENESS_CSV_TEMPLATE%k
-        process = mp.Process(target=generate_closeness_csv, args=(graph,csv_file))
-        process.start()
-        processes.append(process)
-    return processes
-
-# Betweenness
-
 ACTORS_BETWEENNESS_CSV_TEMPLATE  = './output/projected_actors_k_core_%d_betweenness.csv'
 DIRECTORS_BETWEENNESS_CSV_TEMPLATE  = './output/projected_directors_k_core_%d_betweenness.csv'
 
-def generate_betweenness_csv(graph: nx.Graph, csv_file: str) -> None:
-    node_to_value_map = nx.betweenness_centrality(graph) if len(graph.nodes) > 0 else dict()
-    write_node_to_value_map_to_csv(node_to_value_map, csv_file)
+# None means exact, otherwise betweenness and closeness are estimated from this many sampled pivots (see centrality.py)
+BETWEENNESS_AND_CLOSENESS_NUMBER_OF_PIVOTS = None
+
+def generate_betweenness_and_closeness_partial_results(graph_handle: str, partial_results_file: str, number_of_pivots: int, source_start: int, source_end: int) -> None:
+    graph = attach_csr_graph(graph_handle, load_node_names=False)
+    sources, _ = betweenness_and_closeness_sources(graph, number_of_pivots=number_of_pivots)
+    dependencies, distance_sums, reached_counts = accumulate_betweenness_and_closeness(graph, sources[source_start:source_end], number_of_processes=1)
+    write_partial_results(partial_results_file, dependencies=dependencies, distance_sums=distance_sums, reached_counts=reached_counts)
     return
 
-def generate_betweenness_centrality_processes(k_to_actor_k_core_graph_map: dict, k_to_director_k_core_graph_map: dict) -> List[mp.Process]:
-    processes: List[mp.Process] = []
-    for k, graph in k_to_actor_k_core_graph_map.items():
-        csv_file = ACTORS_BETWEENNESS_CSV_TEMPLATE%k
-        process = mp.Process(target=generate_betweenness_csv, args=(graph,csv_file))
-        process.start()
-        processes.append(process)
-    for k, graph in k_to_director_k_core_graph_map.items():
-        csv_file = DIRECTORS_BETWEENNESS_CSV_TEMPLATE%k
-        process = mp.Process(target=generate_betweenness_csv, args=(graph,csv_file))
-        process.start()
-        processes.append(process)
-    return processes
+def generate_betweenness_and_closeness_columns(graph_handle: str, betweenness_column_file: str, closeness_column_file: str, partial_results_files: Tuple[str, ...], number_of_pivots: int) -> None:
+    graph = attach_csr_graph(graph_handle, load_node_names=False)
+    _, component_sizes = betweenness_and_closeness_sources(graph, number_of_pivots=number_of_pivots)
+    partial_results = read_partial_results(partial_results_files)
+    dependencies, distance_sums, reached_counts = (sum(partial_result[array_name] for partial_result in partial_results) for array_name in ('dependencies', 'distance_sums', 'reached_counts'))
+    betweenness, closeness = finalize_betweenness_and_closeness(component_sizes, dependencies, distance_sums, reached_counts)
+    write_metric_column(betweenness_column_file, betweenness)
+    write_metric_column(closeness_column_file, closeness)
+    return
+
+def generate_betweenness_and_closeness_centrality_jobs(k_to_actor_k_core_graph_handle_map: dict, k_to_director_k_core_graph_handle_map: dict) -> Tuple[List[Job], List[Job]]:
+    '''Returns (partial_jobs, reduce_jobs), see source_partitioned_graph_jobs.'''
+    partial_jobs: List[Job] = []
+    reduce_jobs: List[Job] = []
+    for k_to_graph_handle_map, metrics_dir_template in ((k_to_actor_k_core_graph_handle_map, ACTORS_METRICS_DIR_TEMPLATE), (k_to_director_k_core_graph_handle_map, DIRECTORS_METRICS_DIR_TEMPLATE)):
+        for k, graph_handle in k_to_graph_handle_map.items():
+            metrics_dir = metrics_dir_template%k
+            betweenness_column_file = metric_column_file(metrics_dir, 'betweenness')
+            closeness_column_file = metric_column_file(metrics_dir, 'closeness')
+            sources, _ = betweenness_and_closeness_sources(attach_csr_graph(graph_handle, load_node_names=False), number_of_pivots=BETWEENNESS_AND_CLOSENESS_NUMBER_OF_PIVOTS)
+            graph_partial_jobs, reduce_job = source_partitioned_graph_jobs('betweenness_and_closeness', generate_betweenness_and_closeness_partial_results, generate_betweenness_and_closeness_columns,
+                                                                           graph_handle, len(sources), metrics_dir, betweenness_column_file, closeness_column_file,
+                                                                           parameters=(BETWEENNESS_AND_CLOSENESS_NUMBER_OF_PIVOTS,))
+            partial_jobs = partial_jobs + graph_partial_jobs
+            reduce_jobs.append(reduce_job)
+    return partial_jobs, reduce_jobs
 
 # Eigenvector
 
 ACTORS_EIGENVECTOR_CSV_TEMPLATE  = './output/projected_actors_k_core_%d_eigenvector.csv'
 DIRECTORS_EIGENVECTOR_CSV_TEMPLATE  = './output/projected_directors_k_core_%d_eigenvector.csv'
 
-def generate_eigenvector_csv(graph: nx.Graph, csv_file: str) -> None:
-    node_to_value_map = nx.eigenvector_centrality(graph, max_iter=1000) if len(graph.nodes) > 0 else dict()
-    write_node_to_value_map_to_csv(node_to_value_map, csv_file)
+def generate_eigenvector_columns(graph_handles: Tuple[str, ...], column_files: Tuple[str, ...]) -> None:
+    generate_warm_started_vertex_ranking_columns(lambda graph, initial_values: eigenvector_centrality(graph, max_iter=1000, initial_values=initial_values), graph_handles, column_files)
     return
 
-def generate_eigenvector_centrality_processes(k_to_actor_k_core_graph_map: dict, k_to_director_k_core_graph_map: dict) -> List[mp.Process]:
-    processes: List[mp.Process] = []
-    for k, graph in k_to_actor_k_core_graph_map.items():
-        csv_file = ACTORS_EIGENVECTOR_CSV_TEMPLATE%k
-        process = mp.Process(target=generate_eigenvector_csv, args=(graph,csv_file))
-        process.start()
-        processes.append(process)
-    for k, graph in k_to_director_k_core_graph_map.items():
-        csv_file = DIRECTORS_EIGENVECTOR_CSV_TEMPLATE%k
-        process = mp.Process(target=generate_eigenvector_csv, args=(graph,csv_file))
-        process.start()
-        processes.append(process)
-    return processes
+def generate_eigenvector_centrality_jobs(k_to_actor_k_core_graph_handle_map: dict, k_to_director_k_core_graph_handle_map: dict) -> List[Job]:
+    jobs: List[Job] = []
+    if len(k_to_actor_k_core_graph_handle_map) > 0:
+        k_to_column_file_map = {k: metric_column_file(ACTORS_METRICS_DIR_TEMPLATE%k, 'eigenvector') for k in k_to_actor_k_core_graph_handle_map}
+        jobs.append(k_core_chain_job('eigenvector', generate_eigenvector_columns, k_to_actor_k_core_graph_handle_map, k_to_column_file_map))
+    if len(k_to_director_k_core_graph_handle_map) > 0:
+        k_to_column_file_map = {k: metric_column_file(DIRECTORS_METRICS_DIR_TEMPLATE%k, 'eigenvector') for k in k_to_director_k_core_graph_handle_map}
+        jobs.append(k_core_chain_job('eigenvector', generate_eigenvector_columns, k_to_director_k_core_graph_handle_map, k_to_column_file_map))
+    return jobs
 
 # Degree
 
 ACTORS_DEGREE_CSV_TEMPLATE  = './output/projected_actors_k_core_%d_degree.csv'
 DIRECTORS_DEGREE_CSV_TEMPLATE  = './output/projected_directors_k_core_%d_degree.csv'
 
-def generate_degree_csv(graph: nx.Graph, csv_file: str) -> None:
-    node_to_value_map = nx.degree_centrality(graph) if len(graph.nodes) > 0 else dict()
-    write_node_to_value_map_to_csv(node_to_value_map, csv_file)
+def generate_degree_column(graph_handle: str, column_file: str) -> None:
+    graph = attach_csr_graph(graph_handle)
+    node_to_value_map = nx.degree_centrality(csr_graph_to_networkx(graph)) if csr_graph_number_of_nodes(graph) > 0 else dict()
+    write_metric_column(column_file, node_to_value_map_to_values(node_to_value_map, graph))
     return
 
-def generate_degree_centrality_processes(k_to_actor_k_core_graph_map: dict, k_to_director_k_core_graph_map: dict) -> List[mp.Process]:
-    processes: List[mp.Process] = []
-    for k, graph in k_to_actor_k_core_graph_map.items():
-        csv_file = ACTORS_DEGREE_CSV_TEMPLATE%k
-        process = mp.Process(target=generate_degree_csv, args=(graph,csv_file))
-        process.start()
-        processes.append(process)
-    for k, graph in k_to_director_k_core_graph_map.items():
-        csv_file = DIRECTORS_DEGREE_CSV_TEMPLATE%k
-        process = mp.Process(target=generate_degree_csv, args=(graph,csv_file))
-        process.start()
-        processes.append(process)
-    return processes
+def generate_degree_centrality_jobs(k_to_actor_k_core_graph_handle_map: dict, k_to_director_k_core_graph_handle_map: dict) -> List[Job]:
+    jobs: List[Job] = []
+    for k, graph_handle in k_to_actor_k_core_graph_handle_map.items():
+        column_file = metric_column_file(ACTORS_METRICS_DIR_TEMPLATE%k, 'degree')
+        jobs.append(graph_job('degree', generate_degree_column, graph_handle, column_file))
+    for k, graph_handle in k_to_director_k_core_graph_handle_map.items():
+        column_file = metric_column_file(DIRECTORS_METRICS_DIR_TEMPLATE%k, 'degree')
+        jobs.append(graph_job('degree', generate_degree_column, graph_handle, column_file))
+    return jobs
 
 # Katz
 
@@ -468,105 +522,206 @@ KATZ_ALHPA = 0.01
 ACTORS_KATZ_CSV_TEMPLATE  = './output/projected_actors_k_core_%d_katz.csv'
 DIRECTORS_KATZ_CSV_TEMPLATE  = './output/projected_directors_k_core_%d_katz.csv'
 
-def generate_katz_csv(graph: nx.Graph, csv_file: str) -> None:
-    node_to_value_map = nx.katz_centrality(graph, KATZ_ALHPA)
-    write_node_to_value_map_to_csv(node_to_value_map, csv_file)
+def generate_katz_columns(graph_handles: Tuple[str, ...], column_files: Tuple[str, ...]) -> None:
+    generate_warm_started_vertex_ranking_columns(lambda graph, initial_values: katz_centrality(graph, KATZ_ALHPA, initial_values=initial_values), graph_handles, column_files)
     return
 
-def generate_katz_centrality_processes(k_to_actor_k_core_graph_map: dict, k_to_director_k_core_graph_map: dict) -> List[mp.Process]:
-    processes: List[mp.Process] = []
-    for k, graph in k_to_actor_k_core_graph_map.items():
-        csv_file = ACTORS_KATZ_CSV_TEMPLATE%k
-        process = mp.Process(target=generate_katz_csv, args=(graph,csv_file))
-        process.start()
-        processes.append(process)
-    for k, graph in k_to_director_k_core_graph_map.items():
-        csv_file = DIRECTORS_KATZ_CSV_TEMPLATE%k
-        process = mp.Process(target=generate_katz_csv, args=(graph,csv_file))
-        process.start()
-        processes.append(process)
-    return processes
+def generate_katz_centrality_jobs(k_to_actor_k_core_graph_handle_map: dict, k_to_director_k_core_graph_handle_map: dict) -> List[Job]:
+    jobs: List[Job] = []
+    if len(k_to_actor_k_core_graph_handle_map) > 0:
+        k_to_column_file_map = {k: metric_column_file(ACTORS_METRICS_DIR_TEMPLATE%k, 'katz') for k in k_to_actor_k_core_graph_handle_map}
+        jobs.append(k_core_chain_job('katz', generate_katz_columns, k_to_actor_k_core_graph_handle_map, k_to_column_file_map))
+    if len(k_to_director_k_core_graph_handle_map) > 0:
+        k_to_column_file_map = {k: metric_column_file(DIRECTORS_METRICS_DIR_TEMPLATE%k, 'katz') for k in k_to_director_k_core_graph_handle_map}
+        jobs.append(k_core_chain_job('katz', generate_katz_columns, k_to_director_k_core_graph_handle_map, k_to_column_file_map))
+    return jobs
 
 # Top-Level
 
-def generate_vertex_rankings_for_k_core_graphs(k_to_actor_k_core_graph_map: dict, k_to_director_k_core_graph_map: dict) -> None:
-    processes: List[mp.Process] = []
-    processes = processes + generate_katz_centrality_processes(k_to_actor_k_core_graph_map, k_to_director_k_core_graph_map)
-    processes = processes + generate_hits_processes(k_to_actor_k_core_graph_map, k_to_director_k_core_graph_map)
-    processes = processes + generate_square_clustering_coefficient_processes(k_to_actor_k_core_graph_map, k_to_director_k_core_graph_map)
-    processes = processes + generate_clustering_coefficient_processes(k_to_actor_k_core_graph_map, k_to_director_k_core_graph_map)
-    processes = processes + generate_pagerank_processes(k_to_actor_k_core_graph_map, k_to_director_k_core_graph_map)
-    processes = processes + generate_closeness_centrality_processes(k_to_actor_k_core_graph_map, k_to_director_k_core_graph_map)
-    processes = processes + generate_betweenness_centrality_processes(k_to_actor_k_core_graph_map, k_to_director_k_core_graph_map)
-    processes = processes + generate_eigenvector_centrality_processes(k_to_actor_k_core_graph_map, k_to_director_k_core_graph_map)
-    processes = processes + generate_degree_centrality_processes(k_to_actor_k_core_graph_map, k_to_director_k_core_graph_map)
-    processes = processes + generate_katz_centrality_processes(k_to_actor_k_core_graph_map, k_to_director_k_core_graph_map)
-    for process in tqdm_with_message(processes, post_yield_message_func = lambda index: f'Join Vertex Ranking Process {index}', bar_format='{l_bar}{bar:50}{r_bar}'):
-        process.join()
-    return
-
-#############################
-# Generate Kevin Bacon CSVs #
-#############################
+def generate_vertex_ranking_jobs(k_to_actor_k_core_graph_handle_map: dict, k_to_director_k_core_graph_handle_map: dict) -> List[Job]:
+    jobs: List[Job] = []
+    jobs = jobs + generate_hits_jobs(k_to_actor_k_core_graph_handle_map, k_to_director_k_core_graph_handle_map)
+    jobs = jobs + generate_square_clustering_coefficient_jobs(k_to_actor_k_core_graph_handle_map, k_to_director_k_core_graph_handle_map)
+    jobs = jobs + generate_clustering_coefficient_jobs(k_to_actor_k_core_graph_handle_map, k_to_director_k_core_graph_handle_map)
+    jobs = jobs + generate_pagerank_jobs(k_to_actor_k_core_graph_handle_map, k_to_director_k_core_graph_handle_map)
+    jobs = jobs + generate_eigenvector_centrality_jobs(k_to_actor_k_core_graph_handle_map, k_to_director_k_core_graph_handle_map)
+    jobs = jobs + generate_degree_centrality_jobs(k_to_actor_k_core_graph_handle_map, k_to_director_k_core_graph_handle_map)
+    jobs = jobs + generate_katz_centrality_jobs(k_to_actor_k_core_graph_handle_map, k_to_director_k_core_graph_handle_map)
+    return jobs
+
+#########################
+# Generate Kevin Bacons #
+#########################
 
 ACTORS_KEVIN_BACON_CSV_TEMPLATE  = './output/projected_actors_k_core_%d_kevin_bacon.csv'
 DIRECTORS_KEVIN_BACON_CSV_TEMPLATE  = './output/projected_directors_k_core_%d_kevin_bacon.csv'
 
-def write_kevin_bacon_rows_to_csv(kevin_bacon_rows: List[dict], csv_file: str) -> None:
-    kevin_bacon_df = pd.DataFrame(kevin_bacon_rows)
-    kevin_bacon_df.to_csv(csv_file, index=False)
+# the full distance tables are quadratic in size, so they're only written when asked for
+WRITE_DISTANCE_TABLES = False
+ACTORS_DISTANCE_TABLE_TEMPLATE  = './output/projected_actors_k_core_%d_distances.npy'
+DIRECTORS_DISTANCE_TABLE_TEMPLATE  = './output/projected_directors_k_core_%d_distances.npy'
+
+KEVIN_BACON_COLUMN_NAMES = ['eccentricity', 'connected_component_size', 'kevin_bacon']
+
+def write_kevin_bacon_columns(graph: CSRGraph, eccentricities: np.ndarray, eccentricity_column_file: str, connected_component_size_column_file: str, kevin_bacon_column_file: str) -> None:
+    '''The Kevin Bacons of a connected component are the nodes with the smallest eccentricity in it.'''
+    component_labels, component_sizes = connected_component_sizes(graph)
+    component_minimum_eccentricities = np.full(component_labels.max()+1 if len(component_labels) > 0 else 0, np.iinfo(np.int64).max)
+    np.minimum.at(component_minimum_eccentricities, component_labels, eccentricities)
+    kevin_bacon_mask = eccentricities == component_minimum_eccentricities[component_labels]
+    write_metric_column(eccentricity_column_file, eccentricities)
+    write_metric_column(connected_component_size_column_file, component_sizes)
+    write_metric_column(kevin_bacon_column_file, kevin_bacon_mask)
+    return
+
+def generate_kevin_bacon_partial_results(graph_handle: str, partial_results_file: str, source_start: int, source_end: int) -> None:
+    graph = attach_csr_graph(graph_handle, load_node_names=False)
+    eccentricities, _ = eccentricities_and_average_distances(graph, sources=np.arange(source_start, source_end), number_of_processes=1)
+    write_partial_results(partial_results_file, eccentricities=eccentricities)
+    return
+
+def generate_kevin_bacon_columns(graph_handle: str, eccentricity_column_file: str, connected_component_size_column_file: str, kevin_bacon_column_file: str, partial_results_files: Tuple[str, ...]) -> None:
+    graph = attach_csr_graph(graph_handle, load_node_names=False)
+    # the partial results are in source order and every node is a source
+    eccentricities = np.concatenate([np.zeros(0, dtype=np.int64)]+[partial_result['eccentricities'] for partial_result in read_partial_results(partial_results_files)])
+    write_kevin_bacon_columns(graph, eccentricities, eccentricity_column_file, connected_component_size_column_file, kevin_bacon_column_file)
+    return
+
+def generate_kevin_bacon_columns_and_distance_table(graph_handle: str, eccentricity_column_file: str, connected_component_size_column_file: str, kevin_bacon_column_file: str, distance_table_file: str) -> None:
+    graph = attach_csr_graph(graph_handle)
+    eccentricities, _ = write_distance_table(graph, distance_table_file, graph_handle=graph_handle)
+    write_kevin_bacon_columns(graph, eccentricities, eccentricity_column_file, connected_component_size_column_file, kevin_bacon_column_file)
+    return
+
+def generate_kevin_bacon_jobs(k_to_actor_k_core_graph_handle_map: dict, k_to_director_k_core_graph_handle_map: dict) -> Tuple[List[Job], List[Job]]:
+    '''
+    Returns (partial_jobs, reduce_jobs), see source_partitioned_graph_jobs.
+    The distance tables are streamed to a single file in source order, so a graph whose distance table is written gets a single job (in partial_jobs) instead.
+    '''
+    partial_jobs: List[Job] = []
+    reduce_jobs: List[Job] = []
+    for k_to_graph_handle_map, metrics_dir_template, distance_table_template in ((k_to_actor_k_core_graph_handle_map, ACTORS_METRICS_DIR_TEMPLATE, ACTORS_DISTANCE_TABLE_TEMPLATE),
+                                                                                 (k_to_director_k_core_graph_handle_map, DIRECTORS_METRICS_DIR_TEMPLATE, DIRECTORS_DISTANCE_TABLE_TEMPLATE)):
+        for k, graph_handle in k_to_graph_handle_map.items():
+            metrics_dir = metrics_dir_template%k
+            column_files = tuple(metric_column_file(metrics_dir, column_name) for column_name in KEVIN_BACON_COLUMN_NAMES)
+            if WRITE_DISTANCE_TABLES:
+                partial_jobs.append(graph_job('kevin_bacon', generate_kevin_bacon_columns_and_distance_table, graph_handle, *column_files, distance_table_template%k))
+            else:
+                number_of_nodes = csr_graph_number_of_nodes(attach_csr_graph(graph_handle, load_node_names=False))
+                graph_partial_jobs, reduce_job = source_partitioned_graph_jobs('kevin_bacon', generate_kevin_bacon_partial_results, generate_kevin_bacon_columns,
+                                                                               graph_handle, number_of_nodes, metrics_dir, *column_files)
+                partial_jobs = partial_jobs + graph_partial_jobs
+                reduce_jobs.append(reduce_job)
+    return partial_jobs, reduce_jobs
+
+###############
+# Export CSVs #
+###############
+
+# The metrics store is the pipeline's real output. The CSVs are only for people who want them, so exporting them is optional.
+EXPORT_METRIC_CSVS = True
+
+# metric to (actor CSV template, director CSV template, name of the value column in the CSV)
+METRIC_TO_CSV_TEMPLATES_MAP = {
+    'label_propagation': (ACTORS_LABEL_PROP_CSV_TEMPLATE, DIRECTORS_LABEL_PROP_CSV_TEMPLATE, 'label'),
+    'louvain': (ACTORS_LOUVAIN_CSV_TEMPLATE, DIRECTORS_LOUVAIN_CSV_TEMPLATE, 'label'),
+    'hits_hub': (ACTORS_HITS_HUB_CSV_TEMPLATE, DIRECTORS_HITS_HUB_CSV_TEMPLATE, 'value'),
+    'hits_authority': (ACTORS_HITS_AUTHORITY_CSV_TEMPLATE, DIRECTORS_HITS_AUTHORITY_CSV_TEMPLATE, 'value'),
+    'square_clustering_coefficient': (ACTORS_SQUARE_CLUSTERING_COEFFICIENT_CSV_TEMPLATE, DIRECTORS_SQUARE_CLUSTERING_COEFFICIENT_CSV_TEMPLATE, 'value'),
+    'clustering_coefficient': (ACTORS_CLUSTERING_COEFFICIENT_CSV_TEMPLATE, DIRECTORS_CLUSTERING_COEFFICIENT_CSV_TEMPLATE, 'value'),
+    'pagerank': (ACTORS_PAGERANK_CSV_TEMPLATE, DIRECTORS_PAGERANK_CSV_TEMPLATE, 'value'),
+    'betweenness': (ACTORS_BETWEENNESS_CSV_TEMPLATE, DIRECTORS_BETWEENNESS_CSV_TEMPLATE, 'value'),
+    'closeness': (ACTORS_CLOSENESS_CSV_TEMPLATE, DIRECTORS_CLOSENESS_CSV_TEMPLATE, 'value'),
+    'eigenvector': (ACTORS_EIGENVECTOR_CSV_TEMPLATE, DIRECTORS_EIGENVECTOR_CSV_TEMPLATE, 'value'),
+    'degree': (ACTORS_DEGREE_CSV_TEMPLATE, DIRECTORS_DEGREE_CSV_TEMPLATE, 'value'),
+    'katz': (ACTORS_KATZ_CSV_TEMPLATE, DIRECTORS_KATZ_CSV_TEMPLATE, 'value'),
+}
+
+def _csv_file_is_stale(csv_file: str, column_files: List[str]) -> bool:
+    return not os.path.isfile(csv_file) or any(os.path.getmtime(csv_file) < os.path.getmtime(column_file) for column_file in column_files)
+
+def export_metric_csvs_for_graph(graph_dir: str, graph_index: int, k: int) -> None:
+    '''graph_index picks the actor (0) or director (1) CSV templates. Only CSVs older than their metric columns are rewritten.'''
+    node_names = read_node_names(graph_dir)
+    for metric_name, csv_templates_and_value_column_name in METRIC_TO_CSV_TEMPLATES_MAP.items():
+        column_file = metric_column_file(graph_dir, metric_name)
+        csv_file = csv_templates_and_value_column_name[graph_index]%k
+        if os.path.isfile(column_file) and _csv_file_is_stale(csv_file, [column_file]):
+            value_column_name = csv_templates_and_value_column_name[2]
+            pd.DataFrame({'node': node_names, value_column_name: read_metric_column(column_file)}).to_csv(csv_file, index=False)
+    column_files = [metric_column_file(graph_dir, column_name) for column_name in KEVIN_BACON_COLUMN_NAMES]
+    csv_file = (ACTORS_KEVIN_BACON_CSV_TEMPLATE, DIRECTORS_KEVIN_BACON_CSV_TEMPLATE)[graph_index]%k
+    if all(map(os.path.isfile, column_files)) and _csv_file_is_stale(csv_file, column_files):
+        eccentricities, component_sizes, kevin_bacon_mask = map(read_metric_column, column_files)
+        kevin_bacon_df = pd.DataFrame({'kevin_bacon': node_names[kevin_bacon_mask],
+                                       'max_dist': eccentricities[kevin_bacon_mask],
+                                       'connected_component_size': component_sizes[kevin_bacon_mask]})
+        kevin_bacon_df.to_csv(csv_file, index=False)
     return
 
-def generate_kevin_bacon_csv(graph: nx.Graph, kevin_bacon_csv_file: str) -> None:
-    connected_component_node_sets = nx.connected_components(graph)
-    kevin_bacon_rows: List[dict] = []
-    for node_set in connected_component_node_sets:
-        connected_component_graph = graph.subgraph(node_set)
-        connected_component_graph_size = len(connected_component_graph)
-        shortest_path_lengths_dict = dict(nx.all_pairs_shortest_path_length(connected_component_graph))
-        get_max_dist = lambda actor: max(shortest_path_lengths_dict[actor].values())
-        actors = list(shortest_path_lengths_dict.keys())
-        max_dists = list(map(get_max_dist, actors))
-        min_max_dist = min(max_dists)
-        kevin_bacon_rows = kevin_bacon_rows + [{"kevin_bacon": actor,
-                                                "max_dist": max_dist,
-                                                "connected_component_size": connected_component_graph_size,}
-                                               for actor, max_dist in zip(actors, max_dists)
-                                               if max_dist == min_max_dist]
-    write_kevin_bacon_rows_to_csv(kevin_bacon_rows,kevin_bacon_csv_file)
+def export_metric_csvs(ks: List[int]) -> None:
+    with timer(section_name='Metric CSV export'):
+        for k in ks:
+            for graph_index, metrics_dir_template in enumerate([ACTORS_METRICS_DIR_TEMPLATE, DIRECTORS_METRICS_DIR_TEMPLATE]):
+                export_metric_csvs_for_graph(metrics_dir_template%k, graph_index, k)
     return
 
-def generate_kevin_bacon_processes(k_to_actor_k_core_graph_map: dict, k_to_director_k_core_graph_map: dict) -> List[mp.Process]:
-    processes: List[mp.Process] = []
-    for k, graph in k_to_actor_k_core_graph_map.items():
-        kevin_bacon_csv_file = ACTORS_KEVIN_BACON_CSV_TEMPLATE%k
-        process = mp.Process(target=generate_kevin_bacon_csv, args=(graph,kevin_bacon_csv_file))
-        process.start()
-        processes.append(process)
-    for k, graph in k_to_director_k_core_graph_map.items():
-        kevin_bacon_csv_file = DIRECTORS_KEVIN_BACON_CSV_TEMPLATE%k
-        process = mp.Process(target=generate_kevin_bacon_csv, args=(graph,kevin_bacon_csv_file))
-        process.start()
-        processes.append(process)
-    return processes
-
-def generate_kevin_bacon_csvs(k_to_actor_k_core_graph_map: dict, k_to_director_k_core_graph_map: dict) -> None:
-    processes: List[mp.Process] = []
-    processes = processes + generate_kevin_bacon_processes(k_to_actor_k_core_graph_map, k_to_director_k_core_graph_map)
-    for process in tqdm_with_message(processes, post_yield_message_func = lambda index: f'Join Kevin Bacon CSV Generating Process {index}', bar_format='{l_bar}{bar:50}{r_bar}'):
-        process.join()
+##########
+# Stages #
+##########
+
+def generate_stages() -> List[Stage]:
+    '''The graph building stages that the graph jobs run on. The graph jobs have their own checkpoints (see job_scheduler.py).'''
+    ks = tuple(sorted(K_CORE_CHOICES_FOR_K))
+    stages = [Stage(name='raw_data',
+                    function=load_raw_data,
+                    input_stage_names=(),
+                    parameters=(),
+                    output_files=(DIRECTOR_ACTOR_EDGE_LIST_CSV, DIRECTOR_ACTOR_EDGE_LIST_PARQUET),
+                    load_function=load_movies_df,
+                    input_files=(RAW_DATA_CSV,))]
+    for graph_node_type, projected_csv_file, projected_parquet_file, k_core_csv_template, k_core_parquet_template, metrics_dir_template in (
+            ('actor', PROJECTED_ACTORS_CSV, PROJECTED_ACTORS_PARQUET, K_CORE_PROJECTED_ACTORS_CSV_TEMPLATE, K_CORE_PROJECTED_ACTORS_PARQUET_TEMPLATE, ACTORS_METRICS_DIR_TEMPLATE),
+            ('director', PROJECTED_DIRECTORS_CSV, PROJECTED_DIRECTORS_PARQUET, K_CORE_PROJECTED_DIRECTORS_CSV_TEMPLATE, K_CORE_PROJECTED_DIRECTORS_PARQUET_TEMPLATE, DIRECTORS_METRICS_DIR_TEMPLATE)):
+        stages.append(Stage(name=f'{graph_node_type}_projection',
+                            function=project_graph,
+                            input_stage_names=('raw_data',),
+                            parameters=(graph_node_type,),
+                            output_files=(projected_csv_file, projected_parquet_file),
+                            load_function=load_projected_graph))
+        stages.append(Stage(name=f'{graph_node_type}_k_cores',
+                            function=generate_k_core_graphs_for_graph,
+                            input_stage_names=(f'{graph_node_type}_projection',),
+                            parameters=(graph_node_type, ks),
+                            output_files=tuple(file_name for k in ks for file_name in (k_core_csv_template%k, k_core_parquet_template%k, metric_column_file(metrics_dir_template%k, NODE_COLUMN_NAME))),
+                            load_function=load_k_core_graphs_for_graph))
+    return stages
 
 ########
 # Main #
 ########
 
 def preprocess_data() -> None:
-    movies_graph, movies_df = load_raw_data()
-    full_projected_actors_graph, full_projected_directors_graph = project_graphs(movies_graph, movies_df)
-    k_to_actor_k_core_graph_map, k_to_director_k_core_graph_map = generate_k_core_graphs(full_projected_actors_graph, full_projected_directors_graph)
-    generate_communities_for_k_core_graphs(k_to_actor_k_core_graph_map, k_to_director_k_core_graph_map)
-    generate_vertex_rankings_for_k_core_graphs(k_to_actor_k_core_graph_map, k_to_director_k_core_graph_map)
-    generate_kevin_bacon_csvs(k_to_actor_k_core_graph_map, k_to_director_k_core_graph_map)
+    stage_name_to_result_map = run_stages(generate_stages(), ['actor_k_cores', 'director_k_cores'])
+    k_to_actor_k_core_graph_map = stage_name_to_result_map['actor_k_cores']
+    k_to_director_k_core_graph_map = stage_name_to_result_map['director_k_cores']
+    with csr_graph_store() as store_dir:
+        k_to_actor_k_core_graph_handle_map = {k: store_csr_graph(graph, store_dir, f'actor_k_core_{k}') for k, graph in k_to_actor_k_core_graph_map.items()}
+        k_to_director_k_core_graph_handle_map = {k: store_csr_graph(graph, store_dir, f'director_k_core_{k}') for k, graph in k_to_director_k_core_graph_map.items()}
+        jobs: List[Job] = []
+        jobs = jobs + generate_community_jobs(k_to_actor_k_core_graph_handle_map, k_to_director_k_core_graph_handle_map)
+        jobs = jobs + generate_vertex_ranking_jobs(k_to_actor_k_core_graph_handle_map, k_to_director_k_core_graph_handle_map)
+        reduce_jobs: List[Job] = []
+        for generate_source_partitioned_jobs in (generate_betweenness_and_closeness_centrality_jobs, generate_kevin_bacon_jobs):
+            partial_jobs, graph_reduce_jobs = generate_source_partitioned_jobs(k_to_actor_k_core_graph_handle_map, k_to_director_k_core_graph_handle_map)
+            jobs, reduce_jobs = jobs + partial_jobs, reduce_jobs + graph_reduce_jobs
+        run_jobs(jobs, number_of_workers=NUMBER_OF_WORKERS)
+        # the reduce jobs combine the partial results of the partial jobs above, so they can only start once those are done
+        run_jobs(reduce_jobs, number_of_workers=NUMBER_OF_WORKERS)
+    if EXPORT_METRIC_CSVS:
+        print()
+        export_metric_csvs(sorted(K_CORE_CHOICES_FOR_K))
     print()
     print('Done.')
     return
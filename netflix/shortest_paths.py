@@ -0,0 +1,149 @@
+#!/usr/bin/python3
+
+"""
+Unweighted shortest path distances over CSR graphs.
+
+Sources are searched 64 at a time. Each node keeps a 64 bit mask of which of the sources have reached it, so a single pass over
+all the edges per BFS level advances all 64 searches at once: a node's next frontier bits are the OR of its neighbors' frontier bits.
+
+The full distance table is quadratic in the number of nodes, so it's only built on request and streamed to disk a chunk of rows at a time.
+Otherwise only each node's eccentricity and average distance to the rest of its connected component are kept.
+"""
+
+###########
+# Imports #
+###########
+
+import csv
+import numpy as np
+import scipy.sparse.csgraph
+from typing import Tuple
+
+from csr_graph import CSRGraph, csr_graph_adjacency_matrix, csr_graph_number_of_nodes, imap_over_source_chunks, SOURCES_PER_CHUNK
+
+###########
+# Globals #
+###########
+
+UNREACHABLE_DISTANCE = -1
+
+########################
+# Breadth First Search #
+########################
+
+def _multi_source_bfs(indptr: np.ndarray, indices: np.ndarray, sources: np.ndarray, record_distances: bool) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Returns (eccentricities, distance_sums, reached_counts, distances) for up to 64 sources where reached_counts include the source itself.
+    distances[i, v] is the distance from sources[i] to v (or UNREACHABLE_DISTANCE) if record_distances is set, otherwise distances is None.
+    '''
+    assert len(sources) <= SOURCES_PER_CHUNK
+    number_of_nodes = len(indptr)-1
+    number_of_sources = len(sources)
+    source_bits = np.left_shift(np.uint64(1), np.arange(number_of_sources, dtype=np.uint64))
+    frontier = np.zeros(number_of_nodes, dtype=np.uint64)
+    np.bitwise_or.at(frontier, sources, source_bits)
+    visited = frontier.copy()
+    eccentricities = np.zeros(number_of_sources, dtype=np.int64)
+    distance_sums = np.zeros(number_of_sources, dtype=np.int64)
+    reached_counts = np.ones(number_of_sources, dtype=np.int64)
+    distances = None
+    if record_distances:
+        distances = np.full((number_of_sources, number_of_nodes), UNREACHABLE_DISTANCE, dtype=np.int16)
+        distances[np.arange(number_of_sources), sources] = 0
+    # reduceat can't handle empty segments, so only nodes with neighbors are reduced over
+    nodes_with_neighbors_mask = np.diff(indptr) > 0
+    segment_starts = indptr[:-1][nodes_with_neighbors_mask]
+    distance = 0
+    while len(indices) > 0:
+        next_frontier = np.zeros(number_of_nodes, dtype=np.uint64)
+        next_frontier[nodes_with_neighbors_mask] = np.bitwise_or.reduceat(frontier[indices], segment_starts)
+        next_frontier &= ~visited
+        if not next_frontier.any():
+            break
+        distance += 1
+        visited |= next_frontier
+        frontier = next_frontier
+        newly_reached_matrix = np.unpackbits(next_frontier.astype('<u8').view(np.uint8).reshape(number_of_nodes, 8), axis=1, bitorder='little')[:, :number_of_sources]
+        newly_reached_counts = newly_reached_matrix.sum(axis=0, dtype=np.int64)
+        eccentricities[newly_reached_counts > 0] = distance
+        distance_sums += distance * newly_reached_counts
+        reached_counts += newly_reached_counts
+        if record_distances:
+            distances.T[newly_reached_matrix.astype(bool)] = distance
+    return eccentricities, distance_sums, reached_counts, distances
+
+def _multi_source_bfs_summary(indptr: np.ndarray, indices: np.ndarray, sources: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    return _multi_source_bfs(indptr, indices, sources, False)
+
+def _multi_source_bfs_with_distances(indptr: np.ndarray, indices: np.ndarray, sources: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    return _multi_source_bfs(indptr, indices, sources, True)
+
+def _average_distances(distance_sums: np.ndarray, reached_counts: np.ndarray) -> np.ndarray:
+    return np.divide(distance_sums, reached_counts-1, out=np.zeros(len(distance_sums)), where=reached_counts > 1)
+
+def _write_distance_rows_to_csv(csv_writer: csv.writer, source_node_names: np.ndarray, distances: np.ndarray) -> None:
+    for source_node_name, row in zip(source_node_names, distances.tolist()):
+        csv_writer.writerow([source_node_name] + [distance if distance != UNREACHABLE_DISTANCE else '' for distance in row])
+    return
+
+######################
+# Distance Summaries #
+######################
+
+def eccentricities_and_average_distances(graph: CSRGraph, graph_handle: str = None, number_of_processes: int = None, sources: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Returns (eccentricities, average_distances) where each is taken over the connected component of the node, i.e. unreachable nodes are ignored.
+    Only the searches from sources are run if given (e.g. to split the sources across jobs), in which case the results are for sources in order.
+    graph_handle is needed to spread the searches over multiple processes.
+    '''
+    if sources is None:
+        sources = np.arange(csr_graph_number_of_nodes(graph))
+    number_of_sources = len(sources)
+    eccentricities = np.zeros(number_of_sources, dtype=np.int64)
+    average_distances = np.zeros(number_of_sources)
+    chunk_results = imap_over_source_chunks(_multi_source_bfs_summary, graph, graph_handle, sources, SOURCES_PER_CHUNK, number_of_processes)
+    for chunk_start, (chunk_eccentricities, distance_sums, reached_counts, _) in zip(range(0, number_of_sources, SOURCES_PER_CHUNK), chunk_results):
+        chunk_end = chunk_start+len(chunk_eccentricities)
+        eccentricities[chunk_start:chunk_end] = chunk_eccentricities
+        average_distances[chunk_start:chunk_end] = _average_distances(distance_sums, reached_counts)
+    return eccentricities, average_distances
+
+def write_distance_table(graph: CSRGraph, output_file: str, graph_handle: str = None, number_of_processes: int = None) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Streams the all pairs distance table to output_file one chunk of rows at a time, so the whole table is never in memory.
+    A .npy output_file gets a memory-mapped int16 matrix with rows and columns in the graph's node order and UNREACHABLE_DISTANCE for unreachable pairs.
+    Anything else gets a CSV with a row per source node and a column per target node, with unreachable pairs left blank.
+    Returns the same as eccentricities_and_average_distances.
+    '''
+    number_of_nodes = csr_graph_number_of_nodes(graph)
+    eccentricities = np.zeros(number_of_nodes, dtype=np.int64)
+    average_distances = np.zeros(number_of_nodes)
+    sources = np.arange(number_of_nodes)
+    chunk_results = imap_over_source_chunks(_multi_source_bfs_with_distances, graph, graph_handle, sources, SOURCES_PER_CHUNK, number_of_processes)
+    is_binary = output_file.endswith('.npy')
+    if is_binary:
+        distance_table = np.lib.format.open_memmap(output_file, mode='w+', dtype=np.int16, shape=(number_of_nodes, number_of_nodes))
+    else:
+        csv_file_handle = open(output_file, 'w', newline='')
+        csv_writer = csv.writer(csv_file_handle)
+        csv_writer.writerow(['node'] + list(graph.node_names))
+    try:
+        for chunk_start, (chunk_eccentricities, distance_sums, reached_counts, distances) in zip(range(0, number_of_nodes, SOURCES_PER_CHUNK), chunk_results):
+            chunk_end = chunk_start+len(chunk_eccentricities)
+            eccentricities[chunk_start:chunk_end] = chunk_eccentricities
+            average_distances[chunk_start:chunk_end] = _average_distances(distance_sums, reached_counts)
+            if is_binary:
+                distance_table[chunk_start:chunk_end] = distances
+            else:
+                _write_distance_rows_to_csv(csv_writer, graph.node_names[chunk_start:chunk_end], distances)
+    finally:
+        if is_binary:
+            distance_table.flush()
+        else:
+            csv_file_handle.close()
+    return eccentricities, average_distances
+
+def connected_component_sizes(graph: CSRGraph) -> Tuple[np.ndarray, np.ndarray]:
+    '''Returns (component_labels, component_sizes) where component_sizes[v] is the size of the connected component containing v.'''
+    _, component_labels = scipy.sparse.csgraph.connected_components(csr_graph_adjacency_matrix(graph), directed=False)
+    return component_labels, np.bincount(component_labels)[component_labels]
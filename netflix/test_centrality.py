@@ -0,0 +1,74 @@
+#!/usr/bin/python3
+
+"""
+Tests for centrality.py checking results against NetworkX on small random graphs.
+"""
+
+###########
+# Imports #
+###########
+
+import numpy as np
+import networkx as nx
+
+from csr_graph import CSRGraph, csr_graph_from_sparse_matrix, csr_graph_store, store_csr_graph
+from centrality import betweenness_and_closeness_centrality, betweenness_and_closeness_sources, accumulate_betweenness_and_closeness, finalize_betweenness_and_closeness
+
+###########
+# Helpers #
+###########
+
+def _random_csr_graph(number_of_nodes: int, edge_probability: float, seed: int) -> CSRGraph:
+    # the graph is disconnected on purpose so that the per-component scaling gets exercised
+    nx_graph = nx.disjoint_union(nx.gnp_random_graph(number_of_nodes, edge_probability, seed=seed), nx.path_graph(5))
+    nx_graph.add_node(len(nx_graph))
+    node_names = np.array(list(nx_graph.nodes), dtype=object)
+    return csr_graph_from_sparse_matrix(nx.to_scipy_sparse_array(nx_graph, nodelist=node_names), node_names)
+
+def _nx_graph(graph: CSRGraph) -> nx.Graph:
+    nx_graph = nx.Graph()
+    nx_graph.add_nodes_from(graph.node_names)
+    for node_id, node_name in enumerate(graph.node_names):
+        nx_graph.add_edges_from((node_name, graph.node_names[neighbor_id]) for neighbor_id in graph.indices[graph.indptr[node_id]:graph.indptr[node_id+1]])
+    return nx_graph
+
+#########
+# Tests #
+#########
+
+def test_exact_betweenness_and_closeness_centrality():
+    graph = _random_csr_graph(80, 0.05, seed=0)
+    nx_graph = _nx_graph(graph)
+    betweenness, closeness = betweenness_and_closeness_centrality(graph, number_of_processes=1)
+    expected_betweenness = nx.betweenness_centrality(nx_graph)
+    expected_closeness = nx.closeness_centrality(nx_graph)
+    assert np.allclose(betweenness, [expected_betweenness[node_name] for node_name in graph.node_names])
+    assert np.allclose(closeness, [expected_closeness[node_name] for node_name in graph.node_names])
+
+def test_parallel_betweenness_and_closeness_centrality_matches_serial():
+    graph = _random_csr_graph(200, 0.03, seed=1)
+    serial_betweenness, serial_closeness = betweenness_and_closeness_centrality(graph, number_of_processes=1)
+    with csr_graph_store() as store_dir:
+        graph_handle = store_csr_graph(graph, store_dir, 'graph')
+        parallel_betweenness, parallel_closeness = betweenness_and_closeness_centrality(graph, graph_handle=graph_handle, number_of_processes=2)
+    assert np.allclose(serial_betweenness, parallel_betweenness)
+    assert np.allclose(serial_closeness, parallel_closeness)
+
+def test_approximate_betweenness_and_closeness_centrality():
+    graph = _random_csr_graph(300, 0.03, seed=2)
+    exact_betweenness, exact_closeness = betweenness_and_closeness_centrality(graph, number_of_processes=1)
+    approximate_betweenness, approximate_closeness = betweenness_and_closeness_centrality(graph, number_of_pivots=150, number_of_processes=1)
+    assert np.abs(approximate_betweenness - exact_betweenness).max() < 0.05
+    assert np.abs(approximate_closeness - exact_closeness).max() < 0.05
+    # the isolated node can only be a source by being searched exhaustively or sampled, either way its values are exact
+    assert approximate_betweenness[-1] == exact_betweenness[-1] == 0.0
+    assert approximate_closeness[-1] == exact_closeness[-1] == 0.0
+
+def test_sums_over_split_sources_add_up():
+    graph = _random_csr_graph(120, 0.04, seed=3)
+    expected_betweenness, expected_closeness = betweenness_and_closeness_centrality(graph, number_of_processes=1)
+    sources, component_sizes = betweenness_and_closeness_sources(graph)
+    partial_sums = [accumulate_betweenness_and_closeness(graph, source_range, number_of_processes=1) for source_range in np.array_split(sources, 3)]
+    betweenness, closeness = finalize_betweenness_and_closeness(component_sizes, *(sum(arrays) for arrays in zip(*partial_sums)))
+    assert np.allclose(betweenness, expected_betweenness)
+    assert np.allclose(closeness, expected_closeness)
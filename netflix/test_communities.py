@@ -0,0 +1,51 @@
+#!/usr/bin/python3
+
+"""
+Tests for communities.py checking results against NetworkX and python-louvain on small random graphs.
+"""
+
+###########
+# Imports #
+###########
+
+import numpy as np
+import networkx as nx
+import community as community_louvain
+from typing import Tuple
+
+from csr_graph import CSRGraph, csr_graph_from_sparse_matrix, core_numbers, k_core_subgraph
+from communities import relabel_by_first_appearance, warm_start_labels, modularity, label_propagation_communities, louvain_communities
+
+###########
+# Helpers #
+###########
+
+def _planted_partition_graphs(number_of_groups: int, group_size: int, seed: int) -> Tuple[nx.Graph, CSRGraph]:
+    nx_graph = nx.planted_partition_graph(number_of_groups, group_size, 0.3, 0.02, seed=seed)
+    nx_graph.add_node(len(nx_graph)) # isolated node
+    node_names = np.array(list(nx_graph.nodes), dtype=object)
+    return nx_graph, csr_graph_from_sparse_matrix(nx.to_scipy_sparse_array(nx_graph, nodelist=node_names), node_names)
+
+#########
+# Tests #
+#########
+
+def test_label_propagation_matches_networkx():
+    nx_graph, graph = _planted_partition_graphs(6, 30, seed=0)
+    node_to_label_map = {node: label for label, nodes in enumerate(nx.algorithms.community.label_propagation_communities(nx_graph)) for node in nodes}
+    expected_labels = relabel_by_first_appearance(np.array([node_to_label_map[node_name] for node_name in graph.node_names]))
+    assert np.array_equal(label_propagation_communities(graph), expected_labels)
+
+def test_louvain_modularity_matches_python_louvain():
+    nx_graph, graph = _planted_partition_graphs(6, 30, seed=1)
+    labels = louvain_communities(graph)
+    expected_modularity = community_louvain.modularity(community_louvain.best_partition(nx_graph, random_state=0), nx_graph)
+    assert abs(modularity(graph, labels) - community_louvain.modularity(dict(zip(graph.node_names, labels)), nx_graph)) < 1e-9
+    assert modularity(graph, labels) > expected_modularity - 0.01
+
+def test_seeded_louvain():
+    _, graph = _planted_partition_graphs(6, 30, seed=2)
+    k_core_graph = k_core_subgraph(graph, core_numbers(graph), 8)
+    initial_labels = warm_start_labels(louvain_communities(graph), graph, k_core_graph)
+    assert len(initial_labels) == len(k_core_graph.node_names)
+    assert modularity(k_core_graph, louvain_communities(k_core_graph, initial_labels=initial_labels)) > modularity(k_core_graph, louvain_communities(k_core_graph)) - 0.01
@@ -0,0 +1,71 @@
+#!/usr/bin/python3
+
+"""
+Tests for csr_graph.py checking results against NetworkX on small random graphs.
+"""
+
+###########
+# Imports #
+###########
+
+import random
+import numpy as np
+import networkx as nx
+from networkx.algorithms import bipartite
+
+from csr_graph import project_bipartite_graph, csr_graph_to_networkx, csr_graph_to_edgelist_df, csr_graph_from_edgelist_df, core_numbers, k_core_subgraph
+
+###########
+# Helpers #
+###########
+
+def _random_bipartite_edges(number_of_nodes: int, number_of_other_side_nodes: int, number_of_edges: int, seed: int) -> np.ndarray:
+    generator = random.Random(seed)
+    return np.array([(generator.randrange(number_of_nodes), generator.randrange(number_of_other_side_nodes)) for _ in range(number_of_edges)])
+
+#########
+# Tests #
+#########
+
+def test_project_bipartite_graph():
+    edges = _random_bipartite_edges(60, 15, 120, seed=0)
+    node_names = np.array([f'node_{node_id}' for node_id in range(60)], dtype=object)
+    projected_graph = project_bipartite_graph(edges[:,0], edges[:,1], node_names)
+    bipartite_graph = nx.Graph()
+    bipartite_graph.add_nodes_from(node_names)
+    bipartite_graph.add_edges_from((node_names[node_id], ('other', other_side_node_id)) for node_id, other_side_node_id in edges)
+    expected_graph = bipartite.weighted_projected_graph(bipartite_graph, node_names)
+    actual_graph = csr_graph_to_networkx(projected_graph, include_weights=True)
+    assert set(actual_graph.nodes) == set(expected_graph.nodes)
+    assert {frozenset(edge) for edge in actual_graph.edges} == {frozenset(edge) for edge in expected_graph.edges}
+    for source, target, weight in expected_graph.edges(data='weight'):
+        assert actual_graph[source][target]['weight'] == weight
+
+def test_edgelist_lists_each_edge_once():
+    edges = _random_bipartite_edges(30, 5, 50, seed=1)
+    projected_graph = project_bipartite_graph(edges[:,0], edges[:,1], np.arange(30))
+    edgelist_df = csr_graph_to_edgelist_df(projected_graph)
+    assert len(edgelist_df) == len(projected_graph.indices) // 2
+    assert (edgelist_df.source < edgelist_df.target).all()
+
+def test_edgelist_round_trip():
+    edges = _random_bipartite_edges(30, 5, 50, seed=3)
+    node_names = np.array([f'node_{node_id}' for node_id in range(30)], dtype=object)
+    projected_graph = project_bipartite_graph(edges[:,0], edges[:,1], node_names)
+    expected_graph = csr_graph_to_networkx(projected_graph, include_weights=True)
+    actual_graph = csr_graph_to_networkx(csr_graph_from_edgelist_df(csr_graph_to_edgelist_df(projected_graph)), include_weights=True)
+    assert {frozenset(edge) for edge in actual_graph.edges} == {frozenset(edge) for edge in expected_graph.edges}
+    assert all(actual_graph.edges[edge]['weight'] == expected_graph.edges[edge]['weight'] for edge in expected_graph.edges)
+
+def test_core_numbers_and_k_cores():
+    edges = _random_bipartite_edges(200, 40, 600, seed=2)
+    projected_graph = project_bipartite_graph(edges[:,0], edges[:,1], np.arange(200))
+    nx_graph = csr_graph_to_networkx(projected_graph)
+    graph_core_numbers = core_numbers(projected_graph)
+    expected_core_numbers = nx.core_number(nx_graph)
+    assert all(graph_core_numbers[node] == expected_core_numbers[node] for node in range(200))
+    for k in range(0, graph_core_numbers.max()+2):
+        actual_k_core = csr_graph_to_networkx(k_core_subgraph(projected_graph, graph_core_numbers, k))
+        expected_k_core = nx.k_core(nx_graph, k)
+        assert set(actual_k_core.nodes) == set(expected_k_core.nodes)
+        assert {frozenset(edge) for edge in actual_k_core.edges} == {frozenset(edge) for edge in expected_k_core.edges}
@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+
+"""
+Tests for graph_layout.py.
+"""
+
+###########
+# Imports #
+###########
+
+import numpy as np
+import networkx as nx
+
+import graph_layout
+from csr_graph import CSRGraph, csr_graph_from_sparse_matrix, csr_graph_degrees
+from graph_layout import force_directed_layout, cached_force_directed_layout
+
+###########
+# Helpers #
+###########
+
+def _random_geometric_graph(number_of_nodes: int, radius: float, seed: int) -> CSRGraph:
+    nx_graph = nx.random_geometric_graph(number_of_nodes, radius, seed=seed)
+    node_names = np.array(list(nx_graph.nodes), dtype=object)
+    return csr_graph_from_sparse_matrix(nx.to_scipy_sparse_array(nx_graph, nodelist=node_names), node_names)
+
+def _mean_edge_length(graph: CSRGraph, positions: np.ndarray) -> float:
+    sources = np.repeat(np.arange(len(positions)), csr_graph_degrees(graph))
+    return np.linalg.norm(positions[sources] - positions[graph.indices], axis=1).mean()
+
+#########
+# Tests #
+#########
+
+def test_barnes_hut_repulsion_approximates_exact_repulsion():
+    positions = np.random.default_rng(0).random((3000, 2))
+    k = np.sqrt(1.0 / len(positions))
+    exact_displacements = graph_layout._exact_repulsion(positions, k)
+    approximate_displacements = graph_layout._barnes_hut_repulsion(positions, k)
+    assert np.linalg.norm(approximate_displacements - exact_displacements) < 0.05 * np.linalg.norm(exact_displacements)
+
+def test_layout_pulls_neighbors_together(monkeypatch):
+    graph = _random_geometric_graph(600, 0.08, seed=1)
+    exact_positions = force_directed_layout(graph, iterations=30)
+    monkeypatch.setattr(graph_layout, 'EXACT_REPULSION_MAXIMUM_NUMBER_OF_NODES', 100)
+    approximate_positions = force_directed_layout(graph, iterations=30)
+    for positions in (exact_positions, approximate_positions):
+        assert positions.shape == (600, 2)
+        assert np.isclose(np.abs(positions).max(), 1.0)
+        random_pair_distance = np.linalg.norm(positions[:300] - positions[300:], axis=1).mean()
+        assert _mean_edge_length(graph, positions) < 0.25 * random_pair_distance
+
+def test_layout_cache(tmp_path, monkeypatch):
+    graph = _random_geometric_graph(50, 0.3, seed=2)
+    positions = cached_force_directed_layout(graph, str(tmp_path), iterations=10)
+    assert np.array_equal(positions, force_directed_layout(graph, iterations=10))
+    def _fail(*args, **kwargs):
+        raise AssertionError('layout was recomputed')
+    monkeypatch.setattr(graph_layout, 'force_directed_layout', _fail)
+    assert np.array_equal(cached_force_directed_layout(graph, str(tmp_path), iterations=10), positions)
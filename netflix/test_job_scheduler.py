@@ -0,0 +1,112 @@
+#!/usr/bin/python3
+
+"""
+Tests for job_scheduler.py.
+"""
+
+###########
+# Imports #
+###########
+
+import os
+import sys
+import signal
+import importlib
+from typing import Tuple
+
+from job_scheduler import Job, function_code_hash, job_checkpoint_key, job_is_checkpointed, run_jobs
+
+###########
+# Helpers #
+###########
+
+def _write_text(output_file: str, text: str) -> None:
+    with open(output_file, 'w') as f:
+        f.write(text)
+    return
+
+def _kill_own_process(output_file: str, text: str) -> None:
+    os.kill(os.getpid(), signal.SIGKILL)
+    return
+
+def _raise_error(output_file: str, text: str) -> None:
+    raise ValueError(text)
+
+def _job(function, output_file: str, text: str, estimated_cost: float) -> Job:
+    return Job(name=f'{function.__name__} {os.path.basename(output_file)}',
+               function=function,
+               args=(output_file, text),
+               output_files=(output_file,),
+               estimated_cost=estimated_cost,
+               checkpoint_key=job_checkpoint_key(function, (output_file, text), ()))
+
+HELPER_MODULE_SOURCE = '''
+def helper(x):
+    return x + 1
+
+def unrelated_helper(x):
+    return x - 1
+'''
+
+METRIC_MODULE_SOURCE = '''
+import numpy as np
+from hashed_helpers import helper
+
+COLUMNS = ['a', 'b']
+WEIGHTS = np.array([1.0, 2.0])
+
+def metric(x):
+    return helper(x) * len(COLUMNS) * WEIGHTS.sum()
+'''
+
+def _metric_code_hash(directory: str, helper_module_source: str, metric_module_source: str) -> str:
+    '''Writes the helper and metric modules to directory and returns function_code_hash of a freshly imported metric.'''
+    _write_text(os.path.join(directory, 'hashed_helpers.py'), helper_module_source)
+    _write_text(os.path.join(directory, 'hashed_metric.py'), metric_module_source)
+    for module_name in ('hashed_helpers', 'hashed_metric'):
+        sys.modules.pop(module_name, None)
+    importlib.invalidate_caches()
+    return function_code_hash(importlib.import_module('hashed_metric').metric)
+
+#########
+# Tests #
+#########
+
+def test_run_jobs_checkpoints_finished_jobs(tmpdir):
+    checkpoint_dir = str(tmpdir.join('checkpoints'))
+    jobs = [_job(_write_text, str(tmpdir.join(f'{index}.txt')), str(index), index) for index in range(5)]
+    run_jobs(jobs, number_of_workers=2, checkpoint_dir=checkpoint_dir)
+    for index, job in enumerate(jobs):
+        assert job_is_checkpointed(job, checkpoint_dir)
+        with open(job.output_files[0], 'r') as f:
+            assert f.read() == str(index)
+    return
+
+def test_run_jobs_survives_killed_and_failing_jobs(tmpdir, capsys):
+    checkpoint_dir = str(tmpdir.join('checkpoints'))
+    killed_job = _job(_kill_own_process, str(tmpdir.join('killed.txt')), 'killed', 10)
+    failing_job = _job(_raise_error, str(tmpdir.join('failing.txt')), 'failing', 5)
+    finished_jobs = [_job(_write_text, str(tmpdir.join(f'{index}.txt')), str(index), index) for index in range(3)]
+    run_jobs([killed_job, failing_job]+finished_jobs, number_of_workers=2, checkpoint_dir=checkpoint_dir)
+    assert not job_is_checkpointed(killed_job, checkpoint_dir)
+    assert not job_is_checkpointed(failing_job, checkpoint_dir)
+    assert all(job_is_checkpointed(job, checkpoint_dir) for job in finished_jobs)
+    output = capsys.readouterr().out
+    assert f'The process running {killed_job.name} died with exit code {-signal.SIGKILL}' in output
+    assert 'ValueError: failing' in output
+    return
+
+def test_function_code_hash_follows_what_the_function_uses(tmpdir, monkeypatch):
+    directory = str(tmpdir)
+    monkeypatch.syspath_prepend(directory)
+    original_hash = _metric_code_hash(directory, HELPER_MODULE_SOURCE, METRIC_MODULE_SOURCE)
+    assert _metric_code_hash(directory, HELPER_MODULE_SOURCE, METRIC_MODULE_SOURCE) == original_hash
+    # other functions in the same directory are only followed when they're used
+    assert _metric_code_hash(directory, HELPER_MODULE_SOURCE.replace('x - 1', 'x - 2'), METRIC_MODULE_SOURCE) == original_hash
+    assert _metric_code_hash(directory, HELPER_MODULE_SOURCE.replace('x + 1', 'x + 2'), METRIC_MODULE_SOURCE) != original_hash
+    # container and array constants contribute their values
+    assert _metric_code_hash(directory, HELPER_MODULE_SOURCE, METRIC_MODULE_SOURCE.replace("['a', 'b']", "['a', 'c']")) != original_hash
+    assert _metric_code_hash(directory, HELPER_MODULE_SOURCE, METRIC_MODULE_SOURCE.replace('2.0]', '3.0]')) != original_hash
+    for module_name in ('hashed_helpers', 'hashed_metric'):
+        sys.modules.pop(module_name, None)
+    return
@@ -0,0 +1,54 @@
+#!/usr/bin/python3
+
+"""
+Tests for metrics_store.py.
+"""
+
+###########
+# Imports #
+###########
+
+import os
+import numpy as np
+import pyarrow as pa
+
+import metrics_store
+from metrics_store import metric_column_file, write_column_batches, write_node_names, write_metric_column
+from metrics_store import read_metric_column, read_node_names, metric_names, read_metrics_table
+
+#########
+# Tests #
+#########
+
+def test_metric_columns_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics_store, 'RECORD_BATCH_SIZE', 4)
+    graph_dir = str(tmp_path / 'graph')
+    node_names = np.array(['a', 'b', 'c', 'd', 'e', 'f'], dtype=object)
+    pagerank_values = np.linspace(0, 1, 6)
+    write_node_names(graph_dir, node_names)
+    write_metric_column(metric_column_file(graph_dir, 'pagerank'), pagerank_values)
+    write_metric_column(metric_column_file(graph_dir, 'louvain'), np.array([0, 0, 1, 1, 2, 2]))
+    write_metric_column(metric_column_file(graph_dir, 'kevin_bacon'), np.array([True, False, False, True, False, False]))
+    assert metric_names(graph_dir) == ['kevin_bacon', 'louvain', 'pagerank']
+    assert list(read_node_names(graph_dir)) == list(node_names)
+    assert np.array_equal(read_metric_column(metric_column_file(graph_dir, 'pagerank')), pagerank_values)
+    assert np.array_equal(read_metric_column(metric_column_file(graph_dir, 'louvain')), [0, 0, 1, 1, 2, 2])
+    assert read_metric_column(metric_column_file(graph_dir, 'kevin_bacon')).dtype == bool
+    table = read_metrics_table(graph_dir, ['louvain'])
+    assert table.column_names == ['node', 'louvain']
+    assert table.num_rows == 6
+    assert not any(file_name.endswith('.tmp') for file_name in os.listdir(graph_dir))
+
+def test_single_batch_columns_are_memory_mapped(tmp_path):
+    column_file = metric_column_file(str(tmp_path), 'degree')
+    write_metric_column(column_file, np.arange(1000, dtype=float))
+    values = read_metric_column(column_file)
+    assert not values.flags.writeable
+    assert np.array_equal(values, np.arange(1000, dtype=float))
+
+def test_empty_columns(tmp_path):
+    column_file = metric_column_file(str(tmp_path), 'katz')
+    write_column_batches(column_file, 'katz', iter([]), pa.float64())
+    assert len(read_metric_column(column_file)) == 0
+    write_metric_column(column_file, np.array([], dtype=bool))
+    assert read_metric_column(column_file).dtype == bool
@@ -0,0 +1,91 @@
+#!/usr/bin/python3
+
+"""
+Tests for pipeline_stages.py.
+"""
+
+###########
+# Imports #
+###########
+
+import os
+import collections
+from typing import List
+
+from pipeline_stages import Stage, run_stages
+
+###########
+# Helpers #
+###########
+
+# not a list since function_code_hash hashes the values of lists the stages use and this one changes as they run
+STAGE_CALLS = collections.deque()
+
+def _write_text(file_name: str, text: str) -> None:
+    with open(file_name, 'w') as f:
+        f.write(text)
+    return
+
+def _read_text(file_name: str) -> str:
+    with open(file_name, 'r') as f:
+        return f.read()
+
+def _read_numbers(input_file: str, output_file: str) -> List[int]:
+    STAGE_CALLS.append('numbers')
+    numbers = [int(line) for line in _read_text(input_file).split()]
+    _write_text(output_file, ' '.join(map(str, numbers)))
+    return numbers
+
+def _load_numbers(input_file: str, output_file: str) -> List[int]:
+    return [int(word) for word in _read_text(output_file).split()]
+
+def _sum_numbers(numbers: List[int], output_file: str) -> int:
+    STAGE_CALLS.append('sum')
+    _write_text(output_file, str(sum(numbers)))
+    return sum(numbers)
+
+def _load_sum(output_file: str) -> int:
+    return int(_read_text(output_file))
+
+def _stages(directory: str) -> List[Stage]:
+    input_file = os.path.join(directory, 'input.txt')
+    numbers_file = os.path.join(directory, 'numbers.txt')
+    sum_file = os.path.join(directory, 'sum.txt')
+    return [Stage(name='numbers', function=_read_numbers, input_stage_names=(), parameters=(input_file, numbers_file),
+                  output_files=(numbers_file,), load_function=_load_numbers, input_files=(input_file,)),
+            Stage(name='sum', function=_sum_numbers, input_stage_names=('numbers',), parameters=(sum_file,),
+                  output_files=(sum_file,), load_function=_load_sum)]
+
+#########
+# Tests #
+#########
+
+def test_unchanged_stages_are_skipped(tmp_path):
+    directory = str(tmp_path)
+    manifest_dir = os.path.join(directory, 'stages')
+    _write_text(os.path.join(directory, 'input.txt'), '1\n2\n3\n')
+    STAGE_CALLS.clear()
+    assert run_stages(_stages(directory), ['sum'], manifest_dir) == {'sum': 6}
+    assert list(STAGE_CALLS) == ['numbers', 'sum']
+    STAGE_CALLS.clear()
+    assert run_stages(_stages(directory), ['sum'], manifest_dir) == {'sum': 6}
+    assert list(STAGE_CALLS) == []
+    # reformatting the input reruns the first stage, but its output is the same so the second stage is still up to date
+    _write_text(os.path.join(directory, 'input.txt'), '1 2 3')
+    STAGE_CALLS.clear()
+    assert run_stages(_stages(directory), ['sum'], manifest_dir) == {'sum': 6}
+    assert list(STAGE_CALLS) == ['numbers']
+    _write_text(os.path.join(directory, 'input.txt'), '1 2 3 4')
+    STAGE_CALLS.clear()
+    assert run_stages(_stages(directory), ['sum'], manifest_dir) == {'sum': 10}
+    assert list(STAGE_CALLS) == ['numbers', 'sum']
+
+def test_missing_outputs_are_regenerated(tmp_path):
+    directory = str(tmp_path)
+    manifest_dir = os.path.join(directory, 'stages')
+    _write_text(os.path.join(directory, 'input.txt'), '5 6')
+    run_stages(_stages(directory), ['sum'], manifest_dir)
+    os.remove(os.path.join(directory, 'sum.txt'))
+    STAGE_CALLS.clear()
+    assert run_stages(_stages(directory), ['sum'], manifest_dir) == {'sum': 11}
+    assert list(STAGE_CALLS) == ['sum']
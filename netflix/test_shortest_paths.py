@@ -0,0 +1,71 @@
+#!/usr/bin/python3
+
+"""
+Tests for shortest_paths.py checking results against NetworkX on small random graphs.
+"""
+
+###########
+# Imports #
+###########
+
+import numpy as np
+import pandas as pd
+import networkx as nx
+from typing import Tuple
+
+from csr_graph import CSRGraph, csr_graph_from_sparse_matrix, csr_graph_store, store_csr_graph
+from shortest_paths import UNREACHABLE_DISTANCE, eccentricities_and_average_distances, write_distance_table
+
+###########
+# Helpers #
+###########
+
+def _random_graphs(number_of_nodes: int, edge_probability: float, seed: int) -> Tuple[nx.Graph, CSRGraph]:
+    # more than 64 nodes so that there's more than one chunk of sources and disconnected so that some pairs are unreachable
+    nx_graph = nx.disjoint_union(nx.gnp_random_graph(number_of_nodes, edge_probability, seed=seed), nx.path_graph(7))
+    nx_graph.add_node(len(nx_graph))
+    node_names = np.array(list(nx_graph.nodes), dtype=object)
+    return nx_graph, csr_graph_from_sparse_matrix(nx.to_scipy_sparse_array(nx_graph, nodelist=node_names), node_names)
+
+def _expected_distance_table(nx_graph: nx.Graph, graph: CSRGraph) -> np.ndarray:
+    shortest_path_lengths = dict(nx.all_pairs_shortest_path_length(nx_graph))
+    return np.array([[shortest_path_lengths[source].get(target, UNREACHABLE_DISTANCE) for target in graph.node_names] for source in graph.node_names])
+
+#########
+# Tests #
+#########
+
+def test_eccentricities_and_average_distances():
+    nx_graph, graph = _random_graphs(150, 0.02, seed=0)
+    expected_distance_table = _expected_distance_table(nx_graph, graph)
+    reachable_mask = expected_distance_table != UNREACHABLE_DISTANCE
+    expected_eccentricities = expected_distance_table.max(axis=1)
+    expected_average_distances = np.where(reachable_mask, expected_distance_table, 0).sum(axis=1) / np.maximum(reachable_mask.sum(axis=1)-1, 1)
+    eccentricities, average_distances = eccentricities_and_average_distances(graph, number_of_processes=1)
+    assert np.array_equal(eccentricities, expected_eccentricities)
+    assert np.allclose(average_distances, expected_average_distances)
+    with csr_graph_store() as store_dir:
+        graph_handle = store_csr_graph(graph, store_dir, 'graph')
+        parallel_eccentricities, parallel_average_distances = eccentricities_and_average_distances(graph, graph_handle=graph_handle, number_of_processes=2)
+    assert np.array_equal(parallel_eccentricities, expected_eccentricities)
+    assert np.allclose(parallel_average_distances, expected_average_distances)
+
+def test_eccentricities_and_average_distances_from_split_sources():
+    nx_graph, graph = _random_graphs(200, 0.015, seed=2)
+    expected_eccentricities, expected_average_distances = eccentricities_and_average_distances(graph, number_of_processes=1)
+    # the split isn't a multiple of the chunk size on purpose
+    source_ranges = np.array_split(np.arange(len(expected_eccentricities)), 3)
+    split_results = [eccentricities_and_average_distances(graph, number_of_processes=1, sources=sources) for sources in source_ranges]
+    assert np.array_equal(np.concatenate([eccentricities for eccentricities, _ in split_results]), expected_eccentricities)
+    assert np.allclose(np.concatenate([average_distances for _, average_distances in split_results]), expected_average_distances)
+
+def test_write_distance_table(tmpdir):
+    nx_graph, graph = _random_graphs(100, 0.03, seed=1)
+    expected_distance_table = _expected_distance_table(nx_graph, graph)
+    npy_file = str(tmpdir.join('distances.npy'))
+    csv_file = str(tmpdir.join('distances.csv'))
+    write_distance_table(graph, npy_file, number_of_processes=1)
+    write_distance_table(graph, csv_file, number_of_processes=1)
+    assert np.array_equal(np.load(npy_file), expected_distance_table)
+    distance_df = pd.read_csv(csv_file, index_col='node')
+    assert np.array_equal(distance_df.fillna(UNREACHABLE_DISTANCE).to_numpy(), expected_distance_table)
@@ -0,0 +1,50 @@
+#!/usr/bin/python3
+
+"""
+Tests for vertex_ranking.py checking results against NetworkX on small random graphs.
+"""
+
+###########
+# Imports #
+###########
+
+import numpy as np
+import networkx as nx
+from typing import Tuple
+
+from csr_graph import CSRGraph, csr_graph_from_sparse_matrix, core_numbers, k_core_subgraph
+from vertex_ranking import pagerank, katz_centrality, eigenvector_centrality, hits, warm_start_values
+
+###########
+# Helpers #
+###########
+
+def _random_graphs(number_of_nodes: int, edge_probability: float, seed: int) -> Tuple[nx.Graph, CSRGraph]:
+    nx_graph = nx.gnp_random_graph(number_of_nodes, edge_probability, seed=seed)
+    nx_graph.add_node(number_of_nodes) # dangling node
+    node_names = np.array(list(nx_graph.nodes), dtype=object)
+    return nx_graph, csr_graph_from_sparse_matrix(nx.to_scipy_sparse_array(nx_graph, nodelist=node_names), node_names)
+
+def _values(node_to_value_map: dict, graph: CSRGraph) -> np.ndarray:
+    return np.array([node_to_value_map[node_name] for node_name in graph.node_names])
+
+#########
+# Tests #
+#########
+
+def test_vertex_rankings_match_networkx():
+    nx_graph, graph = _random_graphs(150, 0.05, seed=0)
+    assert np.allclose(pagerank(graph), _values(nx.pagerank(nx_graph), graph), atol=1e-6)
+    assert np.allclose(katz_centrality(graph, 0.05), _values(nx.katz_centrality(nx_graph, 0.05), graph), atol=1e-6)
+    assert np.allclose(eigenvector_centrality(graph, max_iter=1000), _values(nx.eigenvector_centrality(nx_graph, max_iter=1000), graph), atol=1e-6)
+    hubs, authorities = hits(graph, max_iter=1000)
+    nx_hubs, nx_authorities = nx.hits(nx_graph, max_iter=1000)
+    assert np.allclose(hubs, _values(nx_hubs, graph), atol=1e-6)
+    assert np.allclose(authorities, _values(nx_authorities, graph), atol=1e-6)
+
+def test_warm_started_vertex_rankings_match_cold_started():
+    _, graph = _random_graphs(300, 0.04, seed=1)
+    k_core_graph = k_core_subgraph(graph, core_numbers(graph), 10)
+    for ranking_function in (pagerank, lambda graph, **kwargs: katz_centrality(graph, 0.02, **kwargs), eigenvector_centrality, lambda graph, **kwargs: hits(graph, **kwargs)[1]):
+        initial_values = warm_start_values(ranking_function(graph), graph, k_core_graph)
+        assert np.allclose(ranking_function(k_core_graph, initial_values=initial_values), ranking_function(k_core_graph), atol=1e-5)
@@ -0,0 +1,125 @@
+#!/usr/bin/python3
+
+"""
+PageRank, Katz, eigenvector and HITS centrality over CSR graphs.
+
+Each is a power iteration (or for HITS, a sparse eigensolver) on the graph's scipy CSR adjacency matrix and matches the NetworkX function of
+the same name (ignoring edge weights, as the pipeline always has) to within the same convergence tolerance.
+
+Every function accepts initial_values to warm start from. The k-core graphs are nested, so the values from one k-core restricted to or
+extended onto the next one (see warm_start_values) are already close to the answer and cut down the number of iterations needed.
+"""
+
+###########
+# Imports #
+###########
+
+import numpy as np
+import pandas as pd
+import scipy.sparse
+import scipy.sparse.linalg
+from typing import Tuple
+
+from csr_graph import CSRGraph, csr_graph_adjacency_matrix, csr_graph_degrees
+
+##############
+# Exceptions #
+##############
+
+class PowerIterationFailedConvergence(Exception):
+    pass
+
+###########
+# Helpers #
+###########
+
+def warm_start_values(previous_values: np.ndarray, previous_graph: CSRGraph, graph: CSRGraph) -> np.ndarray:
+    '''Carries values over to graph by node name. Nodes missing from previous_graph get the mean of the carried over values.'''
+    previous_positions = pd.Index(previous_graph.node_names).get_indexer(graph.node_names)
+    found_mask = previous_positions >= 0
+    if not found_mask.any():
+        return None
+    initial_values = np.empty(len(graph.node_names))
+    initial_values[found_mask] = np.asarray(previous_values)[previous_positions[found_mask]]
+    initial_values[~found_mask] = initial_values[found_mask].mean()
+    return initial_values
+
+##############
+# Centrality #
+##############
+
+def pagerank(graph: CSRGraph, alpha: float = 0.85, max_iter: int = 100, tol: float = 1e-06, initial_values: np.ndarray = None) -> np.ndarray:
+    '''Matches nx.pagerank(graph). Dangling nodes spread their rank evenly over all nodes.'''
+    number_of_nodes = len(graph.indptr)-1
+    if number_of_nodes == 0:
+        return np.zeros(0)
+    adjacency_matrix = csr_graph_adjacency_matrix(graph, include_weights=False)
+    degrees = csr_graph_degrees(graph).astype(float)
+    dangling_mask = degrees == 0
+    inverse_degrees = np.divide(1.0, degrees, out=np.zeros(number_of_nodes), where=~dangling_mask)
+    # the graph is undirected, so x @ D^-1 A is A @ (x / d)
+    values = np.full(number_of_nodes, 1.0/number_of_nodes) if initial_values is None else initial_values / initial_values.sum()
+    for _ in range(max_iter):
+        previous_values = values
+        values = alpha * (adjacency_matrix @ (previous_values * inverse_degrees) + previous_values[dangling_mask].sum() / number_of_nodes) + (1 - alpha) / number_of_nodes
+        if np.abs(values - previous_values).sum() < number_of_nodes * tol:
+            return values
+    raise PowerIterationFailedConvergence(f'PageRank failed to converge in {max_iter} iterations.')
+
+def katz_centrality(graph: CSRGraph, alpha: float = 0.1, beta: float = 1.0, max_iter: int = 1000, tol: float = 1e-06, initial_values: np.ndarray = None) -> np.ndarray:
+    '''Matches nx.katz_centrality(graph, alpha, beta), i.e. the fixed point of x = alpha A x + beta scaled to unit length.'''
+    number_of_nodes = len(graph.indptr)-1
+    if number_of_nodes == 0:
+        return np.zeros(0)
+    adjacency_matrix = csr_graph_adjacency_matrix(graph, include_weights=False)
+    if initial_values is None:
+        values = np.zeros(number_of_nodes)
+    else:
+        # initial_values are normalized, so rescale them to best fit the unnormalized fixed point
+        residual_direction = initial_values - alpha * (adjacency_matrix @ initial_values)
+        values = initial_values * beta * residual_direction.sum() / max(residual_direction @ residual_direction, np.finfo(float).tiny)
+    for _ in range(max_iter):
+        previous_values = values
+        values = alpha * (adjacency_matrix @ previous_values) + beta
+        if np.abs(values - previous_values).sum() < number_of_nodes * tol:
+            norm = np.linalg.norm(values)
+            return values / norm if norm > 0 else values
+    raise PowerIterationFailedConvergence(f'Katz centrality failed to converge in {max_iter} iterations.')
+
+def eigenvector_centrality(graph: CSRGraph, max_iter: int = 100, tol: float = 1e-06, initial_values: np.ndarray = None) -> np.ndarray:
+    '''Matches nx.eigenvector_centrality(graph), i.e. power iteration on A + I scaled to unit length.'''
+    number_of_nodes = len(graph.indptr)-1
+    if number_of_nodes == 0:
+        return np.zeros(0)
+    adjacency_matrix = csr_graph_adjacency_matrix(graph, include_weights=False)
+    values = np.full(number_of_nodes, 1.0/number_of_nodes) if initial_values is None else initial_values / initial_values.sum()
+    for _ in range(max_iter):
+        previous_values = values
+        values = adjacency_matrix @ previous_values + previous_values
+        norm = np.linalg.norm(values)
+        values = values / norm if norm > 0 else values
+        if np.abs(values - previous_values).sum() < number_of_nodes * tol:
+            return values
+    raise PowerIterationFailedConvergence(f'Eigenvector centrality failed to converge in {max_iter} iterations.')
+
+def hits(graph: CSRGraph, max_iter: int = 100, tol: float = 1e-08, initial_values: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Matches nx.hits(graph, normalized=True) and returns (hubs, authorities). initial_values are authorities.
+    The adjacency matrix is symmetric, so the top singular vector NetworkX asks for is the top eigenvector, which ARPACK finds faster.
+    '''
+    number_of_nodes = len(graph.indptr)-1
+    if number_of_nodes == 0:
+        return np.zeros(0), np.zeros(0)
+    adjacency_matrix = csr_graph_adjacency_matrix(graph, include_weights=False)
+    if number_of_nodes < 3:
+        # ARPACK can't find k=1 eigenvectors of matrices this small
+        _, eigenvectors = np.linalg.eigh(adjacency_matrix.toarray())
+        authorities = eigenvectors[:, -1]
+    else:
+        try:
+            _, eigenvectors = scipy.sparse.linalg.eigsh(adjacency_matrix, k=1, which='LA', v0=initial_values, maxiter=max_iter, tol=tol)
+        except scipy.sparse.linalg.ArpackNoConvergence as exception:
+            raise PowerIterationFailedConvergence(f'HITS failed to converge in {max_iter} iterations.') from exception
+        authorities = eigenvectors[:, 0]
+    hubs = adjacency_matrix @ authorities
+    return hubs / hubs.sum(), authorities / authorities.sum()
@@ -4,17 +4,27 @@
 # Imports #
 ###########
 
+import os
 import random
 import matplotlib
 import matplotlib.pyplot as plt
+import matplotlib.artist
+import matplotlib.axes
+import matplotlib.image
+import numpy as np
 import pandas as pd
-import networkx as nx
-from functools import reduce
-from typing import Union, Tuple, List
+from contextlib import contextmanager
+from matplotlib.collections import LineCollection
+from typing import Union, Tuple, List, Generator
 
 from misc_utilities import timer, histogram, temp_plt_figure, timeout, debug_on_error, trace, parallel_map
+from csr_graph import CSRGraph, read_csr_graph_parquet, csr_graph_edge_arrays
+from graph_layout import cached_force_directed_layout
+from metrics_store import metric_column_file, read_metric_column
 from preprocess import K_CORE_CHOICES_FOR_K
 from preprocess import K_CORE_PROJECTED_ACTORS_CSV_TEMPLATE, K_CORE_PROJECTED_DIRECTORS_CSV_TEMPLATE
+from preprocess import K_CORE_PROJECTED_ACTORS_PARQUET_TEMPLATE, K_CORE_PROJECTED_DIRECTORS_PARQUET_TEMPLATE
+from preprocess import ACTORS_METRICS_DIR_TEMPLATE, DIRECTORS_METRICS_DIR_TEMPLATE
 
 from preprocess import ACTORS_LABEL_PROP_CSV_TEMPLATE, DIRECTORS_LABEL_PROP_CSV_TEMPLATE
 from preprocess import ACTORS_LOUVAIN_CSV_TEMPLATE, DIRECTORS_LOUVAIN_CSV_TEMPLATE
@@ -36,20 +46,39 @@ from preprocess import ACTORS_KATZ_CSV_TEMPLATE, DIRECTORS_KATZ_CSV_TEMPLATE
 
 matplotlib.use("Agg")
 
+LAYOUT_CACHE_DIR = './output/layouts/'
+
+# metric to the (actor, director) CSV templates the PNG names are derived from
+COMMUNITY_METRIC_TO_CSV_TEMPLATE_PAIR_MAP = {
+    'label_propagation': (ACTORS_LABEL_PROP_CSV_TEMPLATE, DIRECTORS_LABEL_PROP_CSV_TEMPLATE),
+    'louvain': (ACTORS_LOUVAIN_CSV_TEMPLATE, DIRECTORS_LOUVAIN_CSV_TEMPLATE),
+}
+
+VERTEX_RANKING_METRIC_TO_CSV_TEMPLATE_PAIR_MAP = {
+    'hits_authority': (ACTORS_HITS_AUTHORITY_CSV_TEMPLATE, DIRECTORS_HITS_AUTHORITY_CSV_TEMPLATE),
+    'hits_hub': (ACTORS_HITS_HUB_CSV_TEMPLATE, DIRECTORS_HITS_HUB_CSV_TEMPLATE),
+    'square_clustering_coefficient': (ACTORS_SQUARE_CLUSTERING_COEFFICIENT_CSV_TEMPLATE, DIRECTORS_SQUARE_CLUSTERING_COEFFICIENT_CSV_TEMPLATE),
+    'clustering_coefficient': (ACTORS_CLUSTERING_COEFFICIENT_CSV_TEMPLATE, DIRECTORS_CLUSTERING_COEFFICIENT_CSV_TEMPLATE),
+    'pagerank': (ACTORS_PAGERANK_CSV_TEMPLATE, DIRECTORS_PAGERANK_CSV_TEMPLATE),
+    'closeness': (ACTORS_CLOSENESS_CSV_TEMPLATE, DIRECTORS_CLOSENESS_CSV_TEMPLATE),
+    'betweenness': (ACTORS_BETWEENNESS_CSV_TEMPLATE, DIRECTORS_BETWEENNESS_CSV_TEMPLATE),
+    'eigenvector': (ACTORS_EIGENVECTOR_CSV_TEMPLATE, DIRECTORS_EIGENVECTOR_CSV_TEMPLATE),
+    'degree': (ACTORS_DEGREE_CSV_TEMPLATE, DIRECTORS_DEGREE_CSV_TEMPLATE),
+    'katz': (ACTORS_KATZ_CSV_TEMPLATE, DIRECTORS_KATZ_CSV_TEMPLATE),
+}
+
 #############
 # Utilities #
 #############
 
-def node_label_csv_file_into_label_to_nodes_map(node_label_csv_file: str) -> dict:
-    node_label_df = pd.read_csv(node_label_csv_file)
-    node_label_pairs = ((row.node, row.label) for row in node_label_df.itertuples())
-    label_to_nodes_map = dict()
-    for node, label in node_label_pairs:
-        if label in label_to_nodes_map:
-            label_to_nodes_map[label].add(node)
-        else:
-            label_to_nodes_map[label] = {node}
-    return label_to_nodes_map
+def png_file_for_csv_file(csv_file: str) -> str:
+    png_file = '.'.join(csv_file.split('.')[:-1])+'.png'
+    assert csv_file[:-4] == png_file[:-4]
+    return png_file
+
+def metric_column_into_node_values(metrics_dir: str, metric_name: str) -> np.ndarray:
+    '''The metrics store keeps every column in the k-core graph's node order, so the values line up with the layout as they are.'''
+    return read_metric_column(metric_column_file(metrics_dir, metric_name)).astype(float)
 
 ###########
 # Drawing #
@@ -66,140 +95,100 @@ DEFAULT_NODE_SIZE = 10
 MINIMUM_NODE_SIZE = 1
 NODE_SIZE_GROWTH_POTENTIAL = 300 - MINIMUM_NODE_SIZE
 
-def draw_graph_to_file(output_location: str, graph: nx.Graph, **kwargs) -> None:
+def _draw_nodes(plot: matplotlib.axes.Axes, layout: np.ndarray, **kwargs) -> List[matplotlib.artist.Artist]:
+    assert len(kwargs) <= 1
+    if 'node_labels' in kwargs:
+        node_labels = kwargs['node_labels']
+        drawn_mask = ~np.isnan(node_labels)
+        label_ids, unique_labels = pd.factorize(node_labels[drawn_mask])
+        label_colors = np.array([random_hex_color() for _ in range(len(unique_labels))], dtype=object)
+        node_artist = plot.scatter(layout[drawn_mask, 0],
+                                   layout[drawn_mask, 1],
+                                   c=label_colors[label_ids].tolist(),
+                                   s=DEFAULT_NODE_SIZE,
+                                   zorder=2)
+        plot.title.set_text(f'{len(unique_labels)} communities')
+        return [node_artist, plot.title]
+    elif 'node_values' in kwargs:
+        node_values = kwargs['node_values']
+        drawn_mask = ~np.isnan(node_values)
+        if not drawn_mask.any():
+            return []
+        normalized_values = node_values[drawn_mask]/node_values[drawn_mask].max()
+        node_artist = plot.scatter(layout[drawn_mask, 0],
+                                   layout[drawn_mask, 1],
+                                   c=DEFAULT_NODE_COLOR,
+                                   s=MINIMUM_NODE_SIZE+NODE_SIZE_GROWTH_POTENTIAL*normalized_values,
+                                   zorder=2)
+        return [node_artist]
+    assert len(kwargs)==0
+    node_artist = plot.scatter(layout[:, 0],
+                               layout[:, 1],
+                               c=DEFAULT_NODE_COLOR,
+                               s=DEFAULT_NODE_SIZE,
+                               zorder=2)
+    return [node_artist]
+
+@contextmanager
+def graph_drawer(graph: CSRGraph, layout: np.ndarray) -> Generator:
+    '''
+    Yields a function taking an output location and the same keyword arguments as draw_graph_to_file.
+    The edges are rendered once up front, so each drawing only has to render a single scatter of the nodes on top of them.
+    '''
     with temp_plt_figure(figsize=(20.0,10.0)) as figure:
         plot = figure.add_subplot(111)
-        layout = nx.spring_layout(graph, iterations=NUMBER_OF_SPRING_LAYOUT_ITERATIONS)
-        nx.draw_networkx_edges(graph,
-                               layout, 
-                               width=1,
-                               alpha=0.1,
-                               edge_color=EDGE_COLOR)
-        assert len(kwargs) <= 1
-        if 'label_to_nodes_map' in kwargs:
-            label_to_nodes_map = kwargs['label_to_nodes_map']
-            for label, nodes in label_to_nodes_map.items():
-                node_color = random_hex_color()
-                nx.draw_networkx_nodes(graph,
-                                       layout,
-                                       nodelist=nodes,
-                                       node_color=node_color,
-                                       node_size=DEFAULT_NODE_SIZE,
-                                       ax=plot)
-            plot.set_title(f'{len(label_to_nodes_map)} communities')
-        elif 'node_to_value_map' in kwargs:
-            node_to_value_map = kwargs['node_to_value_map']
-            if len(node_to_value_map) > 0:
-                max_value = max(node_to_value_map.values())
-                for node, value in node_to_value_map.items():
-                    normalized_value = value/max_value
-                    nx.draw_networkx_nodes(graph,
-                                           layout,
-                                           nodelist=[node],
-                                           node_color=DEFAULT_NODE_COLOR,
-                                           node_size=MINIMUM_NODE_SIZE+NODE_SIZE_GROWTH_POTENTIAL*normalized_value,
-                                           ax=plot)
-        else:
-            assert len(kwargs)==0
-            nx.draw_networkx_nodes(graph,
-                                   layout,
-                                   nodelist=graph.nodes,
-                                   node_color=DEFAULT_NODE_COLOR,
-                                   node_size=DEFAULT_NODE_SIZE,
-                                   ax=plot)
-        figure.savefig(output_location)
+        sources, targets, _ = csr_graph_edge_arrays(graph)
+        plot.add_collection(LineCollection(np.stack([layout[sources], layout[targets]], axis=1),
+                                           linewidths=1,
+                                           alpha=0.1,
+                                           colors=EDGE_COLOR,
+                                           zorder=1))
+        plot.update_datalim(layout)
+        plot.autoscale_view()
+        plot.set_autoscale_on(False)
+        plot.tick_params(axis='both', which='both', bottom=False, left=False, labelbottom=False, labelleft=False)
+        figure.canvas.draw()
+        background = figure.canvas.copy_from_bbox(figure.bbox)
+        def draw(output_location: str, **kwargs) -> None:
+            figure.canvas.restore_region(background)
+            artists = _draw_nodes(plot, layout, **kwargs)
+            for artist in artists:
+                plot.draw_artist(artist)
+            matplotlib.image.imsave(output_location, np.asarray(figure.canvas.buffer_rgba()))
+            for artist in artists:
+                if artist is plot.title:
+                    plot.title.set_text('')
+                else:
+                    artist.remove()
+            return
+        yield draw
+    return
+
+def draw_graph_to_file(output_location: str, graph: CSRGraph, layout: np.ndarray, **kwargs) -> None:
+    with graph_drawer(graph, layout) as draw:
+        draw(output_location, **kwargs)
     return
 
 ##########
 # K-Core #
 ##########
 
-def visualize_k_core_csv(csv_file: str) -> None:
-    df = pd.read_csv(csv_file)
-    graph = nx.from_pandas_edgelist(df, 'source', 'target')
-    png_file = '.'.join(csv_file.split('.')[:-1])+'.png'
-    assert csv_file[:-4] == png_file[:-4]
-    draw_graph_to_file(png_file, graph)
-    return 
-
-###############
-# Communities #
-###############
-
-def visualize_community_csv(edge_list_csv_label_csv_pair: Tuple[str,str]) -> None:
-    edge_list_csv_file, node_label_csv_file = edge_list_csv_label_csv_pair
-    edge_list_df = pd.read_csv(edge_list_csv_file)
-    graph = nx.from_pandas_edgelist(edge_list_df, 'source', 'target')
-    png_file = '.'.join(node_label_csv_file.split('.')[:-1])+'.png'
-    assert node_label_csv_file[:-4] == png_file[:-4]
-    label_to_nodes_map = node_label_csv_file_into_label_to_nodes_map(node_label_csv_file)
-    draw_graph_to_file(png_file, graph, label_to_nodes_map=label_to_nodes_map)
-    return 
-
-def visualize_community_csvs(k_core_csv_files: List[str]) -> None:
-    label_propagation_csv_files = reduce(list.__add__, ([ACTORS_LABEL_PROP_CSV_TEMPLATE % k, DIRECTORS_LABEL_PROP_CSV_TEMPLATE % k] for k in K_CORE_CHOICES_FOR_K))
-    print('Visualizing Label Propagation Data.')
-    parallel_map(visualize_community_csv, zip(k_core_csv_files, label_propagation_csv_files))
-    louvain_csv_files = reduce(list.__add__, ([ACTORS_LOUVAIN_CSV_TEMPLATE % k, DIRECTORS_LOUVAIN_CSV_TEMPLATE % k] for k in K_CORE_CHOICES_FOR_K))
-    print('Visualizing Louvain Data.')
-    parallel_map(visualize_community_csv, zip(k_core_csv_files, louvain_csv_files))
-    return
-
-##################
-# Vertex Ranking #
-##################
-
-def visualize_vertex_ranking_csv(edge_list_csv_value_csv_pair: Tuple[str,str]) -> None:
-    edge_list_csv_file, node_value_csv_file = edge_list_csv_value_csv_pair
-    edge_list_df = pd.read_csv(edge_list_csv_file)
-    graph = nx.from_pandas_edgelist(edge_list_df, 'source', 'target')
-    png_file = '.'.join(node_value_csv_file.split('.')[:-1])+'.png'
-    node_value_csv_file
-    node_value_df = pd.read_csv(node_value_csv_file)
-    node_to_value_map = {row.node: row.value for row in node_value_df.itertuples()}
-    draw_graph_to_file(png_file, graph, node_to_value_map=node_to_value_map)
-    return 
-
-def visualize_vertex_ranking_csvs(k_core_csv_files: List[str]) -> None:
-    hits_authority_csv_files = reduce(list.__add__, ([ACTORS_HITS_AUTHORITY_CSV_TEMPLATE % k, DIRECTORS_HITS_AUTHORITY_CSV_TEMPLATE % k] for k in K_CORE_CHOICES_FOR_K))
-    print('Visualizing Hits Authority Data.')
-    parallel_map(visualize_vertex_ranking_csv, zip(k_core_csv_files, hits_authority_csv_files))
-    
-    hits_hub_csv_files = reduce(list.__add__, ([ACTORS_HITS_HUB_CSV_TEMPLATE % k, DIRECTORS_HITS_HUB_CSV_TEMPLATE % k] for k in K_CORE_CHOICES_FOR_K))
-    print('Visualizing Hits Hub Data.')
-    parallel_map(visualize_vertex_ranking_csv, zip(k_core_csv_files, hits_hub_csv_files))
-    
-    square_clustering_coefficient_csv_files = reduce(list.__add__, ([ACTORS_SQUARE_CLUSTERING_COEFFICIENT_CSV_TEMPLATE % k, DIRECTORS_SQUARE_CLUSTERING_COEFFICIENT_CSV_TEMPLATE % k] for k in K_CORE_CHOICES_FOR_K))
-    print('Visualizing Square Clustering Coefficient Data.')
-    parallel_map(visualize_vertex_ranking_csv, zip(k_core_csv_files, square_clustering_coefficient_csv_files))
-    
-    clustering_coefficient_csv_files = reduce(list.__add__, ([ACTORS_CLUSTERING_COEFFICIENT_CSV_TEMPLATE % k, DIRECTORS_CLUSTERING_COEFFICIENT_CSV_TEMPLATE % k] for k in K_CORE_CHOICES_FOR_K))
-    print('Visualizing Clustering Coefficient Data.')
-    parallel_map(visualize_vertex_ranking_csv, zip(k_core_csv_files, clustering_coefficient_csv_files))
-    
-    pagerank_csv_files = reduce(list.__add__, ([ACTORS_PAGERANK_CSV_TEMPLATE % k, DIRECTORS_PAGERANK_CSV_TEMPLATE % k] for k in K_CORE_CHOICES_FOR_K))
-    print('Visualizing Pagerank Data.')
-    parallel_map(visualize_vertex_ranking_csv, zip(k_core_csv_files, pagerank_csv_files))
-    
-    closeness_csv_files = reduce(list.__add__, ([ACTORS_CLOSENESS_CSV_TEMPLATE % k, DIRECTORS_CLOSENESS_CSV_TEMPLATE % k] for k in K_CORE_CHOICES_FOR_K))
-    print('Visualizing Closeness Centrality Data.')
-    parallel_map(visualize_vertex_ranking_csv, zip(k_core_csv_files, closeness_csv_files))
-    
-    betweenness_csv_files = reduce(list.__add__, ([ACTORS_BETWEENNESS_CSV_TEMPLATE % k, DIRECTORS_BETWEENNESS_CSV_TEMPLATE % k] for k in K_CORE_CHOICES_FOR_K))
-    print('Visualizing Betweenness Centrality Data.')
-    parallel_map(visualize_vertex_ranking_csv, zip(k_core_csv_files, betweenness_csv_files))
-    
-    eigenvector_csv_files = reduce(list.__add__, ([ACTORS_EIGENVECTOR_CSV_TEMPLATE % k, DIRECTORS_EIGENVECTOR_CSV_TEMPLATE % k] for k in K_CORE_CHOICES_FOR_K))
-    print('Visualizing Eigenvector Centrality Data.')
-    parallel_map(visualize_vertex_ranking_csv, zip(k_core_csv_files, eigenvector_csv_files))
-    
-    degree_csv_files = reduce(list.__add__, ([ACTORS_DEGREE_CSV_TEMPLATE % k, DIRECTORS_DEGREE_CSV_TEMPLATE % k] for k in K_CORE_CHOICES_FOR_K))
-    print('Visualizing Degree Centrality Data.')
-    parallel_map(visualize_vertex_ranking_csv, zip(k_core_csv_files, degree_csv_files))
-    
-    katz_csv_files = reduce(list.__add__, ([ACTORS_KATZ_CSV_TEMPLATE % k, DIRECTORS_KATZ_CSV_TEMPLATE % k] for k in K_CORE_CHOICES_FOR_K))
-    print('Visualizing Katz Centrality Data.')
-    parallel_map(visualize_vertex_ranking_csv, zip(k_core_csv_files, katz_csv_files))
+def visualize_k_core_graph(k_core_group: Tuple[str, str, str, List[Tuple[str, str]], List[Tuple[str, str]]]) -> None:
+    '''
+    Reads the k-core graph, lays it out and renders its edges once, then draws the k-core along with each of its community and vertex ranking metrics.
+    The metric groups are pairs of metric name and PNG file. Metrics that haven't been computed are skipped.
+    '''
+    k_core_parquet_file, metrics_dir, k_core_png_file, community_metric_png_files, vertex_ranking_metric_png_files = k_core_group
+    graph = read_csr_graph_parquet(k_core_parquet_file)
+    layout = cached_force_directed_layout(graph, LAYOUT_CACHE_DIR, iterations=NUMBER_OF_SPRING_LAYOUT_ITERATIONS)
+    with graph_drawer(graph, layout) as draw:
+        draw(k_core_png_file)
+        for metric_name, png_file in community_metric_png_files:
+            if os.path.isfile(metric_column_file(metrics_dir, metric_name)):
+                draw(png_file, node_labels=metric_column_into_node_values(metrics_dir, metric_name))
+        for metric_name, png_file in vertex_ranking_metric_png_files:
+            if os.path.isfile(metric_column_file(metrics_dir, metric_name)):
+                draw(png_file, node_values=metric_column_into_node_values(metrics_dir, metric_name))
     return
 
 ########
@@ -207,11 +196,19 @@ def visualize_vertex_ranking_csvs(k_core_csv_files: List[str]) -> None:
 ########
 
 def visualize_k_core_graphs() -> None:
-    k_core_csv_files = reduce(list.__add__, ([K_CORE_PROJECTED_ACTORS_CSV_TEMPLATE % k, K_CORE_PROJECTED_DIRECTORS_CSV_TEMPLATE % k] for k in K_CORE_CHOICES_FOR_K))
-    print('Visualizing K-Core Data.')
-    parallel_map(visualize_k_core_csv, k_core_csv_files)
-    visualize_community_csvs(k_core_csv_files)
-    visualize_vertex_ranking_csvs(k_core_csv_files)
+    k_core_groups = []
+    for k in K_CORE_CHOICES_FOR_K:
+        for graph_index, (k_core_csv_template, k_core_parquet_template, metrics_dir_template) in enumerate([
+                (K_CORE_PROJECTED_ACTORS_CSV_TEMPLATE, K_CORE_PROJECTED_ACTORS_PARQUET_TEMPLATE, ACTORS_METRICS_DIR_TEMPLATE),
+                (K_CORE_PROJECTED_DIRECTORS_CSV_TEMPLATE, K_CORE_PROJECTED_DIRECTORS_PARQUET_TEMPLATE, DIRECTORS_METRICS_DIR_TEMPLATE)]):
+            community_metric_png_files = [(metric_name, png_file_for_csv_file(csv_template_pair[graph_index] % k))
+                                          for metric_name, csv_template_pair in COMMUNITY_METRIC_TO_CSV_TEMPLATE_PAIR_MAP.items()]
+            vertex_ranking_metric_png_files = [(metric_name, png_file_for_csv_file(csv_template_pair[graph_index] % k))
+                                               for metric_name, csv_template_pair in VERTEX_RANKING_METRIC_TO_CSV_TEMPLATE_PAIR_MAP.items()]
+            k_core_groups.append((k_core_parquet_template % k, metrics_dir_template % k, png_file_for_csv_file(k_core_csv_template % k),
+                                  community_metric_png_files, vertex_ranking_metric_png_files))
+    print('Visualizing K-Core, Community and Vertex Ranking Data.')
+    parallel_map(visualize_k_core_graph, k_core_groups)
     return
 
 @debug_on_error
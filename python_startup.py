@@ -22,40 +22,103 @@ def test():
 
 print_header()
 
+# Lazy Import Utilities
+
+# Names imported via lazy_import and lazy_from_import are only really imported the first time they're used, at which point
+# they're rebound to the real object, so interpreters (and worker processes) that never touch them never pay for them.
+
+LAZY_IMPORT_TIMES: dict = dict()
+
+def _timed_import(module_name: str):
+    import time
+    import importlib
+    start_time = time.time()
+    module = importlib.import_module(module_name)
+    end_time = time.time()
+    LAZY_IMPORT_TIMES.setdefault(module_name, end_time - start_time)
+    return module
+
+import types
+class LazyModule(types.ModuleType):
+    def __init__(self, module_name: str, alias: str, namespace: dict):
+        super().__init__(module_name)
+        self._lazy_alias = alias
+        self._lazy_namespace = namespace
+        self._lazy_module = None
+    
+    def _resolve(self) -> types.ModuleType:
+        if self._lazy_module is None:
+            self._lazy_module = _timed_import(self.__name__)
+            if self._lazy_namespace.get(self._lazy_alias) is self:
+                self._lazy_namespace[self._lazy_alias] = self._lazy_module
+        return self._lazy_module
+    
+    def __getattr__(self, attribute_name: str):
+        return getattr(self._resolve(), attribute_name)
+    
+    def __dir__(self) -> list:
+        return dir(self._resolve())
+    
+    def __repr__(self) -> str:
+        return f'<lazy module {repr(self.__name__)}{"" if self._lazy_module is None else " (imported)"}>'
+
+def lazy_import(module_name: str, alias: str = None, namespace: dict = None) -> LazyModule:
+    alias = module_name if alias is None else alias
+    namespace = globals() if namespace is None else namespace
+    namespace[alias] = LazyModule(module_name, alias, namespace)
+    return namespace[alias]
+
+from typing import Callable
+def lazy_from_import(module_name: str, attribute_name: str, alias: str = None, namespace: dict = None) -> Callable:
+    """Only for callables, e.g. functions or classes used as constructors."""
+    import functools
+    alias = attribute_name if alias is None else alias
+    namespace = globals() if namespace is None else namespace
+    def resolve_and_call(*args, **kwargs):
+        attribute = getattr(_timed_import(module_name), attribute_name)
+        if namespace.get(alias) is resolve_and_call:
+            namespace[alias] = attribute
+        return attribute(*args, **kwargs)
+    resolve_and_call.__name__ = alias
+    resolve_and_call.__qualname__ = alias
+    resolve_and_call.__doc__ = f'Lazily imported {module_name}.{attribute_name}'
+    namespace[alias] = resolve_and_call
+    return resolve_and_call
+
+def lazy_import_report() -> None:
+    for module_name, import_time in sorted(LAZY_IMPORT_TIMES.items(), key=lambda item: item[1], reverse=True):
+        print(f'{module_name} took {import_time*1000:.3f} milliseconds to import.')
+    return
+
 # Imports purely for accessibility, not use in helper utilities
 
 import os
 import sys
-import random
-import time
-import re
 import time
-import math
-import json
-import subprocess
-import multiprocessing
-import functools
-import itertools
-import inspect
-import signal
-from importlib import reload
-from inspect import getfile, getsource, getsourcefile
-from inspect import getmodule
-from inspect import getdoc
-from inspect import signature
-from statistics import mean
-from functools import reduce
+lazy_import('random')
+lazy_import('re')
+lazy_import('math')
+lazy_import('json')
+lazy_import('subprocess')
+lazy_import('multiprocessing')
+lazy_import('functools')
+lazy_import('itertools')
+lazy_import('inspect')
+lazy_import('signal')
+lazy_from_import('importlib', 'reload')
+lazy_from_import('inspect', 'getfile')
+lazy_from_import('inspect', 'getsource')
+lazy_from_import('inspect', 'getsourcefile')
+lazy_from_import('inspect', 'getmodule')
+lazy_from_import('inspect', 'getdoc')
+lazy_from_import('inspect', 'signature')
+lazy_from_import('statistics', 'mean')
+lazy_from_import('functools', 'reduce')
 
 
 if os.uname()[1] == "demouser-DGX-Station":
-    try:
-        import numpy as np
-    except:
-        pass
-    try:
-        import networkx as nx
-    except:
-        pass
+    lazy_import('numpy', 'np')
+    lazy_import('networkx', 'nx')
 
 # Debugging Utilities
 
@@ -371,24 +434,126 @@ from typing import List
 def at_most_one(items: List):
     return only_one(items) if items else None
 
-from typing import List
-def parallel_map(*args, **kwargs) -> List:
+# Worker pools are created on first use and reused by every later call since forking a fresh pool per call costs more than the work for short maps.
+
+_PROCESS_POOL = None
+_PROCESS_POOL_OWNER_PID = None
+_PROCESS_POOL_MAIN_NAMESPACE = None
+_THREAD_POOL = None
+
+def _shutdown_worker_pools() -> None:
+    global _PROCESS_POOL, _THREAD_POOL
+    for pool in (_PROCESS_POOL, _THREAD_POOL):
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    _PROCESS_POOL = None
+    _THREAD_POOL = None
+    return
+
+import atexit
+atexit.register(_shutdown_worker_pools)
+
+from typing import Callable
+def _process_pool_is_stale(func: Callable) -> bool:
+    # Workers get a snapshot of __main__ when they're forked, so they can't see functions (re)defined in __main__ afterward.
+    import os
+    import functools
+    if _PROCESS_POOL is None or _PROCESS_POOL_OWNER_PID != os.getpid():
+        return True
+    # partials and methods get pickled by reference to the functions underneath them
+    while isinstance(func, functools.partial):
+        func = func.func
+    func = getattr(func, '__func__', func)
+    if not hasattr(func, '__qualname__'):
+        # callable instances get pickled along with a reference to their class
+        func = type(func)
+    if getattr(func, '__module__', None) == '__main__':
+        value = _PROCESS_POOL_MAIN_NAMESPACE
+        for name in getattr(func, '__qualname__', '').split('.'):
+            value = value.get(name) if isinstance(value, dict) else getattr(value, name, None)
+        return getattr(value, '__func__', value) is not func
+    return False
+
+from typing import Callable
+def _get_worker_pool(func: Callable, use_threads: bool):
+    global _PROCESS_POOL, _PROCESS_POOL_OWNER_PID, _PROCESS_POOL_MAIN_NAMESPACE, _THREAD_POOL
+    import os
+    import sys
     import multiprocessing
-    p = multiprocessing.Pool()
-    result = p.map(*args, **kwargs)
-    p.close()
-    p.join()
-    return result
+    import multiprocessing.pool
+    if use_threads:
+        if _THREAD_POOL is None:
+            _THREAD_POOL = multiprocessing.pool.ThreadPool(processes=4*multiprocessing.cpu_count())
+        return _THREAD_POOL
+    if _process_pool_is_stale(func):
+        if _PROCESS_POOL is not None and _PROCESS_POOL_OWNER_PID == os.getpid():
+            _PROCESS_POOL.terminate()
+            _PROCESS_POOL.join()
+        _PROCESS_POOL = multiprocessing.Pool()
+        _PROCESS_POOL_OWNER_PID = os.getpid()
+        _PROCESS_POOL_MAIN_NAMESPACE = dict(vars(sys.modules['__main__']))
+    return _PROCESS_POOL
+
+def _automatic_chunksize(number_of_items: int, number_of_workers: int) -> int:
+    # Same heuristic multiprocessing.Pool.map uses, i.e. about 4 chunks per worker.
+    chunksize, remainder = divmod(number_of_items, 4*number_of_workers)
+    return max(chunksize + bool(remainder), 1)
+
+from typing import Callable, Iterable, Generator
+def parallel_imap(func: Callable, iterable: Iterable, chunksize: int = None, ordered: bool = True, use_threads: bool = False) -> Generator:
+    '''Streams results as they're computed. Unsized iterables aren't materialized, so they fall back to a chunksize of 1 unless one is given.'''
+    pool = _get_worker_pool(func, use_threads)
+    if chunksize is None:
+        chunksize = _automatic_chunksize(len(iterable), pool._processes) if hasattr(iterable, '__len__') else 1
+    imap_method = pool.imap if ordered else pool.imap_unordered
+    yield from imap_method(func, iterable, chunksize=chunksize)
+    return
 
-from typing import List
-def parallel_mapcar(func, *args) -> List:
+from typing import Callable, Iterable, List
+def parallel_map(func: Callable, iterable: Iterable, chunksize: int = None, use_threads: bool = False) -> List:
+    items = iterable if hasattr(iterable, '__len__') else list(iterable)
+    pool = _get_worker_pool(func, use_threads)
+    chunksize = _automatic_chunksize(len(items), pool._processes) if chunksize is None else chunksize
+    return pool.map(func, items, chunksize=chunksize)
+
+from typing import Callable, Iterable, List
+def parallel_map_unordered(func: Callable, iterable: Iterable, chunksize: int = None, use_threads: bool = False) -> List:
+    items = iterable if hasattr(iterable, '__len__') else list(iterable)
+    return list(parallel_imap(func, items, chunksize=chunksize, ordered=False, use_threads=use_threads))
+
+from typing import Callable, List
+def parallel_mapcar(func: Callable, *args, use_threads: bool = False) -> List:
+    items = list(zip(*args))
+    pool = _get_worker_pool(func, use_threads)
+    return pool.starmap(func, items, chunksize=_automatic_chunksize(len(items), pool._processes))
+
+from typing import Callable, Iterable, List
+def _parallel_map_with_fresh_pool(func: Callable, iterable: Iterable) -> List:
+    # What parallel_map used to do, kept around for benchmark_parallel_map
     import multiprocessing
     p = multiprocessing.Pool()
-    result = p.starmap(func, zip(*args))
+    result = p.map(func, iterable)
     p.close()
     p.join()
     return result
 
+def benchmark_parallel_map(number_of_calls: int = 100, number_of_items: int = 1_000) -> None:
+    import math
+    items = list(range(number_of_items))
+    expected_result = list(map(math.sqrt, items))
+    timings = []
+    for map_name, map_func in [('fresh pool per call', _parallel_map_with_fresh_pool),
+                               ('persistent process pool', parallel_map),
+                               ('persistent thread pool', functools.partial(parallel_map, use_threads=True)),
+                               ('persistent process pool, unordered', lambda func, iterable: sorted(parallel_map_unordered(func, iterable)))]:
+        with timer(exitCallback=lambda elapsed_time: timings.append((map_name, elapsed_time))):
+            for _ in range(number_of_calls):
+                assert map_func(math.sqrt, items) == expected_result
+    for map_name, elapsed_time in timings:
+        print(f'{map_name}: {elapsed_time/number_of_calls*1000:.3f} ms per call over {number_of_calls} calls of {number_of_items} items')
+    return
+
 from typing import Iterable, Callable,  List
 def eager_map(func: Callable, iterable: Iterable) -> List:
     return list(map(func, iterable))
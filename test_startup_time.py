@@ -0,0 +1,71 @@
+#!/usr/bin/python3
+
+"""
+Guards how long it takes to load python_startup.py and the misc_utilities.py copies, since every interpreter and every worker process pays for it.
+"""
+
+###########
+# Imports #
+###########
+
+import os
+import sys
+import json
+import subprocess
+import pytest
+
+#############
+# Constants #
+#############
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STARTUP_TIME_BUDGET_IN_SECONDS = 0.25
+
+HEAVY_MODULES = ['json', 'subprocess', 'multiprocessing', 'inspect', 'statistics', 'random', 'tqdm', 'numpy', 'pandas', 'networkx']
+
+MISC_UTILITIES_DIRS = ['netflix', 'amazon_movie_ratings', 'tweet_sentiment_extraction', 'uci_ecommerce_rfm', os.path.join('d3', 'airline')]
+
+LOAD_PYTHON_STARTUP_CODE = "exec(open('python_startup.py').read())"
+
+LOAD_MISC_UTILITIES_CODE = "import misc_utilities"
+
+MEASUREMENT_CODE_TEMPLATE = '''
+import sys, time, io, contextlib
+start_time = time.time()
+with contextlib.redirect_stdout(io.StringIO()):
+    {load_code}
+end_time = time.time()
+loaded_modules = [module_name.split('.')[0] for module_name in sys.modules]
+import json
+print(json.dumps({{'elapsed_time': end_time - start_time, 'loaded_modules': loaded_modules}}))
+'''
+
+###########
+# Helpers #
+###########
+
+def _measure_startup(load_code: str, working_dir: str) -> dict:
+    measurement_code = MEASUREMENT_CODE_TEMPLATE.format(load_code=load_code)
+    measurements = []
+    for _ in range(3): # the first run may include writing out .pyc files
+        output = subprocess.check_output([sys.executable, '-c', measurement_code], cwd=working_dir)
+        measurements.append(json.loads(output.decode('utf-8').splitlines()[-1]))
+    return min(measurements, key=lambda measurement: measurement['elapsed_time'])
+
+#########
+# Tests #
+#########
+
+def test_python_startup_time():
+    measurement = _measure_startup(LOAD_PYTHON_STARTUP_CODE, REPO_DIR)
+    heavy_modules_loaded = sorted(set(HEAVY_MODULES) & set(measurement['loaded_modules']))
+    assert heavy_modules_loaded == [], f'python_startup.py eagerly imported {heavy_modules_loaded}'
+    assert measurement['elapsed_time'] < STARTUP_TIME_BUDGET_IN_SECONDS
+
+@pytest.mark.parametrize('misc_utilities_dir', MISC_UTILITIES_DIRS)
+def test_misc_utilities_import_time(misc_utilities_dir: str):
+    measurement = _measure_startup(LOAD_MISC_UTILITIES_CODE, os.path.join(REPO_DIR, misc_utilities_dir))
+    heavy_modules_loaded = sorted(set(HEAVY_MODULES) & set(measurement['loaded_modules']))
+    assert heavy_modules_loaded == [], f'{misc_utilities_dir}/misc_utilities.py eagerly imported {heavy_modules_loaded}'
+    assert measurement['elapsed_time'] < STARTUP_TIME_BUDGET_IN_SECONDS
@@ -0,0 +1,74 @@
+#!/usr/bin/python3
+
+"""
+Times the sparse customer similarity graph and its Louvain communities (see customer_similarity.py) on the synthetic UCI e-commerce data
+(see benchmark_rfm.py) at its original size and scaled up 10x, tracking peak memory, and compares the graph to the unweighted projection
+of the customer-to-stock-code bipartite graph that used to be built.
+"""
+
+###########
+# Imports #
+###########
+
+import sys
+import time
+import tracemalloc
+import numpy as np
+import networkx as nx
+import community as community_louvain
+from typing import Callable, Tuple
+
+from misc_utilities import debug_on_error
+from rfm import clean_data
+from benchmark_rfm import synthetic_uci_data
+from customer_similarity import customer_stock_code_matrix, customer_similarity_matrix, louvain_communities
+
+###########
+# Globals #
+###########
+
+SCALE_FACTORS = [1, 10]
+
+##############
+# Benchmarks #
+##############
+
+def _time_and_trace_call(func: Callable, *args, **kwargs) -> Tuple[float, float, object]:
+    '''Returns the time taken, the peak memory allocated during the call in GiB, and the result.'''
+    tracemalloc.start()
+    start_time = time.time()
+    result = func(*args, **kwargs)
+    end_time = time.time()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return end_time - start_time, peak_memory / 2**30, result
+
+def projected_graph_size(purchase_matrix) -> int:
+    '''Number of edges in the unweighted projection, or an upper bound when it's too big to count exactly.'''
+    if purchase_matrix.shape[0] > 10_000:
+        stock_code_customer_counts = np.bincount(purchase_matrix.indices, minlength=purchase_matrix.shape[1]).astype(np.int64)
+        return int((stock_code_customer_counts * (stock_code_customer_counts-1) // 2).sum())
+    co_purchase_matrix = (purchase_matrix @ purchase_matrix.T).tocsr()
+    return (co_purchase_matrix.nnz - np.count_nonzero(co_purchase_matrix.diagonal())) // 2
+
+def benchmark_scale_factor(scale_factor: int) -> None:
+    data_df = clean_data(synthetic_uci_data(scale_factor))
+    purchase_matrix, customer_ids = customer_stock_code_matrix(data_df)
+    print(f'{scale_factor}x synthetic data: {len(data_df)} line items, {len(customer_ids)} customers, {purchase_matrix.shape[1]} stock codes')
+    print(f'    the unweighted projected graph has {"up to " if purchase_matrix.shape[0] > 10_000 else ""}{projected_graph_size(purchase_matrix)} edges')
+    similarity_time, similarity_memory, similarity_matrix = _time_and_trace_call(customer_similarity_matrix, purchase_matrix)
+    print(f'    sparse similarity graph: {similarity_matrix.nnz // 2} edges, {similarity_time:.3f} seconds, {similarity_memory:.3f} GiB peak')
+    louvain_time, louvain_memory, labels = _time_and_trace_call(louvain_communities, similarity_matrix)
+    modularity = community_louvain.modularity(dict(enumerate(labels.tolist())), nx.from_scipy_sparse_array(similarity_matrix.astype(np.float64)))
+    print(f'    Louvain: {labels.max()+1} communities with modularity {modularity:.3f}, {louvain_time:.3f} seconds, {louvain_memory:.3f} GiB peak')
+    return
+
+@debug_on_error
+def main() -> None:
+    scale_factors = [int(scale_factor) for scale_factor in sys.argv[1].split(',')] if len(sys.argv) > 1 else SCALE_FACTORS
+    for scale_factor in scale_factors:
+        benchmark_scale_factor(scale_factor)
+    return
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/python3
+
+"""
+Times the vectorized RFM features (see rfm.py) on a synthetic version of the UCI e-commerce data scaled up 100x,
+and checks them against the old row-wise implementation on a 1x version.
+Also streams a CSV of a 10x version in chunks, serially and in parallel, and checks that gives exactly the in-memory results.
+
+The synthetic data has the UCI data's shape: ~540k line items over ~26k invoices by ~4.4k customers buying ~4k stock codes over a year,
+with a quarter of the line items missing a CustomerID and a few percent being returns with negative quantities.
+When scaled up, every copy gets its own customers, invoices and stock codes. String columns are categoricals so the 100x frame fits in memory.
+"""
+
+###########
+# Imports #
+###########
+
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+from typing import Callable, Tuple
+
+from misc_utilities import debug_on_error
+from rfm import INVOICE_DATE_FORMAT, RAW_DATA_CSV_ENCODING, clean_data, generate_rfm_df, generate_rfm_df_streaming
+
+###########
+# Globals #
+###########
+
+SCALE_FACTOR = 100
+STREAMING_SCALE_FACTOR = 10
+STREAMING_CHUNK_SIZE = 500_000
+
+UCI_NUMBER_OF_LINE_ITEMS = 541_909
+UCI_NUMBER_OF_INVOICES = 25_900
+UCI_NUMBER_OF_CUSTOMERS = 4_372
+UCI_NUMBER_OF_STOCK_CODES = 4_070
+UCI_NUMBER_OF_DAYS = 373
+
+MISSING_CUSTOMER_ID_FRACTION = 0.25
+RETURN_FRACTION = 0.02
+
+##################
+# Synthetic Data #
+##################
+
+def _heavy_tailed_choice(generator: np.random.Generator, number_of_choices: int, size: int) -> np.ndarray:
+    choice_weights = 1.0 / np.arange(1, number_of_choices+1) ** 0.9
+    return generator.choice(number_of_choices, size=size, p=choice_weights/choice_weights.sum())
+
+def synthetic_uci_data(scale_factor: int, seed: int = 0) -> pd.DataFrame:
+    '''Raw (uncleaned) line items with the UCI data's columns.'''
+    generator = np.random.default_rng(seed)
+    number_of_line_items = UCI_NUMBER_OF_LINE_ITEMS * scale_factor
+    number_of_invoices = UCI_NUMBER_OF_INVOICES * scale_factor
+    invoice_ids = np.sort(_heavy_tailed_choice(generator, UCI_NUMBER_OF_INVOICES, number_of_line_items) + UCI_NUMBER_OF_INVOICES * np.repeat(np.arange(scale_factor), UCI_NUMBER_OF_LINE_ITEMS))
+    replica_ids = invoice_ids // UCI_NUMBER_OF_INVOICES
+    invoice_customer_ids = (_heavy_tailed_choice(generator, UCI_NUMBER_OF_CUSTOMERS, number_of_invoices) + UCI_NUMBER_OF_CUSTOMERS * (np.arange(number_of_invoices) // UCI_NUMBER_OF_INVOICES)).astype(float)
+    invoice_customer_ids[generator.random(number_of_invoices) < MISSING_CUSTOMER_ID_FRACTION] = np.nan
+    invoice_minutes = np.sort(generator.integers(0, UCI_NUMBER_OF_DAYS * 24 * 60, number_of_invoices))
+    unique_invoice_minutes, invoice_minute_codes = np.unique(invoice_minutes, return_inverse=True)
+    date_strings = (pd.Timestamp('2010-12-01') + pd.to_timedelta(unique_invoice_minutes, unit='min')).strftime(INVOICE_DATE_FORMAT)
+    stock_code_ids = _heavy_tailed_choice(generator, UCI_NUMBER_OF_STOCK_CODES, number_of_line_items) + UCI_NUMBER_OF_STOCK_CODES * replica_ids
+    quantities = generator.geometric(0.15, number_of_line_items)
+    quantities[generator.random(number_of_line_items) < RETURN_FRACTION] *= -1
+    return pd.DataFrame({
+        'InvoiceNo': pd.Categorical.from_codes(invoice_ids, categories=[str(536365 + invoice_id) for invoice_id in range(number_of_invoices)]),
+        'StockCode': pd.Categorical.from_codes(stock_code_ids, categories=[str(10002 + stock_code_id) for stock_code_id in range(UCI_NUMBER_OF_STOCK_CODES * scale_factor)]),
+        'Quantity': quantities,
+        'InvoiceDate': pd.Categorical.from_codes(invoice_minute_codes[invoice_ids], categories=date_strings),
+        'UnitPrice': np.round(generator.lognormal(0.8, 0.9, number_of_line_items), 2),
+        'CustomerID': invoice_customer_ids[invoice_ids],
+    })
+
+#####################
+# Row-Wise Baseline #
+#####################
+
+def row_wise_rfm_df(data_df: pd.DataFrame) -> pd.DataFrame:
+    '''The RFM features as they used to be computed, i.e. a row-wise apply for the purchase amounts and a map for the recency.'''
+    rfm_df = pd.DataFrame({'CustomerID': data_df.CustomerID.unique()}).set_index('CustomerID')
+    customer_latest_purchase_date_df = data_df.groupby('CustomerID').agg({'InvoiceDate': max}).rename(columns={'InvoiceDate': 'LastPurchaseDate'})
+    rfm_df = rfm_df.join(customer_latest_purchase_date_df, on='CustomerID')
+    latest_date = data_df.InvoiceDate.max()
+    rfm_df['DaysSinceLastPurchase'] = rfm_df.LastPurchaseDate.map(lambda date: (latest_date - date).days)
+    rfm_df.drop(columns=['LastPurchaseDate'], inplace=True)
+    customer_frequency_series = data_df.groupby('CustomerID').InvoiceNo.count()
+    customer_frequency_series.name = 'InvoiceCount'
+    rfm_df = rfm_df.join(customer_frequency_series, on='CustomerID')
+    total_purchase_amount_df = data_df[['CustomerID']].copy()
+    total_purchase_amount_df['InvoicePurchaseAmount'] = data_df.apply(lambda row: row.Quantity * row.UnitPrice, axis=1)
+    overall_purchase_amount_df = total_purchase_amount_df.groupby('CustomerID').agg({'InvoicePurchaseAmount': sum}).rename(columns={'InvoicePurchaseAmount': 'CustomerOverallPurchaseAmount'})
+    rfm_df = rfm_df.join(overall_purchase_amount_df, on='CustomerID')
+    rfm_df.drop(rfm_df[rfm_df.CustomerOverallPurchaseAmount < 0.01].index, inplace=True)
+    return rfm_df
+
+##############
+# Benchmarks #
+##############
+
+def _time_call(func: Callable, *args, **kwargs) -> Tuple[float, object]:
+    start_time = time.time()
+    result = func(*args, **kwargs)
+    end_time = time.time()
+    return end_time - start_time, result
+
+def benchmark_against_row_wise_baseline() -> None:
+    data_df = clean_data(synthetic_uci_data(1))
+    print(f'Row-wise comparison data: {len(data_df)} cleaned line items')
+    vectorized_time, rfm_df = _time_call(generate_rfm_df, data_df)
+    row_wise_time, row_wise_rfm = _time_call(row_wise_rfm_df, data_df)
+    pd.testing.assert_frame_equal(rfm_df, row_wise_rfm, check_dtype=False)
+    print(f'    RFM of {len(rfm_df)} customers: {vectorized_time:.3f} seconds vs {row_wise_time:.3f} seconds row-wise, matching results')
+    return
+
+def benchmark_scaled_up_data(scale_factor: int) -> None:
+    generation_time, raw_data_df = _time_call(synthetic_uci_data, scale_factor)
+    print(f'{scale_factor}x synthetic data: {len(raw_data_df)} line items, {raw_data_df.memory_usage(deep=True).sum() / 2**30:.2f} GiB, generated in {generation_time:.3f} seconds')
+    cleaning_time, data_df = _time_call(clean_data, raw_data_df)
+    del raw_data_df
+    print(f'    cleaning: {cleaning_time:.3f} seconds, {len(data_df)} line items left')
+    rfm_time, rfm_df = _time_call(generate_rfm_df, data_df)
+    print(f'    RFM of {len(rfm_df)} customers: {rfm_time:.3f} seconds')
+    return
+
+def benchmark_streaming(scale_factor: int) -> None:
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        csv_file = os.path.join(temporary_dir, 'data.csv')
+        synthetic_uci_data(scale_factor).to_csv(csv_file, index=False, encoding=RAW_DATA_CSV_ENCODING)
+        print(f'{scale_factor}x synthetic CSV: {os.path.getsize(csv_file) / 2**20:.0f} MiB')
+        in_memory_time, rfm_df = _time_call(lambda: generate_rfm_df(clean_data(pd.read_csv(csv_file, encoding=RAW_DATA_CSV_ENCODING))))
+        print(f'    in memory: {in_memory_time:.3f} seconds')
+        for parallel in (False, True):
+            streaming_time, streamed_rfm_df = _time_call(generate_rfm_df_streaming, csv_file, chunk_size=STREAMING_CHUNK_SIZE, parallel=parallel)
+            pd.testing.assert_frame_equal(streamed_rfm_df, rfm_df, check_exact=True)
+            print(f'    streamed in chunks of {STREAMING_CHUNK_SIZE} line items{" in parallel" if parallel else ""}: {streaming_time:.3f} seconds, exactly the in-memory results')
+    return
+
+@debug_on_error
+def main() -> None:
+    scale_factor = int(sys.argv[1]) if len(sys.argv) > 1 else SCALE_FACTOR
+    benchmark_against_row_wise_baseline()
+    print()
+    benchmark_scaled_up_data(scale_factor)
+    print()
+    benchmark_streaming(STREAMING_SCALE_FACTOR)
+    return
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/python3
+
+"""
+Sparse customer purchase-similarity graphs and their Louvain communities.
+
+With B as the customer-to-stock-code purchase matrix, the similarity of two customers is the (B W B^T) entry of the stock codes they both
+bought, weighted IDF-style by W = diag(log(number of customers / number of customers buying the stock code)). Stock codes bought by more
+than a fraction of all customers are dropped outright. They say next to nothing about similarity, yet each one would add a pair for
+every two of its buyers. That's what made the projected graph of the customer-to-stock-code bipartite graph blow up quadratically.
+
+The product is computed a block of customers at a time, with blocks sized so that each block's product is bounded. Optionally only each
+customer's top k most similar customers are kept from each block before moving on, so memory stays proportional to the number of customers.
+
+The communities come from python-louvain's best_partition on the pruned similarity matrix, whose size is bounded by the pruning above.
+"""
+
+###########
+# Imports #
+###########
+
+import numpy as np
+import pandas as pd
+import scipy.sparse
+import networkx as nx
+import community as community_louvain
+from typing import Tuple
+
+###########
+# Globals #
+###########
+
+# keep only each customer's most similar customers, None keeps them all
+CUSTOMER_SIMILARITY_TOP_K = 50
+
+# stock codes bought by a larger fraction of customers than this are ignored
+MAXIMUM_STOCK_CODE_CUSTOMER_FRACTION = 0.1
+
+# bound on the number of partial products summed for a single block of customers
+MAXIMUM_BLOCK_PRODUCTS = 1 << 24
+
+#####################
+# Similarity Matrix #
+#####################
+
+def customer_stock_code_matrix(data_df: pd.DataFrame) -> Tuple[scipy.sparse.csr_matrix, np.ndarray]:
+    '''Returns the 0/1 customer by stock code purchase matrix and the CustomerID of each row, in order of first appearance.'''
+    customer_codes, customer_ids = pd.factorize(data_df.CustomerID)
+    stock_code_codes, stock_codes = pd.factorize(data_df.StockCode)
+    purchase_matrix = scipy.sparse.csr_matrix((np.ones(len(customer_codes), dtype=np.float32), (customer_codes, stock_code_codes)), shape=(len(customer_ids), len(stock_codes)))
+    purchase_matrix.data[:] = 1
+    return purchase_matrix, np.asarray(customer_ids)
+
+def stock_code_weights(purchase_matrix: scipy.sparse.csr_matrix, maximum_stock_code_customer_fraction: float = MAXIMUM_STOCK_CODE_CUSTOMER_FRACTION) -> np.ndarray:
+    number_of_customers = purchase_matrix.shape[0]
+    stock_code_customer_counts = np.bincount(purchase_matrix.indices, minlength=purchase_matrix.shape[1])
+    weights = np.log(number_of_customers / np.maximum(stock_code_customer_counts, 1))
+    weights[stock_code_customer_counts > maximum_stock_code_customer_fraction * number_of_customers] = 0
+    return weights
+
+def _block_boundaries(row_products: np.ndarray, maximum_block_products: int) -> np.ndarray:
+    '''Splits the rows into consecutive blocks of at most maximum_block_products products each (or a single row if that's already more).'''
+    cumulative_row_products = np.concatenate([[0], np.cumsum(row_products)])
+    boundaries = [0]
+    while boundaries[-1] < len(row_products):
+        block_end = np.searchsorted(cumulative_row_products, cumulative_row_products[boundaries[-1]] + maximum_block_products, side='right') - 1
+        boundaries.append(max(block_end, boundaries[-1] + 1))
+    return np.array(boundaries)
+
+def _top_k_per_row(matrix: scipy.sparse.csr_matrix, k: int) -> scipy.sparse.csr_matrix:
+    row_lengths = np.diff(matrix.indptr)
+    if k is None or row_lengths.max(initial=0) <= k:
+        return matrix
+    rows = np.repeat(np.arange(matrix.shape[0]), row_lengths)
+    # stable sort by row then by decreasing value so ties go to the lowest column
+    order = np.lexsort((-matrix.data, rows))
+    ranks_within_row = np.arange(len(order)) - matrix.indptr[rows[order]]
+    kept = order[ranks_within_row < k]
+    return scipy.sparse.csr_matrix((matrix.data[kept], (rows[kept], matrix.indices[kept])), shape=matrix.shape)
+
+def customer_similarity_matrix(purchase_matrix: scipy.sparse.csr_matrix, top_k: int = CUSTOMER_SIMILARITY_TOP_K,
+                               maximum_stock_code_customer_fraction: float = MAXIMUM_STOCK_CODE_CUSTOMER_FRACTION,
+                               maximum_block_products: int = MAXIMUM_BLOCK_PRODUCTS) -> scipy.sparse.csr_matrix:
+    '''Symmetric with an empty diagonal. With top_k, two customers are similar if either is among the other's top_k.'''
+    number_of_customers = purchase_matrix.shape[0]
+    weights = stock_code_weights(purchase_matrix, maximum_stock_code_customer_fraction)
+    kept_stock_codes = np.flatnonzero(weights > 0)
+    purchase_matrix = purchase_matrix[:, kept_stock_codes].tocsr()
+    weighted_purchase_matrix = (purchase_matrix @ scipy.sparse.diags(weights[kept_stock_codes].astype(np.float32))).tocsr()
+    purchase_matrix_transpose = purchase_matrix.T.tocsr()
+    stock_code_customer_counts = np.diff(purchase_matrix_transpose.indptr)
+    row_products = purchase_matrix @ stock_code_customer_counts
+    block_boundaries = _block_boundaries(row_products, maximum_block_products)
+    similarity_blocks = []
+    for block_start, block_end in zip(block_boundaries[:-1], block_boundaries[1:]):
+        similarity_block = (weighted_purchase_matrix[block_start:block_end] @ purchase_matrix_transpose).tocoo()
+        off_diagonal_mask = similarity_block.col != similarity_block.row + block_start
+        similarity_block = scipy.sparse.csr_matrix((similarity_block.data[off_diagonal_mask], (similarity_block.row[off_diagonal_mask], similarity_block.col[off_diagonal_mask])), shape=similarity_block.shape)
+        similarity_blocks.append(_top_k_per_row(similarity_block, top_k))
+    similarity_matrix = scipy.sparse.vstack(similarity_blocks, format='csr') if len(similarity_blocks) > 0 else scipy.sparse.csr_matrix((number_of_customers, number_of_customers), dtype=np.float32)
+    if top_k is not None:
+        similarity_matrix = similarity_matrix.maximum(similarity_matrix.T).tocsr()
+    return similarity_matrix
+
+###########
+# Louvain #
+###########
+
+def _relabel_by_first_appearance(labels: np.ndarray) -> np.ndarray:
+    '''Renumbers labels as 0, 1, 2, ... in the order they first appear.'''
+    _, first_positions, inverse = np.unique(labels, return_index=True, return_inverse=True)
+    return np.argsort(np.argsort(first_positions))[inverse]
+
+def louvain_communities(adjacency_matrix: scipy.sparse.csr_matrix, resolution: float = 1.0, seed: int = 0) -> np.ndarray:
+    '''Returns the community label of each node of the weighted symmetric adjacency_matrix, numbered in order of first appearance.'''
+    number_of_nodes = adjacency_matrix.shape[0]
+    if number_of_nodes == 0 or adjacency_matrix.nnz == 0:
+        return np.arange(number_of_nodes)
+    graph = nx.from_scipy_sparse_array(adjacency_matrix.astype(np.float64))
+    node_to_label_map = community_louvain.best_partition(graph, resolution=resolution, random_state=seed)
+    return _relabel_by_first_appearance(np.array([node_to_label_map[node] for node in range(number_of_nodes)]))
+
+#############
+# Top-Level #
+#############
+
+def generate_customer_similarity_labels(data_df: pd.DataFrame, top_k: int = CUSTOMER_SIMILARITY_TOP_K,
+                                        maximum_stock_code_customer_fraction: float = MAXIMUM_STOCK_CODE_CUSTOMER_FRACTION) -> pd.DataFrame:
+    '''Indexed by CustomerID with a community_label column. Customers with no similar customers get a community of their own.'''
+    purchase_matrix, customer_ids = customer_stock_code_matrix(data_df)
+    similarity_matrix = customer_similarity_matrix(purchase_matrix, top_k=top_k, maximum_stock_code_customer_fraction=maximum_stock_code_customer_fraction)
+    labels = louvain_communities(similarity_matrix)
+    return pd.DataFrame({'community_label': labels}, index=pd.Index(customer_ids, name='CustomerID'))
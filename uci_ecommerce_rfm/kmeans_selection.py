@@ -0,0 +1,147 @@
+#!/usr/bin/python3
+
+"""
+Choosing the number of KMeans clusters for a feature matrix.
+
+Every cluster count is fitted in parallel. Large feature matrices are fitted with mini-batch KMeans. Each fit is scored by its silhouette.
+The exact silhouette is quadratic in the number of points, so above a sample size it's estimated as the mean over several random samples,
+with a normal confidence interval for that mean.
+
+Results are cached on disk keyed by a hash of the feature matrix and the fitting parameters, so rerunning on the same data (e.g. to redo
+the plots) doesn't refit anything.
+"""
+
+###########
+# Imports #
+###########
+
+import os
+import hashlib
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+from typing import NamedTuple, Tuple, Dict, Iterable
+
+from misc_utilities import parallel_map
+
+###########
+# Globals #
+###########
+
+KMEANS_CACHE_DIR = './kmeans_cache/'
+# part of the cache key, bump it when the results of the fitting or scoring code change
+KMEANS_CACHE_VERSION = 2
+
+KMEANS_NUMBER_OF_INITIALIZATIONS = 10
+
+# feature matrices with at least this many points are fitted with mini-batch KMeans
+MINI_BATCH_KMEANS_MINIMUM_NUMBER_OF_POINTS = 10_000
+MINI_BATCH_KMEANS_BATCH_SIZE = 4_096
+
+# above this many points the silhouette is estimated from SILHOUETTE_NUMBER_OF_SAMPLES samples of this many points
+SILHOUETTE_SAMPLE_SIZE = 2_000
+SILHOUETTE_NUMBER_OF_SAMPLES = 10
+# z-score of the normal confidence intervals of the estimates, i.e. 95%
+SILHOUETTE_CONFIDENCE_Z_SCORE = 1.96
+
+##############
+# Clustering #
+##############
+
+class KMeansResult(NamedTuple):
+    cluster_count: int
+    labels: np.ndarray
+    inertia: float
+    silhouette_score: float
+    silhouette_confidence_interval: Tuple[float, float]
+
+def fit_kmeans(features: np.ndarray, cluster_count: int, seed: int = 0) -> Tuple[np.ndarray, float]:
+    '''Returns the cluster labels and inertia.'''
+    if len(features) >= MINI_BATCH_KMEANS_MINIMUM_NUMBER_OF_POINTS:
+        kmeans = MiniBatchKMeans(n_clusters=cluster_count, init='k-means++', n_init=KMEANS_NUMBER_OF_INITIALIZATIONS, batch_size=MINI_BATCH_KMEANS_BATCH_SIZE, random_state=seed)
+    else:
+        kmeans = KMeans(n_clusters=cluster_count, init='k-means++', n_init=KMEANS_NUMBER_OF_INITIALIZATIONS, random_state=seed)
+    labels = kmeans.fit_predict(features)
+    return labels, float(kmeans.inertia_)
+
+def sampled_silhouette_score(features: np.ndarray, labels: np.ndarray, seed: int = 0) -> Tuple[float, Tuple[float, float]]:
+    '''Returns the silhouette score and its confidence interval, which is a single point when the score is exact.'''
+    if len(features) <= SILHOUETTE_SAMPLE_SIZE:
+        score = float(silhouette_score(features, labels))
+        return score, (score, score)
+    random_generator = np.random.default_rng(seed)
+    scores = []
+    for _ in range(SILHOUETTE_NUMBER_OF_SAMPLES):
+        sample_indices = random_generator.choice(len(features), size=SILHOUETTE_SAMPLE_SIZE, replace=False)
+        # a sample can miss all but one cluster, which has no silhouette
+        if len(np.unique(labels[sample_indices])) > 1:
+            scores.append(silhouette_score(features[sample_indices], labels[sample_indices]))
+    # e.g. when nearly every point is in one cluster
+    if len(scores) == 0:
+        score = float(silhouette_score(features, labels))
+        return score, (score, score)
+    score = float(np.mean(scores))
+    half_width = SILHOUETTE_CONFIDENCE_Z_SCORE * float(np.std(scores, ddof=1) / np.sqrt(len(scores))) if len(scores) > 1 else 0.0
+    return score, (score - half_width, score + half_width)
+
+def kmeans_result(features: np.ndarray, cluster_count: int, seed: int = 0) -> KMeansResult:
+    labels, inertia = fit_kmeans(features, cluster_count, seed)
+    score, confidence_interval = sampled_silhouette_score(features, labels, seed)
+    return KMeansResult(cluster_count, labels, inertia, score, confidence_interval)
+
+def _kmeans_result_for_arguments(arguments: Tuple[np.ndarray, int, int]) -> KMeansResult:
+    return kmeans_result(*arguments)
+
+#########
+# Cache #
+#########
+
+def feature_matrix_key(features: np.ndarray, seed: int) -> str:
+    '''Hash of the features and everything else a fit depends on.'''
+    features = np.ascontiguousarray(features)
+    hasher = hashlib.sha1()
+    hasher.update(repr((KMEANS_CACHE_VERSION, features.shape, features.dtype.str, seed, KMEANS_NUMBER_OF_INITIALIZATIONS, MINI_BATCH_KMEANS_MINIMUM_NUMBER_OF_POINTS, MINI_BATCH_KMEANS_BATCH_SIZE,
+                        SILHOUETTE_SAMPLE_SIZE, SILHOUETTE_NUMBER_OF_SAMPLES, SILHOUETTE_CONFIDENCE_Z_SCORE)).encode('utf-8'))
+    hasher.update(features.tobytes())
+    return hasher.hexdigest()
+
+def _cache_file(cache_dir: str, key: str, cluster_count: int) -> str:
+    return os.path.join(cache_dir, f'{key}_{cluster_count}.npz')
+
+def _read_cached_kmeans_result(cache_file: str) -> KMeansResult:
+    with np.load(cache_file) as cached_arrays:
+        return KMeansResult(int(cached_arrays['cluster_count']), cached_arrays['labels'], float(cached_arrays['inertia']),
+                            float(cached_arrays['silhouette_score']), tuple(cached_arrays['silhouette_confidence_interval'].tolist()))
+
+def _write_cached_kmeans_result(cache_file: str, result: KMeansResult) -> None:
+    temporary_cache_file = f'{cache_file}.{os.getpid()}.tmp'
+    with open(temporary_cache_file, 'wb') as f:
+        np.savez(f, cluster_count=result.cluster_count, labels=result.labels, inertia=result.inertia,
+                 silhouette_score=result.silhouette_score, silhouette_confidence_interval=np.array(result.silhouette_confidence_interval))
+    os.replace(temporary_cache_file, cache_file)
+    return
+
+#############
+# Selection #
+#############
+
+def select_kmeans_models(features: np.ndarray, cluster_counts: Iterable[int], cache_dir: str = KMEANS_CACHE_DIR, seed: int = 0) -> Dict[int, KMeansResult]:
+    '''Fits the cluster counts that aren't cached yet in parallel and returns the results of all of them by cluster count.'''
+    os.makedirs(cache_dir, exist_ok=True)
+    key = feature_matrix_key(features, seed)
+    cluster_count_to_result_map: Dict[int, KMeansResult] = dict()
+    uncached_cluster_counts = []
+    for cluster_count in cluster_counts:
+        cache_file = _cache_file(cache_dir, key, cluster_count)
+        if os.path.isfile(cache_file):
+            cluster_count_to_result_map[cluster_count] = _read_cached_kmeans_result(cache_file)
+        else:
+            uncached_cluster_counts.append(cluster_count)
+    results = parallel_map(_kmeans_result_for_arguments, [(features, cluster_count, seed) for cluster_count in uncached_cluster_counts], chunksize=1) if len(uncached_cluster_counts) > 0 else []
+    for result in results:
+        _write_cached_kmeans_result(_cache_file(cache_dir, key, result.cluster_count), result)
+        cluster_count_to_result_map[result.cluster_count] = result
+    return dict(sorted(cluster_count_to_result_map.items()))
+
+def best_kmeans_result(cluster_count_to_result_map: Dict[int, KMeansResult]) -> KMeansResult:
+    return max(cluster_count_to_result_map.values(), key=lambda result: result.silhouette_score)
@@ -10,28 +10,24 @@
 ###########
 
 import math
-import tqdm
 import matplotlib.cm
+import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
 import numpy as np
-import networkx as nx
-import community as community_louvain
 from sklearn.preprocessing import StandardScaler
 from sklearn.decomposition import PCA
-from sklearn.cluster import KMeans
-from sklearn.metrics import silhouette_score
-from typing import Tuple
+from typing import Tuple, Dict
 
 from misc_utilities import *
+from rfm import clean_data, generate_rfm_df
+from customer_similarity import generate_customer_similarity_labels
+from kmeans_selection import KMeansResult, select_kmeans_models, best_kmeans_result
 
 ###########
 # Globals #
 ###########
 
-with warnings_suppressed():
-    tqdm.tqdm.pandas()
-
 MAX_NUMBER_OF_CLUSTERS_TO_TRY = 15
 
 # https://www.kaggle.com/carrie1/ecommerce-data
@@ -42,153 +38,110 @@ RFM_PAIR_PLOT_VISUALIZATION_WITH_CLUSTERS_OUTPUT_PNG_FILE_LOCATION_TEMPLATE = '.
 RFM_CLUSTER_SILHOUETTE_SCORE_OUPUT_PNG_FILE_LOCATION = './rfm_silhouette_scores.png'
 CUSTOMER_SIMILARITY_LABEL_OUTPUT_PNG_FILE_LOCATION = './customer_similarity_communities.png'
 CUSTOMER_SIMILARITY_LABEL_PAIR_PLOT_OUTPUT_PNG_FILE_LOCATION = './customer_similarity_pair_plot.png'
+CLUSTER_COMMUNITY_CONTINGENCY_OUTPUT_CSV_FILE_LOCATION = './cluster_community_contingency.csv'
 
 ###################
 # Data Processing #
 ###################
 
-def clean_data(data_df: pd.DataFrame) -> pd.DataFrame:
-    data_df.InvoiceDate = pd.to_datetime(data_df.InvoiceDate, format="%m/%d/%Y %H:%M")
-    data_df.drop(data_df.index[data_df.CustomerID != data_df.CustomerID], inplace=True)
-    data_df = data_df.astype({'CustomerID': int}, copy=False)
-    assert len(data_df[data_df.isnull().any(axis=1)])==0, "Raw data contains NaN"
-    return data_df
-
-def append_last_purchase_date_data(rfm_df: pd.DataFrame, data_df: pd.DataFrame) -> pd.DataFrame:
-    customer_latest_purchse_date_df = data_df.groupby('CustomerID').agg({'InvoiceDate': max}).rename(columns={'InvoiceDate': 'LastPurchaseDate'})
-    rfm_df = rfm_df.join(customer_latest_purchse_date_df, on='CustomerID')
-    latest_date = data_df.InvoiceDate.max()
-    rfm_df['DaysSinceLastPurchase'] = rfm_df.LastPurchaseDate.progress_map(lambda date: (latest_date - date).days)
-    rfm_df.drop(columns=['LastPurchaseDate'], inplace=True)
-    return rfm_df
-
-def append_invoice_count_data(rfm_df: pd.DataFrame, data_df: pd.DataFrame) -> pd.DataFrame:
-    customer_frequency_series = data_df.groupby('CustomerID').InvoiceNo.count()
-    customer_frequency_series.name = 'InvoiceCount'
-    rfm_df = rfm_df.join(customer_frequency_series, on='CustomerID')
-    return rfm_df
-
-def append_overall_purchase_amount_data(rfm_df: pd.DataFrame, data_df: pd.DataFrame) -> pd.DataFrame:
-    total_purchase_amount_series = data_df.apply(lambda row: row.Quantity * row.UnitPrice, axis=1)
-    total_purchase_amount_df = data_df[['CustomerID']].copy()
-    total_purchase_amount_df['InvoicePurchaseAmount'] = total_purchase_amount_series
-    overall_purchase_amount_df = total_purchase_amount_df.groupby('CustomerID').agg({'InvoicePurchaseAmount': sum}).rename(columns={'InvoicePurchaseAmount': 'CustomerOverallPurchaseAmount'})
-    rfm_df = rfm_df.join(overall_purchase_amount_df, on='CustomerID')
-    return rfm_df
-
-def generate_rfm_df(data_df: pd.DataFrame) -> pd.DataFrame:
-    rfm_df = pd.DataFrame({'CustomerID': data_df.CustomerID.unique()}).set_index('CustomerID')
-    print('Calculating recency data.')
-    rfm_df = append_last_purchase_date_data(rfm_df, data_df)
-    print('Calculating frequency data.')
-    rfm_df = append_invoice_count_data(rfm_df, data_df)
-    print('Calculating monetary data.')
-    rfm_df = append_overall_purchase_amount_data(rfm_df, data_df)
-    rfm_df.drop(rfm_df[rfm_df.CustomerOverallPurchaseAmount < 0.01].index, inplace=True)
-    assert len(rfm_df[rfm_df.DaysSinceLastPurchase < 0]) == 0
-    assert len(rfm_df[rfm_df.InvoiceCount <= 0]) == 0
-    assert len(rfm_df[rfm_df.CustomerOverallPurchaseAmount <= 0]) == 0
-    return rfm_df
-
 def generate_customer_similarity_labels_via_louvain(data_df: pd.DataFrame) -> pd.DataFrame:
-    print('Creating bipartite customer-to-product graph.')
-    bipartite_graph = nx.from_pandas_edgelist(data_df, 'CustomerID', 'StockCode')
-    print('Creating customer similarity graph.')
-    customer_similarity_graph = nx.projected_graph(bipartite_graph, data_df.CustomerID.unique())
-    print('Determining Louvain communities.')
-    customer_id_to_label = community_louvain.best_partition(customer_similarity_graph)
-    custom_label_df = pd.DataFrame.from_dict(customer_id_to_label, orient='index', columns=['community_label'])
-    return custom_label_df
+    print('Creating sparse customer similarity graph & determining Louvain communities.')
+    return generate_customer_similarity_labels(data_df)
 
 ##################
 # Visualize Data #
 ##################
 
-def visualize_rfm_pca_and_kmeans(rfm_visualization_df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, dict]:
+def visualize_rfm_pca_and_kmeans(rfm_visualization_df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, Dict[int, KMeansResult]]:
+    '''Fits every cluster count first (see kmeans_selection.py), then renders the plots. The ClusterLabel column gets the best cluster count's labels.'''
+    rfm_np = StandardScaler().fit_transform(rfm_visualization_df.to_numpy())
+    rfm_np_2_dim = PCA(n_components=2).fit_transform(rfm_np)
+    print('Fitting KMeans clusters.')
+    cluster_count_to_kmeans_result_map = select_kmeans_models(rfm_np, range(2, MAX_NUMBER_OF_CLUSTERS_TO_TRY+1))
     print('Visualizing principal components.')
-    rfm_np = rfm_visualization_df.to_numpy()
-    scaler = StandardScaler(copy=False)
-    scaler.fit(rfm_np)
-    rfm_np = scaler.transform(rfm_np)
-    pca = PCA(n_components=2, copy=False)
-    pca.fit(rfm_np)
-    rfm_np_2_dim = pca.transform(rfm_np)
-    cluster_label_to_silhouette_score = {}
-    for cluster_count in tqdm_with_message(range(2, MAX_NUMBER_OF_CLUSTERS_TO_TRY+1), post_yield_message_func=lambda index: f'Visualizing {cluster_count} clusters'):
-        kmeans = KMeans(init='k-means++', n_clusters=cluster_count, n_init=100)
-        labels = kmeans.fit_predict(rfm_np)
-        with temp_plt_figure(figsize=(20.0,10.0)) as figure:
-            plot = figure.add_subplot(111)
-            plot.axvline(c='grey', lw=1, ls='--', alpha=0.5)
-            plot.axhline(c='grey', lw=1, ls='--', alpha=0.5)
-            cluster_label_to_color_map = matplotlib.cm.rainbow(np.linspace(0, 1, cluster_count))
-            cluster_label_to_color_map = dict(enumerate(cluster_label_to_color_map))
-            colors = np.array([cluster_label_to_color_map[label] for label in labels])
-            plot.scatter(rfm_np_2_dim[:,0], rfm_np_2_dim[:,1], c=colors, alpha=0.25)
-            silhouette_score_value = silhouette_score(rfm_np, labels)
-            cluster_label_to_silhouette_score[cluster_count] = silhouette_score_value
-            plot.set_title(f'RFM PCA Visualization with 2 Principal Components and {cluster_count} Clusters (Silhouette Score of {silhouette_score_value})')
-            plot.set_xlabel('PCA 1')
-            plot.set_ylabel('PCA 2')
+    with temp_plt_figure(figsize=(20.0,10.0)) as figure:
+        plot = figure.add_subplot(111)
+        plot.axvline(c='grey', lw=1, ls='--', alpha=0.5)
+        plot.axhline(c='grey', lw=1, ls='--', alpha=0.5)
+        plot.set_xlabel('PCA 1')
+        plot.set_ylabel('PCA 2')
+        scatter = plot.scatter(rfm_np_2_dim[:,0], rfm_np_2_dim[:,1], alpha=0.25)
+        for cluster_count, kmeans_result in cluster_count_to_kmeans_result_map.items():
+            scatter.set_facecolor(matplotlib.cm.rainbow(np.linspace(0, 1, cluster_count))[kmeans_result.labels])
+            confidence_interval_lower_bound, confidence_interval_upper_bound = kmeans_result.silhouette_confidence_interval
+            plot.set_title(f'RFM PCA Visualization with 2 Principal Components and {cluster_count} Clusters '
+                           f'(Silhouette Score of {kmeans_result.silhouette_score:.4f}, 95% CI [{confidence_interval_lower_bound:.4f}, {confidence_interval_upper_bound:.4f}])')
             figure.savefig(RFM_PCA_VISUALIZATION_WITH_CLUSTERS_OUTPUT_PNG_FILE_LOCATION_TEMPLATE.format(cluster_count=cluster_count))
-            rfm_visualization_df['ClusterLabel'] = pd.Series({customer_id: label for (customer_id, label) in zip(rfm_visualization_df.index, labels)})
-            pairplot = sns.pairplot(rfm_visualization_df, hue='ClusterLabel', palette=cluster_label_to_color_map, height=4.0)
-            pairplot.fig.suptitle(f'Log RFM Pairplot with {cluster_count} Clusters', y=1.04)
-            pairplot._legend.remove()
-            pairplot.savefig(RFM_PAIR_PLOT_VISUALIZATION_WITH_CLUSTERS_OUTPUT_PNG_FILE_LOCATION_TEMPLATE.format(cluster_count=cluster_count))
-    return rfm_np, rfm_np_2_dim, cluster_label_to_silhouette_score
-
-def visualize_silhouette_scores(rfm_np: np.ndarray, cluster_label_to_silhouette_score: dict) -> None:
+    print('Visualizing pair plots.')
+    for cluster_count, kmeans_result in cluster_count_to_kmeans_result_map.items():
+        cluster_label_to_color_map = dict(enumerate(matplotlib.cm.rainbow(np.linspace(0, 1, cluster_count))))
+        pairplot = sns.pairplot(rfm_visualization_df.assign(ClusterLabel=kmeans_result.labels), hue='ClusterLabel', palette=cluster_label_to_color_map, height=4.0)
+        pairplot.fig.suptitle(f'Log RFM Pairplot with {cluster_count} Clusters', y=1.04)
+        pairplot._legend.remove()
+        pairplot.savefig(RFM_PAIR_PLOT_VISUALIZATION_WITH_CLUSTERS_OUTPUT_PNG_FILE_LOCATION_TEMPLATE.format(cluster_count=cluster_count))
+        plt.close(pairplot.fig)
+    best_result = best_kmeans_result(cluster_count_to_kmeans_result_map)
+    print(f'Using the best cluster count ({best_result.cluster_count} clusters) as the KMeans clusters.')
+    rfm_visualization_df['ClusterLabel'] = best_result.labels
+    return rfm_np, rfm_np_2_dim, cluster_count_to_kmeans_result_map
+
+def visualize_silhouette_scores(cluster_count_to_kmeans_result_map: Dict[int, KMeansResult]) -> None:
     print('Visualizing Silhouette scores.')
     with temp_plt_figure(figsize=(20.0,10.0)) as figure:
         plot = figure.add_subplot(111)
         plot.set_title(f'Silhouette Scores')
         plot.set_xlabel('Cluster Count')
         plot.set_ylabel('Silhouette Score')
-        cluster_counts, silhouette_scores = zip(*sorted(cluster_label_to_silhouette_score.items(), key=lambda pair: pair[0]))
+        cluster_counts = list(cluster_count_to_kmeans_result_map.keys())
+        silhouette_scores = [kmeans_result.silhouette_score for kmeans_result in cluster_count_to_kmeans_result_map.values()]
+        confidence_interval_lower_bounds, confidence_interval_upper_bounds = zip(*(kmeans_result.silhouette_confidence_interval for kmeans_result in cluster_count_to_kmeans_result_map.values()))
         plot.plot(cluster_counts, silhouette_scores, '-')
+        plot.fill_between(cluster_counts, confidence_interval_lower_bounds, confidence_interval_upper_bounds, alpha=0.25)
         plot.set_xlim(left=0, right=MAX_NUMBER_OF_CLUSTERS_TO_TRY+1)
-        silhouette_y_axis_upper_bound = math.ceil(max(cluster_label_to_silhouette_score.values()) * 1.1 * 100) / 100
+        silhouette_y_axis_upper_bound = math.ceil(max(confidence_interval_upper_bounds) * 1.1 * 100) / 100
         plot.set_ylim(bottom=0.0, top=silhouette_y_axis_upper_bound)
         y_tick_delta = 0.05
         plot.set_yticks(np.arange(0, silhouette_y_axis_upper_bound+y_tick_delta, step=y_tick_delta))
-        plot.set_xticks(range(max(cluster_label_to_silhouette_score.keys())+2))
+        plot.set_xticks(range(max(cluster_counts)+2))
         plot.grid(True)
         figure.savefig(RFM_CLUSTER_SILHOUETTE_SCORE_OUPUT_PNG_FILE_LOCATION)
     return 
 
 def visualize_cluster_similarity_communities(rfm_np_2_dim: np.ndarray, customer_louvain_community_label_df: pd.DataFrame, rfm_visualization_df: pd.DataFrame) -> None:
+    '''rfm_visualization_df's ClusterLabel column has the KMeans cluster of each customer, its rows line up with those of rfm_np_2_dim.'''
     print('Visualizing customer purchase-similarity communities.')
+    cluster_community_df = rfm_visualization_df[['ClusterLabel']].join(customer_louvain_community_label_df, how='left', validate='one_to_one')
+    assert not cluster_community_df.community_label.isnull().any(), "Customers are missing a community label"
+    community_labels = cluster_community_df.community_label.to_numpy()
+    pd.crosstab(cluster_community_df.ClusterLabel, cluster_community_df.community_label).to_csv(CLUSTER_COMMUNITY_CONTINGENCY_OUTPUT_CSV_FILE_LOCATION)
+    community_label_values, community_label_codes = np.unique(community_labels, return_inverse=True)
+    number_of_communities = len(community_label_values)
+    community_colors = matplotlib.cm.rainbow(np.linspace(0, 1, number_of_communities))
     with temp_plt_figure(figsize=(20.0,10.0)) as figure:
         plot = figure.add_subplot(111)
         plot.axvline(c='grey', lw=1, ls='--', alpha=0.5)
         plot.axhline(c='grey', lw=1, ls='--', alpha=0.5)
-        number_of_communities = len(customer_louvain_community_label_df.community_label.unique())
-        cluster_label_to_color_map = matplotlib.cm.rainbow(np.linspace(0, 1, number_of_communities))
-        cluster_label_to_color_map = dict(enumerate(cluster_label_to_color_map))
-        labels = [customer_louvain_community_label_df.loc[customer_id].community_label for customer_id in rfm_visualization_df.index]
-        colors = np.array([cluster_label_to_color_map[label] for label in labels])
-        plot.scatter(rfm_np_2_dim[:,0], rfm_np_2_dim[:,1], c=colors, alpha=0.25)
+        plot.scatter(rfm_np_2_dim[:,0], rfm_np_2_dim[:,1], c=community_colors[community_label_codes], alpha=0.25)
         plot.set_title(f'Customer Purchase-Similarity Communities via Louvain ({number_of_communities} Communities)')
         plot.set_xlabel('PCA 1')
         plot.set_ylabel('PCA 2')
         figure.savefig(CUSTOMER_SIMILARITY_LABEL_OUTPUT_PNG_FILE_LOCATION)
-        rfm_visualization_df['ClusterLabel'] = pd.Series({customer_id: label for (customer_id, label) in zip(rfm_visualization_df.index, labels)})
-        pairplot = sns.pairplot(rfm_visualization_df, hue='ClusterLabel', palette=cluster_label_to_color_map, height=4.0)
-        pairplot.fig.suptitle(f'Log RFM Pairplot with {len(labels)} Purchase Communities', y=1.04)
-        pairplot._legend.remove()
-        pairplot.savefig(CUSTOMER_SIMILARITY_LABEL_PAIR_PLOT_OUTPUT_PNG_FILE_LOCATION.format(cluster_count=len(labels)))
+    pairplot_df = rfm_visualization_df.drop(columns=['ClusterLabel']).assign(CommunityLabel=community_label_codes)
+    pairplot = sns.pairplot(pairplot_df, hue='CommunityLabel', palette=dict(enumerate(community_colors)), height=4.0)
+    pairplot.fig.suptitle(f'Log RFM Pairplot with {number_of_communities} Purchase Communities', y=1.04)
+    pairplot._legend.remove()
+    pairplot.savefig(CUSTOMER_SIMILARITY_LABEL_PAIR_PLOT_OUTPUT_PNG_FILE_LOCATION)
     return
 
 def visualize_rfm(rfm_df: pd.DataFrame, customer_louvain_community_label_df: pd.DataFrame) -> None:
     rfm_visualization_df = rfm_df.copy()
     rfm_visualization_df.rename(columns={'DaysSinceLastPurchase': 'recency', 'InvoiceCount': 'frequency', 'CustomerOverallPurchaseAmount': 'monetary'}, inplace=True)
     print('Normalizing RFM data.')
-    rfm_visualization_df.recency = rfm_visualization_df.recency.progress_map(lambda number_of_days_since_last_purchase: 1+number_of_days_since_last_purchase)
-    rfm_visualization_df = rfm_visualization_df.progress_apply(np.log10)
+    rfm_visualization_df.recency += 1
+    rfm_visualization_df = np.log10(rfm_visualization_df)
     assert len(rfm_visualization_df[rfm_visualization_df.isnull().any(axis=1)])==0, "RFM data contains NaN"
-    rfm_np, rfm_np_2_dim, cluster_label_to_silhouette_score = visualize_rfm_pca_and_kmeans(rfm_visualization_df)
-    visualize_silhouette_scores(rfm_np, cluster_label_to_silhouette_score)
+    rfm_np, rfm_np_2_dim, cluster_count_to_kmeans_result_map = visualize_rfm_pca_and_kmeans(rfm_visualization_df)
+    visualize_silhouette_scores(cluster_count_to_kmeans_result_map)
     visualize_cluster_similarity_communities(rfm_np_2_dim, customer_louvain_community_label_df, rfm_visualization_df)
     return
 
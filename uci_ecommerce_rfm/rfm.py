@@ -0,0 +1,135 @@
+#!/usr/bin/python3
+
+"""
+Recency, frequency & monetary (RFM) features of the customers in the UCI e-commerce data.
+
+Everything is column arithmetic on whole columns followed by a single groupby over the customers, so the cost is a few passes over
+the transactions regardless of how many customers there are.
+
+The groupby produces per-customer accumulators (last purchase date, line item count and total spend) along with the latest date seen.
+Accumulators of consecutive pieces of the transactions merge into the accumulator of the whole, so transaction files larger than memory
+can be streamed in chunks, possibly accumulated by parallel workers, and merged as they come in. Spend is accumulated as an integer
+number of millionths of a currency unit, which makes merging exact, so streaming gives exactly the same RFM data as doing it all in memory.
+"""
+
+###########
+# Imports #
+###########
+
+import os
+import itertools
+import numpy as np
+import pandas as pd
+from typing import NamedTuple, Iterable, Generator
+
+from misc_utilities import parallel_map
+
+###########
+# Globals #
+###########
+
+INVOICE_DATE_FORMAT = "%m/%d/%Y %H:%M"
+
+RAW_DATA_CSV_ENCODING = "ISO-8859-1"
+RAW_DATA_RFM_COLUMNS = ['InvoiceNo', 'Quantity', 'InvoiceDate', 'UnitPrice', 'CustomerID']
+RAW_DATA_CHUNK_SIZE = 1_000_000
+
+RFM_COLUMNS = ['DaysSinceLastPurchase', 'InvoiceCount', 'CustomerOverallPurchaseAmount']
+
+# spend is accumulated in millionths so that it sums exactly, which holds as long as unit prices have at most 6 decimal places
+MONETARY_FIXED_POINT_SCALE = 1_000_000
+
+MINIMUM_CUSTOMER_OVERALL_PURCHASE_AMOUNT = 0.01
+
+############
+# Cleaning #
+############
+
+def parse_invoice_dates(invoice_date_series: pd.Series) -> pd.Series:
+    '''Invoices share a handful of timestamps, so only the distinct date strings are parsed.'''
+    date_codes, unique_date_strings = pd.factorize(invoice_date_series)
+    unique_dates = pd.to_datetime(unique_date_strings, format=INVOICE_DATE_FORMAT).to_numpy()
+    return pd.Series(unique_dates[date_codes], index=invoice_date_series.index, name=invoice_date_series.name)
+
+def clean_data(data_df: pd.DataFrame) -> pd.DataFrame:
+    data_df = data_df.dropna(subset=['CustomerID'])
+    data_df = data_df.assign(InvoiceDate=parse_invoice_dates(data_df.InvoiceDate), CustomerID=data_df.CustomerID.astype(int))
+    assert not data_df.isnull().to_numpy().any(), "Raw data contains NaN"
+    return data_df
+
+################
+# Accumulators #
+################
+
+class RFMAccumulator(NamedTuple):
+    # indexed by CustomerID in order of first appearance with LastPurchaseDate, InvoiceCount and PurchaseAmountMillionths columns
+    customer_df: pd.DataFrame
+    latest_date: pd.Timestamp
+
+def purchase_amount_millionths(data_df: pd.DataFrame) -> np.ndarray:
+    unit_price_millionths = np.round(data_df.UnitPrice.to_numpy(dtype=float) * MONETARY_FIXED_POINT_SCALE).astype(np.int64)
+    assert (unit_price_millionths / MONETARY_FIXED_POINT_SCALE == data_df.UnitPrice.to_numpy(dtype=float)).all(), "Unit prices have more than 6 decimal places"
+    return data_df.Quantity.to_numpy(dtype=np.int64) * unit_price_millionths
+
+def accumulate_rfm(data_df: pd.DataFrame) -> RFMAccumulator:
+    '''data_df has to be cleaned already.'''
+    customer_df = data_df[['CustomerID', 'InvoiceDate', 'InvoiceNo']].assign(PurchaseAmountMillionths=purchase_amount_millionths(data_df))
+    customer_df = customer_df.groupby('CustomerID', sort=False).agg(LastPurchaseDate=('InvoiceDate', 'max'),
+                                                                   InvoiceCount=('InvoiceNo', 'count'),
+                                                                   PurchaseAmountMillionths=('PurchaseAmountMillionths', 'sum'))
+    return RFMAccumulator(customer_df, data_df.InvoiceDate.max())
+
+def merge_rfm_accumulators(accumulators: Iterable[RFMAccumulator]) -> RFMAccumulator:
+    '''The accumulators have to be given in the order their transactions appear in so that customers stay in order of first appearance.'''
+    accumulators = list(accumulators)
+    customer_df = pd.concat([accumulator.customer_df for accumulator in accumulators])
+    customer_df = customer_df.groupby(level='CustomerID', sort=False).agg({'LastPurchaseDate': 'max', 'InvoiceCount': 'sum', 'PurchaseAmountMillionths': 'sum'})
+    latest_date = pd.Series([accumulator.latest_date for accumulator in accumulators], dtype='datetime64[ns]').max()
+    return RFMAccumulator(customer_df, latest_date)
+
+#######
+# RFM #
+#######
+
+def finalize_rfm(accumulator: RFMAccumulator) -> pd.DataFrame:
+    '''One row per customer indexed by CustomerID in order of first appearance, with the RFM_COLUMNS.'''
+    customer_df = accumulator.customer_df
+    rfm_df = pd.DataFrame({'DaysSinceLastPurchase': (accumulator.latest_date - customer_df.LastPurchaseDate).dt.days,
+                           'InvoiceCount': customer_df.InvoiceCount,
+                           'CustomerOverallPurchaseAmount': customer_df.PurchaseAmountMillionths / MONETARY_FIXED_POINT_SCALE})
+    minimum_purchase_amount_millionths = round(MINIMUM_CUSTOMER_OVERALL_PURCHASE_AMOUNT * MONETARY_FIXED_POINT_SCALE)
+    rfm_df = rfm_df[customer_df.PurchaseAmountMillionths.to_numpy() >= minimum_purchase_amount_millionths]
+    assert (rfm_df.DaysSinceLastPurchase >= 0).all()
+    assert (rfm_df.InvoiceCount > 0).all()
+    assert (rfm_df.CustomerOverallPurchaseAmount > 0).all()
+    return rfm_df
+
+def generate_rfm_df(data_df: pd.DataFrame) -> pd.DataFrame:
+    return finalize_rfm(accumulate_rfm(data_df))
+
+#############
+# Streaming #
+#############
+
+def read_raw_data_chunks(csv_file: str, chunk_size: int = RAW_DATA_CHUNK_SIZE) -> Generator:
+    with pd.read_csv(csv_file, encoding=RAW_DATA_CSV_ENCODING, usecols=RAW_DATA_RFM_COLUMNS, chunksize=chunk_size) as reader:
+        yield from reader
+    return
+
+def accumulate_raw_data_chunk(raw_data_df: pd.DataFrame) -> RFMAccumulator:
+    return accumulate_rfm(clean_data(raw_data_df))
+
+def accumulate_raw_data_chunks(raw_data_dfs: Iterable[pd.DataFrame], parallel: bool = False) -> RFMAccumulator:
+    '''Folds each chunk into the running accumulator as soon as it's accumulated, so only a few chunks are ever in memory at once.'''
+    chunk_window_size = 2 * os.cpu_count() if parallel else 1
+    raw_data_dfs = iter(raw_data_dfs)
+    accumulators = []
+    for raw_data_df_window in iter(lambda: list(itertools.islice(raw_data_dfs, chunk_window_size)), []):
+        window_accumulators = parallel_map(accumulate_raw_data_chunk, raw_data_df_window) if parallel else list(map(accumulate_raw_data_chunk, raw_data_df_window))
+        accumulators = [merge_rfm_accumulators(accumulators + window_accumulators)]
+    assert len(accumulators) == 1, "No raw data to accumulate"
+    return accumulators[0]
+
+def generate_rfm_df_streaming(csv_file: str, chunk_size: int = RAW_DATA_CHUNK_SIZE, parallel: bool = False) -> pd.DataFrame:
+    '''Exactly the same as generate_rfm_df(clean_data(pd.read_csv(csv_file, ...))) without ever having all of csv_file in memory.'''
+    return finalize_rfm(accumulate_raw_data_chunks(read_raw_data_chunks(csv_file, chunk_size), parallel=parallel))
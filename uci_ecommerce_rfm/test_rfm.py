@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+
+"""
+Tests for rfm.py.
+"""
+
+###########
+# Imports #
+###########
+
+import numpy as np
+import pandas as pd
+
+from rfm import RAW_DATA_CSV_ENCODING, RAW_DATA_RFM_COLUMNS, clean_data, generate_rfm_df, generate_rfm_df_streaming
+from benchmark_rfm import synthetic_uci_data, row_wise_rfm_df
+
+###########
+# Helpers #
+###########
+
+def _raw_data_df() -> pd.DataFrame:
+    '''Line items where customer 30 first shows up after customers 10 and 20 reappear, customer 40 only has returns and some rows have no customer.'''
+    return pd.DataFrame({
+        'InvoiceNo': ['1', '1', '2', '3', '4', '4', '5', '6', '7', '8'],
+        'StockCode': ['a', 'b', 'a', 'c', 'b', 'c', 'a', 'b', 'c', 'a'],
+        'Quantity': [2, 1, 5, -1, 3, 1, -2, 4, 1, 6],
+        'InvoiceDate': ['12/1/2010 8:26', '12/1/2010 8:26', '12/3/2010 9:00', '12/5/2010 10:15', '12/6/2010 11:30',
+                        '12/6/2010 11:30', '12/8/2010 12:00', '12/9/2010 13:45', '12/12/2010 14:00', '12/20/2010 15:10'],
+        'UnitPrice': [2.55, 3.39, 0.85, 2.55, 3.39, 1.25, 0.85, 3.39, 1.25, 0.85],
+        'CustomerID': [20.0, 20.0, 10.0, np.nan, 20.0, 30.0, 40.0, 10.0, np.nan, 30.0],
+    })
+
+def _synthetic_raw_data_sample() -> pd.DataFrame:
+    # a sample rather than the first rows, which all belong to a handful of invoices
+    return synthetic_uci_data(1).sample(n=5_000, random_state=0).sort_index()
+
+def _write_raw_data_csv(raw_data_df: pd.DataFrame, csv_file: str) -> None:
+    raw_data_df.to_csv(csv_file, index=False, encoding=RAW_DATA_CSV_ENCODING)
+    return
+
+#########
+# Tests #
+#########
+
+def test_rfm_matches_row_wise_baseline():
+    data_df = clean_data(_synthetic_raw_data_sample())
+    pd.testing.assert_frame_equal(generate_rfm_df(data_df), row_wise_rfm_df(data_df), check_dtype=False)
+    return
+
+def test_streaming_matches_in_memory(tmp_path):
+    csv_file = str(tmp_path / 'data.csv')
+    _write_raw_data_csv(_synthetic_raw_data_sample(), csv_file)
+    rfm_df = generate_rfm_df(clean_data(pd.read_csv(csv_file, encoding=RAW_DATA_CSV_ENCODING)))
+    for parallel in (False, True):
+        streamed_rfm_df = generate_rfm_df_streaming(csv_file, chunk_size=37, parallel=parallel)
+        pd.testing.assert_frame_equal(streamed_rfm_df, rfm_df, check_exact=True)
+    return
+
+def test_streaming_keeps_customers_in_order_of_first_appearance(tmp_path):
+    csv_file = str(tmp_path / 'data.csv')
+    raw_data_df = _raw_data_df()
+    _write_raw_data_csv(raw_data_df, csv_file)
+    for parallel in (False, True):
+        streamed_rfm_df = generate_rfm_df_streaming(csv_file, chunk_size=2, parallel=parallel)
+        # customer 40 only has returns, so it's dropped for spending less than the minimum
+        assert list(streamed_rfm_df.index) == [20, 10, 30]
+        assert list(streamed_rfm_df.InvoiceCount) == [3, 2, 2]
+        assert list(streamed_rfm_df.DaysSinceLastPurchase) == [14, 11, 0]
+        pd.testing.assert_frame_equal(streamed_rfm_df, generate_rfm_df(clean_data(raw_data_df[RAW_DATA_RFM_COLUMNS])), check_exact=True)
+    return